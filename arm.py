@@ -1,14 +1,35 @@
 import maya.cmds as cmds
-import maya.OpenMaya as OpenMaya
-import utils as utils
+
+import rigGraph
+import utils
+
+# ---- Incremental builds ----
+# The arm is built from a rig description as rigGraph components: ik and fk joint chains, their controls
+# and the ik/fk switcher. Running buildArm() again only rebuilds the components whose settings or bind joints
+# changed, and whatever depends on them, the build state is kept on a <name>BuildState network node.
+# buildArm('c:/rigs/r_arm.json') builds from a JSON or YAML description laid out like kArmDescription,
+# buildArm(force=True) rebuilds everything.
+# Importing the module builds nothing, the components get their utils.Utilities through the graph's context.
+# A component that fails partway has the nodes it made deleted, the ones built before it are kept in the state.
+
+kArmDescription = {
+    'name': 'l_arm',
+    'settings': {'prefix': 'l_', 'bindJoints': ['l_shoulder_bind', 'l_elbow_bind', 'l_wrist_bind']},
+    'components': [
+        {'name': 'ikJoints', 'type': 'joints', 'settings': {'suffix': 'ik', 'radius': 0.2}},
+        {'name': 'ikControls', 'type': 'ikControls', 'depends': ['ikJoints'], 'settings': {'distanceScale': 5}},
+        {'name': 'fkJoints', 'type': 'joints', 'settings': {'suffix': 'fk', 'radius': 0.2}},
+        {'name': 'fkControls', 'type': 'fkControls', 'depends': ['fkJoints']},
+        {'name': 'switcher', 'type': 'switcher', 'depends': ['ikJoints', 'fkJoints'],
+         'settings': {'offset': [0, 1, 0]}}]}
 
 class Skeleton(object):
     """
     Skeleton Base Class
     """
-    def __init__(self):
-        self.utils = utils()
-        self.prefix = 'l_'
+    def __init__(self, prefix='l_', utilities=None):
+        self.utils = utilities or utils.Utilities()
+        self.prefix = prefix
         self.suffix = 'fk'
         self.shoulder = ('%sshoulder%s' % (self.prefix, self.suffix))
         self.elbow = ('%selbow_%s' % (self.prefix, self.suffix))
@@ -16,40 +37,51 @@ class Skeleton(object):
         self.radius = 0.2
         self.scale = 1
 
+    def setJoints(self, joints):
+        self.shoulder, self.elbow, self.wrist = joints
+
 
 class FKSkeleton(Skeleton):
     """
     FK Skeleton Class: Extends Skeleton
     """
-    def __init__(self):
-        super(FKSkeleton, self).__init__()
+    def __init__(self, prefix='l_', utilities=None):
+        super(FKSkeleton, self).__init__(prefix, utilities)
 
     def createFkControls(self, controlJoints=[], skinJoints=[]):
         controls = []
         nullGroups = []
+        constraints = []
         index = 0
 
         print "Building FK Controls..."
-        # Create a circle control at each joint
-        for controlJoint, skinJoint in zip(controlJoints, skinJoints):
-            control = self.utils.createCircleControl(skinJoint.replace('_bind', 'CON'), 0.5)
-            self.utils.parentSnap(skinJoint, control[0])
-            cmds.orientConstraint(control[0], controlJoint)
-            nullGroup = self.utils.createNullGroup(control[0])
-            self.utils.lockAttrs(control[0], 1, 0, 1, 1)
-            controls.append(control[0])
-            nullGroups.append(nullGroup)
+        # Create a circle control at each joint, snapped together in one pass
+        circles = self.utils.createControls([('circle', skinJoint.replace('_bind', 'CON'), {'scale': 0.5})
+                                             for skinJoint in skinJoints])
+        self.utils.snap(zip(skinJoints, circles))
+        for controlJoint, control in zip(controlJoints, circles):
+            constraints.extend(cmds.orientConstraint(control, controlJoint))
+            controls.append(control)
+
+        # Null groups and locks go through one batch once the snap has been applied
+        with self.utils.batch():
+            for control in controls:
+                nullGroups.append(self.utils.createNullGroup(control))
+                self.utils.lockAttrs(control, 1, 0, 1, 1)
+        nullGroups = [str(nullGroup) for nullGroup in nullGroups]
 
+        # cmds.parent keeps the world transform, a batched parent would keep the local one
         for index in range(index, len(controls) - 1):
             cmds.parent(nullGroups[index + 1], controls[index])
+        return controls, nullGroups, constraints
 
 
 class IKSkeleton(Skeleton):
     """
     IK Skeleton Class: Extends Skeleton
     """
-    def __init__(self):
-        super(IKSkeleton, self).__init__()
+    def __init__(self, prefix='l_', utilities=None):
+        super(IKSkeleton, self).__init__(prefix, utilities)
         self.suffix = 'ik'
         self.shoulder = ('%sshoulder_%s' % (self.prefix, self.suffix))
         self.elbow = ('%selbow_%s' % (self.prefix, self.suffix))
@@ -67,95 +99,186 @@ class IKSkeleton(Skeleton):
         self.utils.parentSnap(self.wrist, wristControl)
         return wristControl
 
-    def createPoleVector(self, prefix=None, distanceScale=2, verbose=False):
+    def createPoleVector(self, prefix=None, distanceScale=2, verbose=False, vectors=None):
+        """
+        vectors is poleVectorPositions() of the chain, worked out here from the joints when it isn't given
+        """
         print 'Building pole vector...'
 
         if prefix is None:
             prefix = self.prefix
 
         # Create Joint Vectors
-        shoulderIkPos = cmds.xform(self.shoulder, q=True, ws=True, t=True)
-        shoulderIkVec = OpenMaya.MVector(shoulderIkPos[0], shoulderIkPos[1], shoulderIkPos[2])
-        elbowIkPos = cmds.xform(self.elbow, q=True, ws=True, t=True)
-        elbowIkVec = OpenMaya.MVector(elbowIkPos[0], elbowIkPos[1], elbowIkPos[2])
-        wristIkPos = cmds.xform(self.wrist, q=True, ws=True, t=True)
-        wristIkVec = OpenMaya.MVector(wristIkPos[0], wristIkPos[1], wristIkPos[2])
-
-        # Transpose vectors to correct pole vector translation point
-        bisectorVec = (shoulderIkVec * 0.5) + (wristIkVec * 0.5)
-        transposedVec = (elbowIkVec * distanceScale) - (bisectorVec * distanceScale)
-        ikChainPoleVec = bisectorVec + transposedVec
+        jointPositions = []
+        if vectors is None or verbose:
+            jointPositions = [cmds.xform(joint, q=True, ws=True, t=True)
+                              for joint in (self.shoulder, self.elbow, self.wrist)]
+        if vectors is None:
+            vectors = poleVectorPositions(jointPositions[0], jointPositions[1], jointPositions[2], distanceScale)
+        bisectorVec, transposedVec, ikChainPoleVec = vectors
 
         # Create a pole vector
         poleVecCon = self.utils.createBoxControl('%selbowPV' % self.prefix, 0.125)
-        poleVecPos = [ikChainPoleVec.x, ikChainPoleVec.y, ikChainPoleVec.z]
-        cmds.xform(poleVecCon, t=poleVecPos)
+        cmds.xform(poleVecCon, t=ikChainPoleVec)
         self.utils.orientSnap(self.elbow, poleVecCon)
 
         # Visualize Vectors and End Points
         if verbose:
-            for vector, letter in zip([bisectorVec, transposedVec, ikChainPoleVec,
-                                       shoulderIkVec, elbowIkVec, wristIkVec],
+            for vector, letter in zip([bisectorVec, transposedVec, ikChainPoleVec] + jointPositions,
                                       ['bisectorVec', 'transposedVec', 'ikChainPoleVec',
                                       'shoulderIk', 'elbowIk', 'wristIk']):
-                cmds.spaceLocator(n='%sVecLoc' % letter, p=[vector.x, vector.y, vector.z])
-                cmds.curve(n='%sVecCurve' % letter, degree=1, p=[(0, 0, 0), (vector.x, vector.y, vector.z)])
+                cmds.spaceLocator(n='%sVecLoc' % letter, p=vector)
+                cmds.curve(n='%sVecCurve' % letter, degree=1, p=[(0, 0, 0), tuple(vector)])
 
         return poleVecCon
 
-    def createIkControls(self):
+    def createIkControls(self, distanceScale=5, vectors=None):
         # Create controls and solvers
         wristControl = self.createWristControl()
-        poleVector = self.createPoleVector(distanceScale=5)
-        ikHandle = self.createIkHandle()[0]
+        poleVector = self.createPoleVector(distanceScale=distanceScale, vectors=vectors)
+        ikHandle, effector = self.createIkHandle()
 
         # Create and constrain arm ik handle
         cmds.pointConstraint(wristControl, ikHandle)
         cmds.poleVectorConstraint(poleVector, ikHandle)
 
-        # Create null groups
-        self.utils.createNullGroup(wristControl)
-        self.utils.createNullGroup(poleVector)
-
-        # Lock controller attributes
-        self.utils.lockAttrs(wristControl, rotate=True, scale=True, visibility=True)
-        self.utils.lockAttrs(poleVector, rotate=True, scale=True, visibility=True)
-
-# Create an Arm Rig
-myUtils = utils()
-myIkArm = IKSkeleton()
-myFkArm = FKSkeleton()
-prefix = 'l_'
-armBindJoints = ['%sshoulder_bind' % prefix, '%selbow_bind' % prefix, '%swrist_bind' % prefix]
-
-# Create IK Armutils
-myUtils.jointCheck(armBindJoints)
-ikJoints = myUtils.createJoints(armBindJoints, myIkArm.prefix, myIkArm.suffix, myIkArm.radius)
-myIkArm.createIkControls()
-
-# Create Fk Arm
-fkJoints = myUtils.createJoints(armBindJoints, myFkArm.prefix, myFkArm.suffix, myFkArm.radius)
-myFkArm.createFkControls(fkJoints, armBindJoints)
-
-# Position IK/FK Switcher
-switcherCon = myUtils.createStarControl('%sArmSwitcher' % prefix)
-myUtils.parentSnap(myFkArm.wrist, switcherCon)
-cmds.move(0, 1, 0, switcherCon, r=1, os=1)
-myUtils.clearSel()
-
-# Add and Connect Switcher Attributes
-cmds.parentConstraint(armBindJoints[-1], switcherCon[0], mo=1)
-myUtils.lockAttrs(switcherCon[0], 1, 1, 1, 1)
-cmds.addAttr(switcherCon[0], longName='switcher', attributeType='enum', enumName='IK:FK', keyable=True)
-
-# Constrain Bind Joints to Control Joints
-reverser = cmds.createNode('reverse', n='%sSwitcherReverse' % prefix)
-cmds.connectAttr('%s.switcher' % switcherCon[0], '%s.inputX' % reverser)
-
-for bindJoint, ikJoint, fkJoint in zip(armBindJoints, ikJoints, fkJoints):
-    orient = myUtils.orientConstraint([ikJoint, fkJoint], bindJoint)
-    point = myUtils.pointConstraint([ikJoint, fkJoint], bindJoint)
-    cmds.connectAttr('%s.switcher' % switcherCon[0], '%s.%s' % (orient[0], bindJoint.replace('bind', 'fkW1')))
-    cmds.connectAttr('%s.outputX' % reverser, '%s.%s' % (orient[0], bindJoint.replace('bind', 'ikW0')))
-    cmds.connectAttr('%s.switcher' % switcherCon[0], '%s.%s' % (point[0], bindJoint.replace('bind', 'fkW1')))
-    cmds.connectAttr('%s.outputX' % reverser, '%s.%s' % (point[0], bindJoint.replace('bind', 'ikW0')))
\ No newline at end of file
+        with self.utils.batch():
+            # Create null groups
+            wristGroup = self.utils.createNullGroup(wristControl)
+            poleVectorGroup = self.utils.createNullGroup(poleVector)
+
+            # Lock controller attributes
+            self.utils.lockAttrs(wristControl, rotate=True, scale=True, visibility=True)
+            self.utils.lockAttrs(poleVector, rotate=True, scale=True, visibility=True)
+        return [str(wristGroup), str(poleVectorGroup), ikHandle, effector]
+
+
+def poleVectorPositions(shoulder, elbow, wrist, distanceScale=2):
+    """
+    Get the bisector, transposed and pole vector points of a chain from its joints' world positions
+    Plain lists in and out, so it runs off the main thread as the ikControls compute step
+    """
+    # Transpose vectors to correct pole vector translation point
+    bisectorVec = [(s * 0.5) + (w * 0.5) for s, w in zip(shoulder, wrist)]
+    transposedVec = [(e * distanceScale) - (b * distanceScale) for e, b in zip(elbow, bisectorVec)]
+    ikChainPoleVec = [b + t for b, t in zip(bisectorVec, transposedVec)]
+    return bisectorVec, transposedVec, ikChainPoleVec
+
+
+def createSwitcher(utilities, prefix, bindJoints, ikJoints, fkJoints, offset=(0, 1, 0)):
+    """
+    Create the ik/fk switcher control and blend the bind joints between the chains, get the nodes it made
+    """
+    # Position IK/FK Switcher
+    switcherCon = utilities.createStarControl('%sArmSwitcher' % prefix)
+    utilities.parentSnap(fkJoints[-1], switcherCon[0])
+    cmds.move(offset[0], offset[1], offset[2], switcherCon, r=1, os=1)
+    utilities.clearSel()
+
+    # Add and Connect Switcher Attributes
+    nodes = [switcherCon[0]]
+    nodes.extend(cmds.parentConstraint(bindJoints[-1], switcherCon[0], mo=1))
+    cmds.addAttr(switcherCon[0], longName='switcher', attributeType='enum', enumName='IK:FK', keyable=True)
+
+    # Constrain Bind Joints to Control Joints
+    constraints = []
+    for bindJoint, ikJoint, fkJoint in zip(bindJoints, ikJoints, fkJoints):
+        orient = utilities.orientConstraint([ikJoint, fkJoint], bindJoint)
+        point = utilities.pointConstraint([ikJoint, fkJoint], bindJoint)
+        constraints.append((bindJoint, orient[0], point[0]))
+        nodes.extend([orient[0], point[0]])
+
+    # The reverse node, locks and every weight connection are one batch
+    with utilities.batch():
+        utilities.lockAttrs(switcherCon[0], 1, 1, 1, 1)
+        reverser = utilities.createNode('reverse', '%sSwitcherReverse' % prefix)
+        utilities.connectAttr(switcherCon[0], 'switcher', reverser, 'inputX')
+        for bindJoint, orient, point in constraints:
+            for constraint in (orient, point):
+                utilities.connectAttr(switcherCon[0], 'switcher', constraint, bindJoint.replace('bind', 'fkW1'))
+                utilities.connectAttr(reverser, 'outputX', constraint, bindJoint.replace('bind', 'ikW0'))
+    nodes.append(str(reverser))
+    return nodes
+
+
+# ---- Components ----
+
+def readBindJoints(component):
+    """
+    The bind joints' world matrices, moving the bind skeleton rebuilds the chains
+    """
+    bindJoints = component.settings['bindJoints']
+    component.context.jointCheck(bindJoints)
+    return [[round(value, 4) for value in matrix] for matrix in utils.worldMatrices(bindJoints)]
+
+
+def buildJoints(component, data, computed, inputs):
+    settings = component.settings
+    joints = component.context.createJoints(settings['bindJoints'], settings['prefix'], settings['suffix'],
+                                            settings['radius'])
+    return [joints[0]], {'joints': joints}
+
+
+def readJointPositions(component):
+    return [[round(value, 4) for value in cmds.xform(joint, q=True, ws=True, t=True)]
+            for joint in component.settings['bindJoints']]
+
+
+def computePoleVector(component, data):
+    return poleVectorPositions(data[0], data[1], data[2], component.settings['distanceScale'])
+
+
+def buildIkControls(component, data, computed, inputs):
+    arm = IKSkeleton(component.settings['prefix'], component.context)
+    arm.setJoints(inputs[component.depends[0]]['joints'])
+    return arm.createIkControls(component.settings['distanceScale'], computed), {}
+
+
+def buildFkControls(component, data, computed, inputs):
+    arm = FKSkeleton(component.settings['prefix'], component.context)
+    controls, nullGroups, constraints = arm.createFkControls(inputs[component.depends[0]]['joints'],
+                                                             component.settings['bindJoints'])
+    return nullGroups[:1] + constraints, {'controls': controls}
+
+
+def buildSwitcher(component, data, computed, inputs):
+    settings = component.settings
+    ikJoints, fkJoints = [inputs[depend]['joints'] for depend in component.depends]
+    return createSwitcher(component.context, settings['prefix'], settings['bindJoints'], ikJoints, fkJoints,
+                          settings['offset']), {}
+
+
+rigGraph.registerType('joints', buildJoints, read=readBindJoints)
+rigGraph.registerType('ikControls', buildIkControls, read=readJointPositions, compute=computePoleVector)
+rigGraph.registerType('fkControls', buildFkControls)
+rigGraph.registerType('switcher', buildSwitcher)
+
+
+def buildArm(description=None, force=False, workers=None, utilities=None):
+    """
+    Build or update an arm from a description dict or file, only changed components are rebuilt
+    """
+    if utilities is None:
+        utilities = utils.Utilities()
+    if isinstance(description, basestring):
+        description = rigGraph.loadDescription(description)
+    graph = rigGraph.RigGraph(description or kArmDescription, context=utilities)
+    stateNode = '%sBuildState' % graph.name
+
+    cmds.undoInfo(openChunk=True)
+    try:
+        graph.run(utilities.loadBuildState(stateNode), utilities.deleteNodes, workers, force,
+                  tracker=utilities.trackNodes)
+    finally:
+        # Components finished before a failure are kept, so the next run picks up from there
+        if graph.state is not None:
+            utilities.saveBuildState(stateNode, graph.state)
+        cmds.undoInfo(closeChunk=True)
+
+    print 'Rebuilt %s' % (', '.join(graph.rebuilt) or 'nothing, %s is up to date' % graph.name)
+    return graph
+
+
+# Create an Arm Rig, running this again only rebuilds what changed
+if __name__ == '__main__':
+    buildArm()
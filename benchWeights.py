@@ -0,0 +1,291 @@
+# ---- Skin weight benchmarks ----
+# Times tbSaveSkinWeights export, parse, import and bulk apply against the headless Maya stand-in in fakeMaya.
+# Every case is a generated mesh of numVerts vertices and numInfs influences, up to 4 influences per vertex.
+# Results are written as JSON so two runs can be diffed, see --baseline.
+# Run with the same python as Maya.
+# Times are the best of --repeat runs. Memory is measured by running each phase again in a fresh python process,
+# phaseRss is how far that process' peak RSS rose past its peak after building the mesh.
+# peakBytes is the tracemalloc peak of the phase, on pythons that have tracemalloc.
+
+# ---- Usage ----
+# python benchWeights.py -o results.json
+# python benchWeights.py --sizes 1000,10000 --infs 4,16 --formats binary,chunked -o new.json --baseline old.json
+
+# ---- Phases ----
+# export      tbSaveSkinWeights -a export, capture and write
+# parse       weightFile.readWeights on the exported file
+# import      tbSaveSkinWeights -a import, parse and apply through setAttr
+# bulkImport  tbSaveSkinWeights -a import -b, parse and apply through one setWeights call
+# smooth      tbSaveSkinWeights -a smooth -it 10, once per mesh size and influence count
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import fakeMaya
+
+fakeMaya.install()
+
+import tbSaveWeights
+import weightFile
+from skinWeights import SkinWeightsBuilder, np
+
+kSizes = (1000, 10000, 100000, 1000000)
+kInfluences = (4, 8, 16)
+kFormats = (weightFile.kFormatXml, weightFile.kFormatBinary, weightFile.kFormatChunked)
+kMeshName = 'benchMesh'
+kRepeat = 3
+kExtensions = {weightFile.kFormatXml: '.xml', weightFile.kFormatBinary: '.tbw', weightFile.kFormatChunked: '.tbc'}
+
+
+def buildMesh(numVerts, numInfs, seed=0):
+    """
+    Create a skinned grid mesh in the fake scene
+    Vertices get up to 4 neighbouring influences along the grid with random normalized weights
+    """
+    fakeMaya.newScene()
+    fakeMaya.loadPlugin(tbSaveWeights)
+
+    rng = random.Random(seed)
+    side = int(numVerts ** 0.5) + 1
+    points = [(float(v % side), 0.0, float(v // side)) for v in range(numVerts)]
+    faces = [(v, v + 1, v + side + 1, v + side) for v in range(numVerts - side - 1) if v % side != side - 1]
+    infNames = ['bench_joint%d' % i for i in range(numInfs)]
+
+    builder = SkinWeightsBuilder(infNames, kMeshName)
+    perVert = min(4, numInfs)
+    for vertId in range(numVerts):
+        first = vertId * numInfs // numVerts
+        infIds = sorted(set((first + i) % numInfs for i in range(perVert)))
+        values = [rng.random() + 0.01 for i in infIds]
+        total = sum(values)
+        builder.addVertex(vertId, infIds, [v / total for v in values])
+    weights = builder.build()
+
+    fakeMaya.createSkinnedMesh(kMeshName, points, infNames, weights, faces)
+    return weights
+
+
+class Quiet(object):
+    """
+    Swallow prints while a phase runs so console output isn't timed
+    """
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+
+def peakRss():
+    """
+    Process high water mark in bytes, None where resource is missing
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(func, memory=True, repeat=kRepeat):
+    """
+    Time a phase as the best of repeat runs,
+    then run it again under tracemalloc for its peak allocation when memory is set
+    Returns (seconds, peak bytes or None)
+    """
+    with Quiet():
+        times = []
+        for i in range(repeat):
+            startTime = timeit.default_timer()
+            func()
+            times.append(timeit.default_timer() - startTime)
+        seconds = min(times)
+
+        peak = None
+        if memory and tracemalloc is not None:
+            tracemalloc.start()
+            try:
+                func()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return seconds, peak
+
+
+def phaseFunc(phase, fileName=None, fileFormat=None):
+    """
+    Get a function that runs one phase on the benchmark mesh
+    """
+    if phase == 'parse':
+        return lambda: weightFile.readWeights(fileName, fileFormat)
+    command = {'export': '-a "export"',
+               'import': '-a "import"',
+               'bulkImport': '-a "import" -b',
+               'smooth': '-a "smooth" -it 10'}[phase]
+    if fileName is not None:
+        command += ' -f "%s"' % fileName
+    return lambda: fakeMaya.mel.eval('tbSaveSkinWeights %s -m "%s"' % (command, kMeshName))
+
+
+def runPhase(phase, numVerts, numInfs, fileName=None, fileFormat=None):
+    """
+    Run one phase in this process and print its peak RSS and the peak RSS before it as JSON
+    This is the child side of phaseRss()
+    """
+    buildMesh(numVerts, numInfs)
+    setupRss = peakRss()
+    with Quiet():
+        phaseFunc(phase, fileName, fileFormat)()
+    print(json.dumps({'setupRss': setupRss, 'peakRss': peakRss()}))
+
+
+def phaseRss(phase, numVerts, numInfs, fileName=None, fileFormat=None):
+    """
+    Run one phase in a fresh python process, the only way to get a per phase peak RSS
+    Returns (peak RSS rise over building the mesh, peak RSS), both None where resource is missing
+    """
+    if resource is None:
+        return None, None
+    command = [sys.executable, os.path.abspath(__file__), '--phase', phase, '--sizes', str(numVerts),
+               '--infs', str(numInfs)]
+    if fileName is not None:
+        command += ['--file', fileName, '--formats', fileFormat]
+    output = subprocess.check_output(command).decode('utf-8')
+    rss = json.loads(output.strip().splitlines()[-1])
+    return rss['peakRss'] - rss['setupRss'], rss['peakRss']
+
+
+def runCase(numVerts, numInfs, formats, folder, memory=True, repeat=kRepeat):
+    """
+    Run every phase of one mesh size and influence count
+    """
+    buildMesh(numVerts, numInfs)
+    results = []
+
+    for fileFormat in formats:
+        fileName = os.path.join(folder, 'bench%d_%d%s' % (numVerts, numInfs, kExtensions[fileFormat]))
+        for phase in ('export', 'parse', 'import', 'bulkImport'):
+            seconds, peak = measure(phaseFunc(phase, fileName, fileFormat), memory, repeat)
+            rise, rss = phaseRss(phase, numVerts, numInfs, fileName, fileFormat) if memory else (None, None)
+            fileBytes = os.path.getsize(fileName)
+            result = {'numVerts': numVerts,
+                      'numInfs': numInfs,
+                      'format': fileFormat,
+                      'phase': phase,
+                      'seconds': seconds,
+                      'vertsPerSecond': numVerts / seconds if seconds else None,
+                      'fileBytes': fileBytes,
+                      'mbPerSecond': fileBytes / 1048576.0 / seconds if seconds else None,
+                      'repeat': repeat,
+                      'peakBytes': peak,
+                      'phaseRss': rise,
+                      'peakRss': rss}
+            results.append(result)
+            print('%8d verts %3d infs %-8s %-10s %10.4fs %12.0f verts/s %s' % (
+                numVerts, numInfs, fileFormat, phase, seconds, result['vertsPerSecond'] or 0, memoryText(rise)))
+
+    # Smoothing changes the scene so it runs last
+    seconds, peak = measure(phaseFunc('smooth'), memory, repeat)
+    rise, rss = phaseRss('smooth', numVerts, numInfs) if memory else (None, None)
+    results.append({'numVerts': numVerts,
+                    'numInfs': numInfs,
+                    'format': None,
+                    'phase': 'smooth',
+                    'seconds': seconds,
+                    'vertsPerSecond': numVerts / seconds if seconds else None,
+                    'repeat': repeat,
+                    'peakBytes': peak,
+                    'phaseRss': rise,
+                    'peakRss': rss})
+    print('%8d verts %3d infs %-8s %-10s %10.4fs %12.0f verts/s %s' % (
+        numVerts, numInfs, '', 'smooth', seconds, results[-1]['vertsPerSecond'] or 0, memoryText(rise)))
+    return results
+
+
+def memoryText(rise):
+    return '+%.1fMB rss' % (rise / 1048576.0) if rise is not None else ''
+
+
+def compare(results, baseline):
+    """
+    Print the time ratio of every phase against a baseline result file
+    """
+    with open(baseline, 'r') as f:
+        old = json.load(f)['results']
+    key = lambda r: (r['numVerts'], r['numInfs'], r['format'], r['phase'])
+    oldTimes = dict((key(r), r['seconds']) for r in old)
+    for result in results:
+        oldSeconds = oldTimes.get(key(result))
+        if oldSeconds:
+            ratio = result['seconds'] / oldSeconds
+            print('%8d verts %3d infs %-8s %-10s %6.2fx%s' % (key(result) + (ratio,) + (
+                '  SLOWER' if ratio > 1.1 else '',)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the skin weight pipeline without Maya')
+    parser.add_argument('-o', '--output', default='benchWeights.json', help='JSON results file')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in kSizes), help='comma separated vertex counts')
+    parser.add_argument('--infs', default=','.join(str(i) for i in kInfluences),
+                        help='comma separated influence counts')
+    parser.add_argument('--formats', default=','.join(kFormats), help='comma separated file formats')
+    parser.add_argument('--repeat', type=int, default=kRepeat, help='runs per phase, the fastest is kept')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the tracemalloc and separate process memory runs')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--phase', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    infs = [int(i) for i in args.infs.split(',')]
+    formats = args.formats.split(',')
+
+    if args.phase:
+        runPhase(args.phase, sizes[0], infs[0], args.file, formats[0])
+        return
+
+    folder = tempfile.mkdtemp(prefix='benchWeights')
+    results = []
+    try:
+        for numVerts in sizes:
+            for numInfs in infs:
+                results.extend(runCase(numVerts, numInfs, formats, folder, args.memory, args.repeat))
+    finally:
+        shutil.rmtree(folder)
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'numpy': np is not None,
+              'time': time.time(),
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('Wrote %s' % args.output)
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# ---- Control shapes ----
+# CV arrays for control curves, generated from a few parameters instead of typed in point by point.
+# Every shape is built around the origin at unit size, then scaled, rotated and moved,
+# and the result is cached so building a rig's worth of the same control only generates it once.
+# curveArgs() returns the keyword arguments of one cmds.curve call.
+# Nothing in here touches Maya.
+
+# ---- Usage ----
+# import controlShapes
+# cmds.curve(name='l_armSwitcher', **controlShapes.curveArgs('star', sections=16, scale=0.5))
+# controlShapes.registerShape('arrow', lambda: ([(0, 0, -1), (0, 0, 1), (0.5, 0, 0.5)], 1, False))
+
+import math
+
+import transformMath
+
+_shapes = {}
+_cache = {}
+
+
+def registerShape(name, generator):
+    """
+    Add a shape, generator(**options) returns (points, degree, periodic) at unit size
+    A periodic curve lists each cv once, curveArgs() wraps it
+    """
+    _shapes[name] = generator
+    for key in [key for key in _cache if key[0] == name]:
+        del _cache[key]
+
+
+def shapeNames():
+    return sorted(_shapes)
+
+
+def circle(sections=8):
+    """
+    A periodic cubic through radius 1 at every cv's angle, like cmds.circle facing +Z
+    """
+    # A periodic cubic passes through (p[i - 1] + 4 * p[i] + p[i + 1]) / 6, push the cvs out to land on radius 1
+    angle = 2.0 * math.pi / sections
+    radius = 6.0 / (4.0 + 2.0 * math.cos(angle))
+    points = [(radius * math.cos(angle * index), radius * math.sin(angle * index), 0.0) for index in range(sections)]
+    return points, 3, True
+
+
+def star(sections=16, innerRadius=0.1):
+    """
+    A circle with every odd cv pulled in to innerRadius
+    """
+    points = circle(sections)[0]
+    points = [tuple(value * innerRadius for value in point) if index % 2 else point
+              for index, point in enumerate(points)]
+    return points, 3, True
+
+
+def box():
+    """
+    Every edge of a cube from -1 to 1 as one linear path
+    """
+    corners = [(1, -1, 1), (1, 1, 1), (1, 1, -1), (1, -1, -1), (-1, -1, -1), (-1, 1, -1), (-1, 1, 1), (-1, -1, 1),
+               (1, -1, 1), (1, -1, -1), (-1, -1, -1), (-1, -1, 1), (-1, 1, 1), (1, 1, 1), (1, 1, -1), (-1, 1, -1)]
+    return [tuple(float(value) for value in corner) for corner in corners], 1, False
+
+
+def square():
+    """
+    A closed linear square from -1 to 1 on the XZ plane
+    """
+    return [(-1.0, 0.0, -1.0), (1.0, 0.0, -1.0), (1.0, 0.0, 1.0), (-1.0, 0.0, 1.0), (-1.0, 0.0, -1.0)], 1, False
+
+
+registerShape('circle', circle)
+registerShape('star', star)
+registerShape('box', box)
+registerShape('square', square)
+
+
+def shapePoints(shape, scale=1.0, rotate=(0.0, 0.0, 0.0), translate=(0.0, 0.0, 0.0), **options):
+    """
+    Get (points, degree, periodic) of a registered shape, scaled, then rotated in degrees, then moved
+    scale is one value or one per axis, the points are cached tuples
+    """
+    if not isinstance(scale, (list, tuple)):
+        scale = (scale, scale, scale)
+    key = (shape, tuple(sorted(options.items())), tuple(scale), tuple(rotate), tuple(translate))
+    if key not in _cache:
+        if shape not in _shapes:
+            raise Exception('Unknown control shape: %s' % shape)
+        points, degree, periodic = _shapes[shape](**options)
+        matrix = transformMath.composeMatrix(translate, rotate, scale)
+        points = tuple(tuple(transformMath.transformPoint(point, matrix)) for point in points)
+        _cache[key] = (points, degree, periodic)
+    return _cache[key]
+
+
+def curveArgs(shape, **options):
+    """
+    Get the point, degree, periodic and knot keyword arguments of cmds.curve for a shape, see shapePoints()
+    """
+    points, degree, periodic = shapePoints(shape, **options)
+    if periodic:
+        # A periodic curve repeats its first degree cvs, with knots running degree - 1 below 0
+        points = points + points[:degree]
+        knots = list(range(1 - degree, len(points)))
+        return {'p': list(points), 'd': degree, 'per': True, 'k': knots}
+    if degree == 1:
+        knots = list(range(len(points)))
+    else:
+        spans = len(points) - degree
+        knots = [0] * (degree - 1) + list(range(spans + 1)) + [spans] * (degree - 1)
+    return {'p': list(points), 'd': degree, 'k': knots}
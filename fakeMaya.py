@@ -0,0 +1,789 @@
+# ---- Headless Maya stand-in ----
+# A small in memory fake of the maya.cmds, maya.mel, maya.utils, OpenMaya, OpenMayaAnim and OpenMayaMPx surfaces
+# used by tbSaveWeights, so the weight pipeline can be timed outside of Maya.
+# It models meshes, joints and skin clusters only, enough for selection, MFnSkinCluster,
+# weightList plugs, setAttr, skinPercent and running registered commands through mel.eval.
+
+# ---- Usage ----
+# import fakeMaya
+# fakeMaya.install()
+# import tbSaveWeights
+# fakeMaya.loadPlugin(tbSaveWeights)
+# fakeMaya.createSkinnedMesh('body', points, ['joint1', 'joint2'], weights)
+# fakeMaya.mel.eval('tbSaveSkinWeights -a "export" -m "body" -f "/tmp/body.tbw"')
+
+import array
+import re
+import shlex
+import sys
+import types
+
+_compRe = re.compile(r'^(.+?)\.vtx\[(\*|\d+)(?::(\d+))?\]$')
+_weightAttrRe = re.compile(r'^(.+)\.weightList\[(\d+)\]\.weights\[(\d+)\]$')
+
+
+# ---- Scene ----
+
+class Mesh(object):
+    def __init__(self, name, points, faces=None):
+        self.name = name
+        self.points = points
+        self.faces = faces or []
+        self.skinCluster = None
+
+    def numVertices(self):
+        return len(self.points)
+
+    def numEdges(self):
+        return len(set(tuple(sorted((face[i], face[i - 1]))) for face in self.faces for i in range(len(face))))
+
+
+class SkinCluster(object):
+    """
+    Skin cluster weights stored as one column of doubles per influence
+    """
+    def __init__(self, name, mesh, infNames):
+        self.name = name
+        self.mesh = mesh
+        self.infNames = []
+        self.columns = []
+        self.normalizeWeights = 1
+        for infName in infNames:
+            self.addInfluence(infName)
+
+    def addInfluence(self, infName):
+        self.infNames.append(infName)
+        self.columns.append(array.array('d', [0.0]) * self.mesh.numVertices())
+
+    def existing(self, vertId):
+        return [i for i, column in enumerate(self.columns) if column[vertId]]
+
+
+class Scene(object):
+    def __init__(self):
+        self.meshes = {}
+        self.clusters = {}
+        self.joints = {}
+        self.selection = []
+        self.undoQueue = []
+
+    def findNode(self, name):
+        name = name.split('|')[-1]
+        for nodes in (self.meshes, self.clusters, self.joints):
+            if name in nodes:
+                return nodes[name]
+        return None
+
+
+scene = Scene()
+commands = {}
+
+
+def newScene():
+    """
+    Drop every node
+    """
+    global scene
+    scene = Scene()
+    return scene
+
+
+def createSkinnedMesh(meshName, points, infNames, weights=None, faces=None):
+    """
+    Create a mesh bound to a new skin cluster
+    points is a list of (x, y, z), weights is any iterable of (vertId, infIds, values) rows,
+    faces is a list of polygon vertex id lists
+    """
+    mesh = Mesh(meshName, [tuple(p) for p in points], [list(face) for face in faces or []])
+    for infName in infNames:
+        scene.joints.setdefault(infName, {'liw': 0})
+    cluster = SkinCluster('skinCluster%d' % (len(scene.clusters) + 1), mesh, infNames)
+    mesh.skinCluster = cluster
+    scene.meshes[meshName] = mesh
+    scene.clusters[cluster.name] = cluster
+
+    for vertId, infIds, values in weights or ():
+        for infId, value in zip(infIds, values):
+            cluster.columns[infId][vertId] = value
+    return cluster
+
+
+def parseComponent(selString):
+    """
+    Split a selection string into (node name, vertex ids or None)
+    """
+    match = _compRe.match(selString)
+    if not match:
+        return selString, None
+    nodeName, start, end = match.groups()
+    if start == '*':
+        mesh = scene.findNode(nodeName)
+        return nodeName, list(range(mesh.numVertices()))
+    start = int(start)
+    end = int(end) if end is not None else start
+    return nodeName, list(range(start, end + 1))
+
+
+def _flatten(items):
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            for sub in _flatten(item):
+                yield sub
+        else:
+            yield item
+
+
+# ---- maya.cmds ----
+
+def setAttr(attr, value, **kwargs):
+    match = _weightAttrRe.match(attr)
+    if match:
+        cluster = scene.clusters[match.group(1)]
+        cluster.columns[int(match.group(3))][int(match.group(2))] = value
+        return
+    nodeName, attrName = attr.rsplit('.', 1)
+    node = scene.findNode(nodeName)
+    if isinstance(node, SkinCluster) and attrName == 'normalizeWeights':
+        node.normalizeWeights = value
+    elif isinstance(node, dict):
+        node[attrName] = value
+    else:
+        raise RuntimeError('No object matches name: %s' % attr)
+
+
+def getAttr(attr, **kwargs):
+    match = _weightAttrRe.match(attr)
+    if match:
+        return scene.clusters[match.group(1)].columns[int(match.group(3))][int(match.group(2))]
+    nodeName, attrName = attr.rsplit('.', 1)
+    node = scene.findNode(nodeName)
+    if isinstance(node, SkinCluster) and attrName == 'normalizeWeights':
+        return node.normalizeWeights
+    if isinstance(node, dict) and attrName in node:
+        return node[attrName]
+    raise RuntimeError('No object matches name: %s' % attr)
+
+
+def skinPercent(clusterName, *targets, **kwargs):
+    cluster = scene.clusters[clusterName]
+    vertIds = []
+    for target in _flatten(targets):
+        nodeName, ids = parseComponent(target)
+        vertIds.extend(range(cluster.mesh.numVertices()) if ids is None else ids)
+
+    prune = kwargs.get('prw', kwargs.get('pruneWeights'))
+    if prune is not None:
+        for column in cluster.columns:
+            for vertId in vertIds:
+                if column[vertId] < prune:
+                    column[vertId] = 0.0
+
+    for infName, value in kwargs.get('transformValue', kwargs.get('tv', ())):
+        column = cluster.columns[cluster.infNames.index(infName)]
+        for vertId in vertIds:
+            column[vertId] = value
+
+
+def isConnected(source, destination, **kwargs):
+    return scene.findNode(source.split('.')[0]) is not None and scene.findNode(destination.split('.')[0]) is not None
+
+
+def skinCluster(*args, **kwargs):
+    cluster = scene.clusters[args[0]]
+    if kwargs.get('edit') or kwargs.get('e'):
+        for infName in _flatten([kwargs.get('addInfluence', kwargs.get('ai', []))]):
+            scene.joints.setdefault(infName, {'liw': 0})
+            cluster.addInfluence(infName)
+    return cluster.name
+
+
+def polyListComponentConversion(items, **kwargs):
+    converted = []
+    for item in _flatten([items]):
+        nodeName, ids = parseComponent(item)
+        if ids is None and '.' in item:
+            raise RuntimeError('Only vertex components are modelled: %s' % item)
+        converted.append(item if ids is not None else '%s.vtx[*]' % item)
+    return converted
+
+
+def select(*items, **kwargs):
+    items = list(_flatten(items))
+    if kwargs.get('clear') or kwargs.get('cl'):
+        scene.selection = []
+    elif kwargs.get('add'):
+        scene.selection.extend(items)
+    else:
+        scene.selection = items
+
+
+def ls(*args, **kwargs):
+    if kwargs.get('sl') or kwargs.get('selection'):
+        return list(scene.selection)
+    return [name for nodes in (scene.meshes, scene.clusters, scene.joints) for name in nodes]
+
+
+def objExists(name):
+    return scene.findNode(parseComponent(name)[0]) is not None
+
+
+def undo():
+    """
+    Undo the last undoable registered command
+    """
+    if scene.undoQueue:
+        scene.undoQueue.pop().undoIt()
+
+
+# ---- maya.mel ----
+
+def melEval(command):
+    """
+    Run findRelatedSkinCluster or a registered command, arguments are split like a shell line
+    """
+    tokens = shlex.split(command.strip().rstrip(';'))
+    name, args = tokens[0], tokens[1:]
+
+    if name == 'findRelatedSkinCluster':
+        mesh = scene.findNode(args[0])
+        return mesh.skinCluster.name if isinstance(mesh, Mesh) and mesh.skinCluster else ''
+
+    if name not in commands:
+        raise RuntimeError('Cannot find procedure "%s"' % name)
+    creator, syntaxCreator = commands[name]
+    cmd = creator()
+    cmd._syntax = syntaxCreator() if syntaxCreator else MSyntax()
+    argList = MArgList()
+    for arg in args:
+        argList.append(arg)
+    result = cmd.doIt(argList)
+    if cmd.isUndoable():
+        scene.undoQueue.append(cmd)
+    return result
+
+
+# ---- maya.utils ----
+
+deferred = []
+
+
+def executeDeferred(func, *args, **kwargs):
+    """
+    Queue a call for the next idle, like Maya the queue only runs on the main thread, see processDeferred()
+    """
+    deferred.append((func, args, kwargs))
+
+
+def processDeferred():
+    """
+    Run every queued deferred call, the stand-in for Maya going idle
+    """
+    while deferred:
+        func, args, kwargs = deferred.pop(0)
+        func(*args, **kwargs)
+
+
+# ---- OpenMaya ----
+
+class MFn(object):
+    kInvalid = 0
+    kMesh = 296
+    kMeshVertComponent = 550
+    kSkinClusterFilter = 682
+    kJoint = 121
+
+
+class MSpace(object):
+    kObject = 2
+    kWorld = 4
+
+
+class MObject(object):
+    def __init__(self, other=None):
+        self._node = other._node if other is not None else None
+        self._comp = other._comp if other is not None else None
+
+    def isNull(self):
+        return self._node is None and self._comp is None
+
+    def apiType(self):
+        if self._comp is not None:
+            return MFn.kMeshVertComponent
+        node = scene.findNode(self._node) if self._node else None
+        if isinstance(node, Mesh):
+            return MFn.kMesh
+        if isinstance(node, SkinCluster):
+            return MFn.kSkinClusterFilter
+        return MFn.kJoint if node is not None else MFn.kInvalid
+
+
+class _Component(object):
+    def __init__(self):
+        self.elements = []
+        self.complete = None
+
+    def ids(self):
+        if self.complete is not None:
+            return range(self.complete)
+        return self.elements
+
+
+class _List(list):
+    """
+    MIntArray style array, built empty, from a (pointer, length) pair or from (length, value)
+    """
+    def __init__(self, *args):
+        if len(args) == 2 and isinstance(args[0], (list, tuple)):
+            list.__init__(self, args[0][:args[1]])
+        elif len(args) == 2:
+            list.__init__(self, [args[1]] * args[0])
+        else:
+            list.__init__(self, *args)
+
+    def length(self):
+        return len(self)
+
+    def clear(self):
+        del self[:]
+
+
+class MIntArray(_List):
+    pass
+
+
+class MDoubleArray(_List):
+    pass
+
+
+class MStringArray(_List):
+    pass
+
+
+class MDagPathArray(_List):
+    pass
+
+
+class MPointArray(_List):
+    pass
+
+
+class MPoint(object):
+    __slots__ = ('x', 'y', 'z', 'w')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        self.x, self.y, self.z, self.w = x, y, z, w
+
+
+class _Pointer(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class MScriptUtil(object):
+    def __init__(self):
+        self._values = []
+        self._pointer = _Pointer(0)
+
+    def createFromList(self, values, length):
+        self._values = list(values)[:length]
+
+    def createFromInt(self, *values):
+        self._pointer = _Pointer(values[0])
+
+    def asIntPtr(self):
+        return self._values or self._pointer
+
+    asDoublePtr = asIntPtr
+
+    def asUintPtr(self):
+        return self._pointer
+
+    @staticmethod
+    def getUint(pointer):
+        return pointer.value
+
+    @staticmethod
+    def getInt(pointer):
+        return pointer.value
+
+
+class MDagPath(object):
+    def __init__(self, other=None):
+        self._name = other._name if other is not None else None
+
+    def extendToShape(self):
+        pass
+
+    def partialPathName(self):
+        return self._name
+
+    def fullPathName(self):
+        return '|' + self._name
+
+    def node(self):
+        obj = MObject()
+        obj._node = self._name
+        return obj
+
+    def apiType(self):
+        return self.node().apiType()
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, selString):
+        nodeName, ids = parseComponent(selString)
+        if scene.findNode(nodeName) is None:
+            raise RuntimeError('(kInvalidParameter): Object does not exist: %s' % selString)
+        self._items.append(selString)
+
+    def length(self):
+        return len(self._items)
+
+    def isEmpty(self):
+        return not self._items
+
+    def clear(self):
+        self._items = []
+
+    def getSelectionStrings(self, *args):
+        if len(args) == 2:
+            index, strings = args
+            strings.append(self._items[index])
+        else:
+            strings = args[0]
+            strings.extend(self._items)
+
+    def getDagPath(self, index, dagPath, component=None):
+        nodeName, ids = parseComponent(self._items[index])
+        node = scene.findNode(nodeName)
+        if isinstance(node, SkinCluster):
+            raise RuntimeError('(kFailure): Object is not a dag node')
+        dagPath._name = nodeName
+        if component is not None:
+            component._node = None
+            component._comp = None
+            if ids is not None:
+                component._comp = _Component()
+                component._comp.elements = ids
+
+    def getDependNode(self, index, obj):
+        obj._node = parseComponent(self._items[index])[0]
+        obj._comp = None
+
+
+class MGlobal(object):
+    @staticmethod
+    def getActiveSelectionList(sel):
+        sel.clear()
+        for item in scene.selection:
+            sel.add(item)
+
+    @staticmethod
+    def displayInfo(message):
+        print(message)
+
+    displayWarning = displayInfo
+    displayError = displayInfo
+
+
+class MFnSingleIndexedComponent(object):
+    def __init__(self, obj=None):
+        self._obj = obj
+
+    def create(self, compType):
+        self._obj = MObject()
+        self._obj._comp = _Component()
+        return self._obj
+
+    def addElements(self, elements):
+        self._obj._comp.elements.extend(elements)
+
+    def addElement(self, element):
+        self._obj._comp.elements.append(element)
+
+    def setCompleteData(self, count):
+        self._obj._comp.complete = count
+
+    def getElements(self, elements):
+        elements.extend(self._obj._comp.ids())
+
+    def elementCount(self):
+        return len(self._obj._comp.ids())
+
+
+class MFnMesh(object):
+    def __init__(self, dagPath):
+        self._mesh = scene.findNode(dagPath.partialPathName())
+
+    def numVertices(self):
+        return self._mesh.numVertices()
+
+    def getPoints(self, points, space=MSpace.kObject):
+        points.clear()
+        points.extend(MPoint(*p) for p in self._mesh.points)
+
+    def numPolygons(self):
+        return len(self._mesh.faces)
+
+    def numEdges(self):
+        return self._mesh.numEdges()
+
+    def getVertices(self, vertexCount, vertexList):
+        vertexCount.clear()
+        vertexList.clear()
+        for face in self._mesh.faces:
+            vertexCount.append(len(face))
+            vertexList.extend(face)
+
+
+class MPlug(object):
+    """
+    weightList / weights plug of a fake skin cluster
+    """
+    def __init__(self, other=None, attr=None):
+        self._cluster = other._cluster if isinstance(other, MPlug) else other
+        self._attr = other._attr if isinstance(other, MPlug) else attr
+        self._vertId = other._vertId if isinstance(other, MPlug) else 0
+        self._infId = other._infId if isinstance(other, MPlug) else 0
+
+    def attribute(self):
+        return self._attr
+
+    def numElements(self):
+        if self._attr == 'weightList':
+            return self._cluster.mesh.numVertices()
+        return len(self._cluster.existing(self._vertId))
+
+    def selectAncestorLogicalIndex(self, index, attr):
+        if attr == 'weightList':
+            self._vertId = index
+        else:
+            self._infId = index
+
+    def getExistingArrayAttributeIndices(self, indices):
+        del indices[:]
+        indices.extend(self._cluster.existing(self._vertId))
+        return len(indices)
+
+    def asDouble(self):
+        return self._cluster.columns[self._infId][self._vertId]
+
+
+class MSyntax(object):
+    kNoArg = 0
+    kBoolean = 1
+    kLong = 2
+    kDouble = 3
+    kString = 4
+
+    def __init__(self):
+        self.flags = {}
+        self.longFlags = {}
+        self.multiUse = set()
+
+    def addFlag(self, shortName, longName, *argTypes):
+        self.flags[shortName] = argTypes
+        self.longFlags[longName] = shortName
+
+    def makeFlagMultiUse(self, shortName):
+        self.multiUse.add(shortName)
+
+
+class MArgList(object):
+    def __init__(self):
+        self._args = []
+
+    def append(self, value):
+        self._args.append(value)
+
+    def length(self):
+        return len(self._args)
+
+    def asString(self, index):
+        return str(self._args[index])
+
+    def asInt(self, index):
+        return int(self._args[index])
+
+    def asDouble(self, index):
+        return float(self._args[index])
+
+    def asBool(self, index):
+        return self._args[index] in (True, 1, '1', 'true', 'on')
+
+
+class MArgDatabase(object):
+    def __init__(self, syntax, argList):
+        self._uses = {}
+        self.objects = []
+        args = [argList.asString(i) for i in range(argList.length())]
+        i = 0
+        while i < len(args):
+            flag = syntax.longFlags.get(args[i], args[i])
+            if flag not in syntax.flags:
+                self.objects.append(args[i])
+                i += 1
+                continue
+            count = len(syntax.flags[flag])
+            values = MArgList()
+            for value in args[i + 1:i + 1 + count]:
+                values.append(value)
+            if values.length() != count:
+                raise RuntimeError('Flag %s needs %d arguments' % (args[i], count))
+            if flag in self._uses and flag not in syntax.multiUse:
+                raise RuntimeError('Flag %s can only be used once' % args[i])
+            self._uses.setdefault(flag, []).append(values)
+            i += 1 + count
+
+    def isFlagSet(self, flag):
+        return flag in self._uses
+
+    def numberOfFlagUses(self, flag):
+        return len(self._uses.get(flag, ()))
+
+    def getFlagArgumentList(self, flag, use, argList):
+        for i in range(self._uses[flag][use].length()):
+            argList.append(self._uses[flag][use].asString(i))
+
+    def flagArgumentString(self, flag, index):
+        return self._uses[flag][0].asString(index)
+
+    def flagArgumentInt(self, flag, index):
+        return self._uses[flag][0].asInt(index)
+
+    def flagArgumentDouble(self, flag, index):
+        return self._uses[flag][0].asDouble(index)
+
+    def flagArgumentBool(self, flag, index):
+        return self._uses[flag][0].asBool(index)
+
+
+# ---- OpenMayaAnim ----
+
+class MFnSkinCluster(object):
+    def __init__(self, obj):
+        self._cluster = scene.clusters[obj._node]
+
+    def name(self):
+        return self._cluster.name
+
+    def influenceObjects(self, infDags):
+        infDags.clear()
+        for infName in self._cluster.infNames:
+            dagPath = MDagPath()
+            dagPath._name = infName
+            infDags.append(dagPath)
+        return len(infDags)
+
+    def indexForInfluenceObject(self, dagPath):
+        return self._cluster.infNames.index(dagPath.partialPathName())
+
+    def findPlug(self, attr):
+        return MPlug(self._cluster, attr)
+
+    def getWeights(self, dagPath, component, values, infCount):
+        columns = self._cluster.columns
+        values.clear()
+        for vertId in component._comp.ids():
+            values.extend(column[vertId] for column in columns)
+        infCount.value = len(columns)
+
+    def setWeights(self, dagPath, component, infIds, values, normalize=True, oldValues=None):
+        columns = [self._cluster.columns[infId] for infId in infIds]
+        numInfs = len(columns)
+        if oldValues is not None:
+            oldValues.clear()
+        for row, vertId in enumerate(component._comp.ids()):
+            for i, column in enumerate(columns):
+                if oldValues is not None:
+                    oldValues.append(column[vertId])
+                column[vertId] = values[row * numInfs + i]
+
+
+# ---- OpenMayaMPx ----
+
+class MPxCommand(object):
+    def __init__(self):
+        self._syntax = MSyntax()
+
+    def syntax(self):
+        return self._syntax
+
+    def isUndoable(self):
+        return False
+
+    def doIt(self, argList):
+        pass
+
+    def undoIt(self):
+        pass
+
+    def redoIt(self):
+        pass
+
+
+def asMPxPtr(obj):
+    return obj
+
+
+class MFnPlugin(object):
+    def __init__(self, mobject, vendor='', version='', apiVersion='Any'):
+        self.vendor = vendor
+        self.version = version
+
+    def registerCommand(self, name, creator, syntaxCreator=None):
+        commands[name] = (creator, syntaxCreator)
+
+    def deregisterCommand(self, name):
+        del commands[name]
+
+
+# ---- Install ----
+
+def _module(name, members):
+    module = types.ModuleType(name)
+    for member in members:
+        setattr(module, member.__name__, member)
+    sys.modules[name] = module
+    return module
+
+
+maya = None
+cmds = None
+mel = None
+
+
+def install():
+    """
+    Register the fake maya modules in sys.modules, real Maya modules are never replaced
+    """
+    global maya, cmds, mel
+    if 'maya' in sys.modules and not getattr(sys.modules['maya'], '_fake', False):
+        raise Exception('maya is already imported, the fake would shadow it')
+
+    maya = _module('maya', [])
+    maya._fake = True
+    cmds = _module('maya.cmds', [setAttr, getAttr, skinPercent, isConnected, skinCluster,
+                                 polyListComponentConversion, select, ls, objExists, undo])
+    mel = _module('maya.mel', [])
+    mel.eval = melEval
+    utils = _module('maya.utils', [executeDeferred, processDeferred])
+    om = _module('maya.OpenMaya', [MFn, MSpace, MObject, MIntArray, MDoubleArray, MStringArray, MDagPathArray,
+                                   MPointArray, MPoint, MScriptUtil, MDagPath, MSelectionList, MGlobal,
+                                   MFnSingleIndexedComponent, MFnMesh, MPlug, MSyntax, MArgList, MArgDatabase])
+    oma = _module('maya.OpenMayaAnim', [MFnSkinCluster])
+    ompx = _module('maya.OpenMayaMPx', [MPxCommand, asMPxPtr, MFnPlugin])
+
+    maya.cmds, maya.mel, maya.OpenMaya, maya.OpenMayaAnim, maya.OpenMayaMPx = cmds, mel, om, oma, ompx
+    maya.utils = utils
+    return maya
+
+
+def loadPlugin(module):
+    """
+    Register a plugin module's commands so mel.eval can run them
+    """
+    module.initializePlugin(MObject())
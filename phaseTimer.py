@@ -0,0 +1,178 @@
+# ---- Phase timing ----
+# Named spans for the weight pipeline, each recording wall time plus vertex, weight and byte counts.
+# Spans with the same name are totalled per phase, finished spans are passed to listeners as event dicts
+# so a pipeline can track import / export cost per asset.
+# One phase can also be run under cProfile.
+# Nothing in here touches Maya.
+
+# ---- Usage ----
+# import phaseTimer
+# phaseTimer.addListener(lambda event: dashboard.send(event))
+# timer = phaseTimer.PhaseTimer(profilePhase='parse')
+# with timer.span('parse', mesh='body') as span:
+#     weights = weightFile.readWeights(fileName)
+#     span.add(verts=len(weights), weights=weights.numWeights)
+# timer.write('c:/weightsProfile.json')
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+kPhases = ('select', 'capture', 'parse', 'normalize', 'apply', 'serialize', 'write')
+
+_listeners = []
+
+
+def addListener(func):
+    """
+    Call func(event) for every span finished by any PhaseTimer
+    A failing listener is printed and never stops the timed work
+    """
+    if func not in _listeners:
+        _listeners.append(func)
+
+
+def removeListener(func):
+    if func in _listeners:
+        _listeners.remove(func)
+
+
+class Span(object):
+    """
+    One timed run of a phase
+    Numeric counts are totalled per phase, anything else is only kept on the event
+    """
+    def __init__(self, name, **counts):
+        self.name = name
+        self.counts = counts
+        self.start = time.time()
+        self.seconds = 0.0
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.counts[key] = self.counts.get(key, 0) + value
+            else:
+                self.counts[key] = value
+
+    def event(self):
+        event = dict(self.counts)
+        event.update({'phase': self.name, 'start': self.start, 'seconds': self.seconds})
+        return event
+
+
+class PhaseTimer(object):
+    """
+    Records spans, totals them per phase and runs profilePhase under cProfile
+    """
+    def __init__(self, profilePhase=None, listeners=None):
+        self.profilePhase = profilePhase
+        self.listeners = list(listeners or [])
+        self.events = []
+        self.totals = {}
+        self.profile = None
+
+    @contextlib.contextmanager
+    def span(self, name, **counts):
+        """
+        Time the body of a with block as one span of a phase
+        """
+        span = Span(name, **counts)
+        try:
+            with self.profiled(name):
+                yield span
+        finally:
+            span.seconds = time.time() - span.start
+            self.record(span)
+
+    @contextlib.contextmanager
+    def profiled(self, name):
+        """
+        Run the body of a with block under cProfile when name is profilePhase, without recording a span
+        """
+        if name != self.profilePhase:
+            yield
+            return
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+    def add(self, name, seconds, **counts):
+        """
+        Record a span timed elsewhere, for phases that are interleaved with each other
+        The pieces of such a phase should run under profiled(name) so profilePhase still sees them
+        """
+        span = Span(name, **counts)
+        span.start -= seconds
+        span.seconds = seconds
+        self.record(span)
+
+    def record(self, span):
+        total = self.totals.setdefault(span.name, {'calls': 0, 'seconds': 0.0})
+        total['calls'] += 1
+        total['seconds'] += span.seconds
+        for key, value in span.counts.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+
+        event = span.event()
+        self.events.append(event)
+        for listener in self.listeners + _listeners:
+            try:
+                listener(event)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def summary(self):
+        """
+        Get one line per phase, pipeline phases first
+        """
+        names = [name for name in kPhases if name in self.totals]
+        names.extend(sorted(name for name in self.totals if name not in kPhases))
+        lines = []
+        for name in names:
+            total = self.totals[name]
+            extra = ''.join(', %s %d' % (key, total[key]) for key in ('verts', 'weights', 'bytes') if key in total)
+            lines.append('%-10s %8.4f seconds, %d calls%s' % (name, total['seconds'], total['calls'], extra))
+        return lines
+
+    def profileStats(self, limit=30):
+        """
+        Get the cProfile report of profilePhase, sorted by cumulative time
+        """
+        if self.profile is None:
+            return ''
+        stream = StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def report(self):
+        return {'totals': self.totals,
+                'events': self.events,
+                'profilePhase': self.profilePhase}
+
+    def write(self, fileName):
+        """
+        Write the report as JSON, and profilePhase's raw cProfile stats next to it as <name>.<phase>.prof
+        """
+        with open(fileName, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+        if self.profile is not None:
+            profileName = '%s.%s.prof' % (os.path.splitext(fileName)[0], self.profilePhase)
+            self.profile.dump_stats(profileName)
+            return fileName, profileName
+        return fileName, None
@@ -1,6 +1,8 @@
 import maya.cmds as cmds
 import maya.mel as mel
 
+import controlShapes
+
 cmds.select(all=1)
 cmds.delete()
 
@@ -35,7 +37,7 @@ def flexiPlaneSetup(prefix='flexiPlane', numJoints=5):
     squareCons = ['%s_cnt_a01' % prefix, '%s_cnt_b01' % prefix, '%s_midBend01' % prefix]
 
     for squareCon in squareCons:
-        squareCon = cmds.curve(n=squareCon, d=1, p=[(-1, 0, -1), (1, 0, -1), (1, 0, 1), (-1, 0, 1), (-1, 0, -1)])
+        squareCon = cmds.curve(n=squareCon, **controlShapes.curveArgs('square'))
         cmds.scale(.75, .75, .75, squareCon, r=1)
         cmds.setAttr('%s.overrideEnabled' % squareCon, 1)
         cmds.setAttr('%s.overrideColor' % squareCon, 17)
@@ -0,0 +1,205 @@
+# ---- Rig build graph ----
+# Builds a rig as components in dependency order and on later runs rebuilds only what changed.
+# A rig description, JSON or YAML, lists components by name with a type, settings and the components they
+# depend on. Settings at the top of the description are shared by every component and overridden by its own.
+# A component's hash covers its type, settings, what it reads from the scene and its dependencies' hashes,
+# so changing one setting rebuilds that component and everything downstream of it and nothing else.
+# Nothing in here touches Maya, the component types registered by a rig module do the scene work.
+
+# ---- Component types ----
+# registerType(name, build, read=None, compute=None)
+#   read(component) runs first for every component on the calling thread and returns the JSON-able scene data
+#   its hash and math need
+#   compute(component, data) runs only for changed components, all of them at once on a thread pool,
+#   it's math only and mustn't touch the scene
+#   build(component, data, computed, inputs) runs on the calling thread in dependency order,
+#   inputs maps each dependency's name to its outputs, it returns (nodes, outputs),
+#   nodes are handed to the teardown function before the component is rebuilt
+# A rig module passes its scene helpers as context, every component gets them as component.context.
+# With a tracker, a context manager yielding a list it fills with the nodes created inside it, a build that
+# fails partway has what it created so far handed to teardown before the error is raised again.
+
+# ---- Usage ----
+# graph = rigGraph.RigGraph(rigGraph.loadDescription('c:/rigs/arm.json'), context=myUtils)
+# state = graph.run(previousState, teardown=myUtils.deleteNodes, tracker=myUtils.trackNodes)
+# print graph.rebuilt
+
+# ---- Description ----
+# {"name": "l_arm",
+#  "settings": {"prefix": "l_"},
+#  "components": [{"name": "ikJoints", "type": "joints", "settings": {"suffix": "ik"}},
+#                 {"name": "ikControls", "type": "ikControls", "depends": ["ikJoints"]}]}
+
+import hashlib
+import json
+import os
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+import workerPool
+
+kStateVersion = 1
+
+_types = {}
+
+
+class ComponentType(object):
+    def __init__(self, name, build, read=None, compute=None):
+        self.name = name
+        self.build = build
+        self.read = read
+        self.compute = compute
+
+
+def registerType(name, build, read=None, compute=None):
+    """
+    Add a component type, see the Component types section
+    """
+    _types[name] = ComponentType(name, build, read, compute)
+
+
+def loadDescription(fileName):
+    """
+    Read a rig description, .yaml and .yml files need PyYAML
+    """
+    with open(fileName) as f:
+        if os.path.splitext(fileName)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise Exception('PyYAML is needed to read %s' % fileName)
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class Component(object):
+    """
+    One step of a rig build, settings include the description's shared settings
+    """
+    def __init__(self, name, typeName, settings=None, depends=None, context=None):
+        if typeName not in _types:
+            raise Exception('Unknown component type: %s' % typeName)
+        self.name = name
+        self.type = _types[typeName]
+        self.settings = settings or {}
+        self.depends = list(depends or [])
+        self.context = context
+
+    def __repr__(self):
+        return 'Component(%r, %r)' % (self.name, self.type.name)
+
+
+class RigGraph(object):
+    """
+    Components of one rig description in dependency order
+    state is kept current as the run goes, so a failed run can still be saved and picked up again
+    """
+    def __init__(self, description, context=None):
+        self.name = description.get('name', 'rig')
+        shared = description.get('settings', {})
+        self.components = {}
+        self.names = []
+        for entry in description.get('components', []):
+            if entry['name'] in self.components:
+                raise Exception('Component %s is described twice' % entry['name'])
+            settings = dict(shared)
+            settings.update(entry.get('settings', {}))
+            self.components[entry['name']] = Component(entry['name'], entry['type'], settings,
+                                                     entry.get('depends'), context)
+            self.names.append(entry['name'])
+        self.order = self.sortComponents()
+        self.state = None
+        self.rebuilt = []
+
+    def sortComponents(self):
+        """
+        Get the components with every dependency before its dependents, in description order otherwise
+        """
+        order = []
+        visiting = set()
+        done = set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name not in self.components:
+                raise Exception('%s depends on unknown component %s' % (path[-1], name))
+            if name in visiting:
+                raise Exception('Components depend on each other: %s' % ' -> '.join(path + [name]))
+            visiting.add(name)
+            for depend in self.components[name].depends:
+                visit(depend, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            order.append(self.components[name])
+
+        for name in self.names:
+            visit(name, [])
+        return order
+
+    def hashComponent(self, component, data, hashes):
+        content = json.dumps({'type': component.type.name,
+                              'settings': component.settings,
+                              'data': data,
+                              'depends': [hashes[depend] for depend in component.depends]}, sort_keys=True)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def run(self, state=None, teardown=None, workers=None, force=False, tracker=None):
+        """
+        Build every component whose hash differs from state, or all of them when forced, and get the new state
+        Changed components are torn down dependents first, so their nodes are gone before anything is rebuilt
+        Components that are no longer described are torn down too
+        A component that fails is torn down through tracker, the ones built before it stay in state
+        """
+        previous = dict((state or {}).get('components', {}))
+        self.state = {'version': kStateVersion, 'name': self.name, 'components': previous}
+        self.rebuilt = []
+
+        data, hashes, dirty = {}, {}, []
+        for component in self.order:
+            data[component.name] = component.type.read(component) if component.type.read else None
+            hashes[component.name] = self.hashComponent(component, data[component.name], hashes)
+            old = previous.get(component.name)
+            if force or old is None or old['hash'] != hashes[component.name]:
+                dirty.append(component)
+
+        stale = [name for name in previous if name not in self.components]
+        stale += [component.name for component in reversed(dirty) if component.name in previous]
+        for name in stale:
+            if teardown is not None:
+                teardown(previous[name]['nodes'])
+            del previous[name]
+
+        computeJobs = [(component, data[component.name]) for component in dirty if component.type.compute]
+        computed = dict(zip([component.name for component, componentData in computeJobs],
+                            workerPool.mapPool(_computeJob, computeJobs, workers)))
+
+        outputs = dict((name, entry['outputs']) for name, entry in previous.items())
+        for component in dirty:
+            inputs = dict((depend, outputs[depend]) for depend in component.depends)
+            nodes, outputs[component.name] = self.buildComponent(component, data[component.name],
+                                                                 computed.get(component.name), inputs,
+                                                                 teardown, tracker)
+            previous[component.name] = {'hash': hashes[component.name],
+                                        'nodes': list(nodes),
+                                        'outputs': outputs[component.name]}
+            self.rebuilt.append(component.name)
+        return self.state
+
+    def buildComponent(self, component, data, computed, inputs, teardown=None, tracker=None):
+        if tracker is None:
+            return component.type.build(component, data, computed, inputs)
+        created = []
+        try:
+            with tracker() as created:
+                return component.type.build(component, data, computed, inputs)
+        except Exception:
+            if teardown is not None and created:
+                teardown(created)
+            raise
+
+
+def _computeJob(job):
+    component, data = job
+    return component.type.compute(component, data)
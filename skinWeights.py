@@ -0,0 +1,718 @@
+# ---- Sparse skin weight table ----
+# Skin weights are stored CSR style, one row per vertex:
+# the weights of vertIds[row] are infIds/weights[offsets[row]:offsets[row + 1]]
+# Tables may also carry world positions, a flat [x, y, z...] array with one point per row.
+# Arrays are numpy arrays when numpy is available, array.array otherwise.
+# Nothing in here touches Maya.
+
+import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from spatialIndex import KDTree, SpatialHash, kTolerance
+
+# (array typecode, numpy dtype)
+kVertIdType = ('I', '<u4')
+kOffsetType = ('I', '<u4')
+kInfIdType = ('H', '<u2')
+kWeightType = ('d', '<f8')
+
+
+def asArray(values, arrayType):
+    """
+    Convert a sequence to the array type used for storage
+    """
+    typeCode, dtype = arrayType
+    if np is not None:
+        if isinstance(values, array.array):
+            return np.frombuffer(values, dtype=values.typecode) if len(values) else np.zeros(0, dtype)
+        return np.asarray(values, dtype=dtype)
+    if isinstance(values, array.array) and values.typecode == typeCode:
+        return values
+    return array.array(typeCode, values)
+
+
+class SkinWeights(object):
+    """
+    Compressed sparse row skin weight table
+    """
+    def __init__(self, vertIds, offsets, infIds, weights, infNames=None, meshName='', positions=None):
+        self.vertIds = asArray(vertIds, kVertIdType)
+        self.offsets = asArray(offsets, kOffsetType)
+        self.infIds = asArray(infIds, kInfIdType)
+        self.weights = asArray(weights, kWeightType)
+        self.infNames = list(infNames or [])
+        self.meshName = meshName
+        self.positions = None
+        self._rows = None
+
+        if positions is not None:
+            self.setPositions(positions)
+
+        if len(self.offsets) != len(self.vertIds) + 1:
+            raise Exception('Expected %d offsets, found %d' % (len(self.vertIds) + 1, len(self.offsets)))
+        if len(self.infIds) != len(self.weights):
+            raise Exception('Influence ids and weights differ in length')
+
+    def setPositions(self, positions):
+        """
+        Set the world position of every row from a flat [x, y, z...] sequence
+        """
+        positions = asArray(positions, kWeightType)
+        if len(positions) != 3 * len(self.vertIds):
+            raise Exception('Expected %d position values, found %d' % (3 * len(self.vertIds), len(positions)))
+        self.positions = positions
+
+    @classmethod
+    def fromDict(cls, weights, infNames=None, meshName=''):
+        """
+        Build from a {vertId: {infId: weight}} dictionary
+        """
+        builder = SkinWeightsBuilder(infNames, meshName)
+        for vertId in sorted(weights, key=int):
+            vWeights = weights[vertId]
+            infIds = sorted(vWeights, key=int)
+            builder.addVertex(int(vertId), [int(i) for i in infIds], [float(vWeights[i]) for i in infIds])
+        return builder.build()
+
+    @classmethod
+    def fromDense(cls, values, numInfs, vertIds=None, infNames=None, meshName='', threshold=0.0):
+        """
+        Build from a flat vertex major weight list, dropping weights at or below threshold
+        """
+        if not numInfs:
+            return cls([], [0], [], [], infNames, meshName)
+
+        if np is not None:
+            dense = np.asarray(values, dtype='f8').reshape(-1, numInfs)
+            mask = np.abs(dense) > threshold
+            rows, infIds = np.nonzero(mask)
+            offsets = np.zeros(len(dense) + 1, dtype=kOffsetType[1])
+            np.cumsum(mask.sum(axis=1), out=offsets[1:])
+            if vertIds is None:
+                vertIds = np.arange(len(dense))
+            return cls(vertIds, offsets, infIds, dense[rows, infIds], infNames, meshName)
+
+        numVerts = len(values) // numInfs
+        builder = SkinWeightsBuilder(infNames, meshName)
+        for row in range(numVerts):
+            rowValues = values[row * numInfs:(row + 1) * numInfs]
+            infIds = [i for i, w in enumerate(rowValues) if abs(w) > threshold]
+            builder.addVertex(row if vertIds is None else vertIds[row], infIds, [rowValues[i] for i in infIds])
+        return builder.build()
+
+    def __len__(self):
+        return len(self.vertIds)
+
+    def __iter__(self):
+        """
+        Yield (vertId, infIds, weights) for every vertex as python lists
+        """
+        vertIds = self.vertIds.tolist()
+        offsets = self.offsets.tolist()
+        infIds = self.infIds.tolist()
+        weights = self.weights.tolist()
+        for row, vertId in enumerate(vertIds):
+            start, end = offsets[row], offsets[row + 1]
+            yield vertId, infIds[start:end], weights[start:end]
+
+    @property
+    def numWeights(self):
+        return len(self.weights)
+
+    @property
+    def numInfluences(self):
+        """
+        Number of influence columns, from the influence names or the largest influence id
+        """
+        if self.infNames:
+            return len(self.infNames)
+        if not len(self.infIds):
+            return 0
+        return int(max(self.infIds)) + 1
+
+    def row(self, vertId):
+        """
+        Get the row index of a vertex id
+        """
+        if self._rows is None:
+            self._rows = dict((v, r) for r, v in enumerate(self.vertIds.tolist()))
+        return self._rows[vertId]
+
+    def vertex(self, vertId):
+        """
+        Get (infIds, weights) of a single vertex
+        """
+        row = self.row(vertId)
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.infIds[start:end], self.weights[start:end]
+
+    def slice(self, start, stop):
+        """
+        Get the rows start:stop as a new table
+        With numpy the influence and weight arrays are views, not copies
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        first, last = int(self.offsets[start]), int(self.offsets[stop])
+        if np is not None:
+            offsets = self.offsets[start:stop + 1] - self.offsets[start]
+        else:
+            offsets = [o - first for o in self.offsets[start:stop + 1]]
+        positions = None
+        if self.positions is not None:
+            positions = self.positions[3 * start:3 * stop]
+        return SkinWeights(self.vertIds[start:stop], offsets, self.infIds[first:last],
+                           self.weights[first:last], self.infNames, self.meshName, positions)
+
+    def take(self, rows):
+        """
+        Get the given rows, in the given order, as a new table
+        """
+        rows = list(rows)
+        if np is not None:
+            rows = np.asarray(rows, dtype='i8')
+            starts = self.offsets.astype('i8')[rows]
+            counts = self.offsets.astype('i8')[rows + 1] - starts
+            firsts = np.cumsum(counts) - counts
+            src = np.repeat(starts, counts) + np.arange(int(counts.sum())) - np.repeat(firsts, counts)
+            offsets = np.zeros(len(rows) + 1, dtype=kOffsetType[1])
+            np.cumsum(counts, out=offsets[1:])
+            positions = None
+            if self.positions is not None:
+                positions = self.positions.reshape(-1, 3)[rows].ravel()
+            return SkinWeights(self.vertIds[rows], offsets, self.infIds[src], self.weights[src],
+                               self.infNames, self.meshName, positions)
+
+        builder = SkinWeightsBuilder(self.infNames, self.meshName)
+        for row in rows:
+            start, end = self.offsets[row], self.offsets[row + 1]
+            position = None
+            if self.positions is not None:
+                position = self.positions[3 * row:3 * row + 3]
+            builder.addVertex(self.vertIds[row], self.infIds[start:end], self.weights[start:end], position)
+        return builder.build()
+
+    def subset(self, vertIds):
+        """
+        Get the rows of the given vertex ids that are in the table, in table order
+        """
+        if np is not None:
+            return self.take(np.nonzero(np.isin(self.vertIds, np.asarray(list(vertIds), dtype='i8')))[0])
+        wanted = set(vertIds)
+        return self.take([row for row, vertId in enumerate(self.vertIds) if vertId in wanted])
+
+    def rowIndices(self):
+        """
+        Get the row of every stored weight
+        """
+        if np is not None:
+            return np.repeat(np.arange(len(self)), np.diff(self.offsets.astype('i8')))
+
+        rows = array.array('I')
+        offsets = self.offsets
+        for row in range(len(self)):
+            rows.extend(array.array('I', [row]) * (offsets[row + 1] - offsets[row]))
+        return rows
+
+    def column(self, infId):
+        """
+        Get one influence's weight for every row, zero where the influence is unused
+        """
+        if np is not None:
+            mask = self.infIds == infId
+            column = np.zeros(len(self), dtype='f8')
+            column[self.rowIndices()[mask]] = self.weights[mask]
+            return column
+
+        column = array.array('d', [0.0]) * len(self)
+        for row, i, w in zip(self.rowIndices(), self.infIds, self.weights):
+            if i == infId:
+                column[row] = w
+        return column
+
+    def toDense(self, numInfs=None):
+        """
+        Get a rows x influences matrix
+        Returns a numpy array, or a list of array.array rows without numpy
+        """
+        if numInfs is None:
+            numInfs = self.numInfluences
+        if np is not None:
+            dense = np.zeros((len(self), numInfs), dtype='f8')
+            dense[self.rowIndices(), self.infIds] = self.weights
+            return dense
+
+        dense = [array.array('d', [0.0]) * numInfs for row in range(len(self))]
+        for row, i, w in zip(self.rowIndices(), self.infIds, self.weights):
+            dense[row][i] = w
+        return dense
+
+    def toDict(self):
+        """
+        Expand into the {vertId: {infId: weight}} layout
+        """
+        return dict((vertId, dict(zip(infIds, weights))) for vertId, infIds, weights in self)
+
+
+class SkinWeightsBuilder(object):
+    """
+    Append vertices one at a time then build a SkinWeights table
+    """
+    def __init__(self, infNames=None, meshName=''):
+        self.infNames = infNames
+        self.meshName = meshName
+        self.vertIds = array.array(kVertIdType[0])
+        self.offsets = array.array(kOffsetType[0], [0])
+        self.infIds = array.array(kInfIdType[0])
+        self.weights = array.array(kWeightType[0])
+        self.positions = array.array(kWeightType[0])
+
+    def addVertex(self, vertId, infIds, weights, position=None):
+        """
+        Add a vertex, positions are kept only if every vertex has one
+        """
+        self.vertIds.append(vertId)
+        self.infIds.extend(infIds)
+        self.weights.extend(weights)
+        self.offsets.append(len(self.weights))
+        if position is not None:
+            self.positions.extend(position)
+
+    def build(self):
+        positions = None
+        if len(self.vertIds) and len(self.positions) == 3 * len(self.vertIds):
+            positions = self.positions
+        return SkinWeights(self.vertIds, self.offsets, self.infIds, self.weights, self.infNames, self.meshName,
+                           positions)
+
+
+def joinWeights(tables, infNames=None, meshName=''):
+    """
+    Stack tables that share an influence order into one table, rows in the given order
+    Positions are kept when every table has them
+    """
+    tables = list(tables)
+    hasPositions = bool(tables) and all(t.positions is not None for t in tables)
+    if np is not None and tables:
+        counts = [int(t.offsets[-1]) for t in tables]
+        shifts = np.cumsum([0] + counts[:-1])
+        offsets = [np.zeros(1, dtype=kOffsetType[1])]
+        offsets.extend(t.offsets[1:].astype('i8') + shift for t, shift in zip(tables, shifts))
+        positions = None
+        if hasPositions:
+            positions = np.concatenate([t.positions for t in tables])
+        return SkinWeights(np.concatenate([t.vertIds for t in tables]), np.concatenate(offsets),
+                           np.concatenate([t.infIds for t in tables]),
+                           np.concatenate([t.weights for t in tables]), infNames, meshName, positions)
+
+    builder = SkinWeightsBuilder(infNames, meshName)
+    for table in tables:
+        for row, (vertId, infIds, values) in enumerate(table):
+            position = None
+            if hasPositions:
+                position = table.positions[3 * row:3 * row + 3]
+            builder.addVertex(vertId, infIds, values, position)
+    return builder.build()
+
+
+class ConditionStats(object):
+    """
+    Per vertex results of conditionWeights()
+    numBefore / numAfter = influence count before and after conditioning
+    sumBefore = weight sum before normalizing
+    maxPruned = largest weight removed from the vertex
+    """
+    def __init__(self, numBefore, numAfter, sumBefore, maxPruned):
+        self.numBefore = numBefore
+        self.numAfter = numAfter
+        self.sumBefore = sumBefore
+        self.maxPruned = maxPruned
+
+    def summary(self):
+        """
+        Get totals over every vertex
+        """
+        return {'vertices': len(self.numBefore),
+                'weightsBefore': int(sum(self.numBefore)),
+                'weightsAfter': int(sum(self.numAfter)),
+                'verticesChanged': sum(1 for b, a in zip(self.numBefore, self.numAfter) if b != a),
+                'maxPruned': float(max(self.maxPruned)) if len(self.maxPruned) else 0.0,
+                'maxSumError': float(max([abs(1.0 - s) for s in self.sumBefore] or [0.0]))}
+
+
+def conditionWeights(weights, maxInfluences=None, minWeight=0.0, maxWeight=None, normalize=True, quantize=None):
+    """
+    Condition every vertex of a SkinWeights table at once:
+    clamp weights to maxWeight, keep the maxInfluences largest weights, drop weights at or below minWeight,
+    renormalize to 1 and optionally quantize to 1 / quantize steps
+    A vertex whose weights are all at or below minWeight keeps its largest one rather than losing every influence
+    Quantizing pushes the rounding error onto each vertex's largest weight so sums stay at 1
+    Returns (SkinWeights, ConditionStats)
+    """
+    if np is not None:
+        return _conditionArrays(weights, maxInfluences, minWeight, maxWeight, normalize, quantize)
+
+    builder = SkinWeightsBuilder(weights.infNames, weights.meshName)
+    numBefore = array.array('I')
+    numAfter = array.array('I')
+    sumBefore = array.array('d')
+    maxPruned = array.array('d')
+
+    for row, (vertId, infIds, values) in enumerate(weights):
+        if maxWeight is not None:
+            values = [min(w, maxWeight) for w in values]
+        ranked = sorted(zip(values, infIds), key=lambda item: (-item[0], item[1]))
+        kept = ranked[:maxInfluences] if maxInfluences else ranked
+        kept = [(w, i) for w, i in kept if w > minWeight]
+        if not kept and ranked and ranked[0][0] > 0:
+            kept = ranked[:1]
+        pruned = [w for w, i in ranked if (w, i) not in kept]
+        total = sum(w for w, i in kept)
+
+        if normalize and total > 0:
+            kept = [(w / total, i) for w, i in kept]
+        if quantize and kept:
+            kept = [(round(w * quantize) / float(quantize), i) for w, i in kept]
+            if normalize:
+                kept[0] = (kept[0][0] + 1.0 - sum(w for w, i in kept), kept[0][1])
+            kept = [(w, i) for w, i in kept if w > 0]
+
+        kept.sort(key=lambda item: item[1])
+        position = None if weights.positions is None else weights.positions[3 * row:3 * row + 3]
+        builder.addVertex(vertId, [i for w, i in kept], [w for w, i in kept], position)
+        numBefore.append(len(infIds))
+        numAfter.append(len(kept))
+        sumBefore.append(sum(values))
+        maxPruned.append(max(pruned or [0.0]))
+
+    return builder.build(), ConditionStats(numBefore, numAfter, sumBefore, maxPruned)
+
+
+def _conditionArrays(weights, maxInfluences, minWeight, maxWeight, normalize, quantize):
+    numVerts = len(weights)
+    rows = weights.rowIndices()
+    infIds = weights.infIds.astype('i8')
+    values = weights.weights.astype('f8')
+    if maxWeight is not None:
+        values = np.minimum(values, maxWeight)
+
+    # Rank each weight within its vertex, largest first
+    order = np.lexsort((infIds, -values, rows))
+    rows, infIds, values = rows[order], infIds[order], values[order]
+    starts = weights.offsets.astype('i8')
+    rank = np.arange(len(rows)) - starts[rows]
+
+    keep = values > minWeight
+    if maxInfluences:
+        keep &= rank < maxInfluences
+    # Don't empty a vertex, its largest weight stays when everything else is pruned
+    empty = np.bincount(rows, keep, minlength=numVerts) == 0
+    keep |= (rank == 0) & (values > 0) & empty[rows]
+
+    numBefore = np.diff(starts)
+    sumBefore = np.bincount(rows, values, minlength=numVerts)
+    maxPruned = np.zeros(numVerts)
+    np.maximum.at(maxPruned, rows[~keep], values[~keep])
+
+    rows, infIds, values, rank = rows[keep], infIds[keep], values[keep], rank[keep]
+    if normalize:
+        sums = np.bincount(rows, values, minlength=numVerts)
+        sums[sums == 0] = 1.0
+        values = values / sums[rows]
+
+    if quantize:
+        values = np.round(values * quantize) / float(quantize)
+        if normalize:
+            # The largest weight of each vertex is still first, give it the rounding error
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = rows[1:] != rows[:-1]
+            error = 1.0 - np.bincount(rows, values, minlength=numVerts)
+            values[first] += error[rows[first]]
+        nonZero = values > 0
+        rows, infIds, values = rows[nonZero], infIds[nonZero], values[nonZero]
+
+    # Back to vertex then influence order
+    order = np.lexsort((infIds, rows))
+    rows, infIds, values = rows[order], infIds[order], values[order]
+    numAfter = np.bincount(rows, minlength=numVerts)
+    offsets = np.zeros(numVerts + 1, dtype=kOffsetType[1])
+    np.cumsum(numAfter, out=offsets[1:])
+
+    conditioned = SkinWeights(weights.vertIds, offsets, infIds, values, weights.infNames, weights.meshName,
+                              weights.positions)
+    return conditioned, ConditionStats(numBefore, numAfter, sumBefore, maxPruned)
+
+
+def transferWeights(source, targetPositions, targetVertIds=None, k=1, power=2.0, tree=None):
+    """
+    Map weights onto other points by position:
+    Each target point takes the weights of its k nearest source rows, blended by inverse distance ** power
+    Exact hits copy the source weights, blended rows are renormalized
+    A KDTree over the source positions can be passed in to reuse it
+    An empty source or no target points gives an empty table
+    """
+    if source.positions is None:
+        raise Exception('Weights have no positions to transfer from')
+    if not len(source) or not len(targetPositions):
+        return SkinWeights([], [0], [], [], source.infNames, source.meshName)
+
+    if tree is None:
+        tree = KDTree(source.positions)
+    neighbours, distances = tree.query(targetPositions, k)
+    numTargets = len(neighbours)
+    if targetVertIds is None:
+        targetVertIds = range(numTargets)
+
+    if np is not None:
+        return _transferArrays(source, neighbours, distances, targetVertIds, targetPositions, power)
+
+    builder = SkinWeightsBuilder(source.infNames, source.meshName)
+    offsets = source.offsets
+    for vertId, rows, dists in zip(targetVertIds, neighbours, distances):
+        blend = _inverseDistance(dists, power)
+        vWeights = {}
+        for row, amount in zip(rows, blend):
+            if not amount:
+                continue
+            start, end = offsets[row], offsets[row + 1]
+            for infId, w in zip(source.infIds[start:end], source.weights[start:end]):
+                vWeights[infId] = vWeights.get(infId, 0.0) + w * amount
+        total = sum(vWeights.values()) or 1.0
+        infIds = sorted(vWeights)
+        builder.addVertex(vertId, infIds, [vWeights[i] / total for i in infIds])
+
+    target = builder.build()
+    target.setPositions(targetPositions)
+    return target
+
+
+def _inverseDistance(distances, power):
+    for i, d in enumerate(distances):
+        if d == 0:
+            return [1.0 if j == i else 0.0 for j in range(len(distances))]
+    inverse = [1.0 / d ** power for d in distances]
+    total = sum(inverse)
+    return [w / total for w in inverse]
+
+
+def _transferArrays(source, neighbours, distances, targetVertIds, targetPositions, power):
+    neighbours = np.asarray(neighbours, dtype='i8').reshape(len(neighbours), -1)
+    distances = np.asarray(distances, dtype='f8').reshape(neighbours.shape)
+    numTargets, k = neighbours.shape
+
+    # Inverse distance blend per neighbour, exact hits take everything
+    with np.errstate(divide='ignore'):
+        blend = 1.0 / distances ** power
+    exact = distances == 0
+    hit = exact.any(axis=1)
+    blend[hit] = 0.0
+    blend[hit, exact[hit].argmax(axis=1)] = 1.0
+    blend /= blend.sum(axis=1)[:, None]
+
+    # Gather every weight of every neighbour row
+    starts = source.offsets.astype('i8')
+    counts = np.diff(starts)
+    targets, infIds, values = [], [], []
+    for j in range(k):
+        rows = neighbours[:, j]
+        rowCounts = counts[rows]
+        total = int(rowCounts.sum())
+        firsts = np.cumsum(rowCounts) - rowCounts
+        src = np.repeat(starts[rows], rowCounts) + np.arange(total) - np.repeat(firsts, rowCounts)
+        tgt = np.repeat(np.arange(numTargets), rowCounts)
+        targets.append(tgt)
+        infIds.append(source.infIds[src].astype('i8'))
+        values.append(source.weights[src] * blend[tgt, j])
+
+    # Sum duplicate influences per target
+    targets = np.concatenate(targets)
+    infIds = np.concatenate(infIds)
+    numInfs = int(infIds.max()) + 1 if len(infIds) else 1
+    keys, inverse = np.unique(targets * numInfs + infIds, return_inverse=True)
+    values = np.bincount(inverse, np.concatenate(values))
+    rows, infIds = keys // numInfs, keys % numInfs
+
+    keep = values > 0
+    rows, infIds, values = rows[keep], infIds[keep], values[keep]
+    sums = np.bincount(rows, values, minlength=numTargets)
+    sums[sums == 0] = 1.0
+    values = values / sums[rows]
+
+    offsets = np.zeros(numTargets + 1, dtype=kOffsetType[1])
+    np.cumsum(np.bincount(rows, minlength=numTargets), out=offsets[1:])
+    return SkinWeights(np.asarray(list(targetVertIds)), offsets, infIds, values, source.infNames,
+                       source.meshName, targetPositions)
+
+
+def parseNameRules(text):
+    """
+    Parse 'l_=r_, lf_=rt_' into [('l_', 'r_'), ('lf_', 'rt_')]
+    """
+    rules = []
+    for rule in text.replace(',', ' ').split():
+        if '=' not in rule:
+            raise Exception('Name rule %s should look like old=new' % rule)
+        old, new = rule.split('=', 1)
+        rules.append((old, new))
+    return rules
+
+
+def substituteName(name, rules):
+    """
+    Swap the first matching prefix of every dag path component, 'l_' -> 'r_' turns 'l_arm|l_elbow' into 'r_arm|r_elbow'
+    """
+    if not rules:
+        return name
+    parts = name.split('|')
+    for index, part in enumerate(parts):
+        for old, new in rules:
+            if part.startswith(old):
+                parts[index] = new + part[len(old):]
+                break
+    return '|'.join(parts)
+
+
+def shortName(name):
+    """
+    Strip dag path and namespaces from a node name
+    """
+    return name.rsplit('|', 1)[-1].rsplit(':', 1)[-1]
+
+
+def influenceMap(fileNames, targetNames, rules=None):
+    """
+    Map file influence ids to target influence ids by name, -1 where there is no match
+    Names are matched as given, then by short name, after applying the prefix rules
+    """
+    byName = dict((name, index) for index, name in enumerate(targetNames))
+    byShortName = {}
+    for index, name in enumerate(targetNames):
+        byShortName.setdefault(shortName(name), index)
+
+    mapping = []
+    for name in fileNames:
+        name = substituteName(name, rules)
+        mapping.append(byName.get(name, byShortName.get(shortName(name), -1)))
+    return mapping
+
+
+def missingInfluences(weights, targetNames, rules=None):
+    """
+    Get the names, after the prefix rules, of weighted influences with no match in targetNames
+    """
+    mapping = influenceMap(weights.infNames, targetNames, rules)
+    used = set(weights.infIds.tolist())
+    return [substituteName(name, rules) for fileId, name in enumerate(weights.infNames)
+            if fileId in used and mapping[fileId] < 0]
+
+
+def remapInfluences(weights, targetNames, rules=None):
+    """
+    Renumber a table's influences to match targetNames by name
+    Raises if a weighted influence has no match, see missingInfluences()
+    Influences that map onto the same target, through the rules or a shared short name, have their weights summed
+    """
+    missing = missingInfluences(weights, targetNames, rules)
+    if missing:
+        raise Exception('Influences not found: %s' % ', '.join(missing))
+
+    mapping = influenceMap(weights.infNames, targetNames, rules)
+    if np is not None:
+        infIds = np.asarray(mapping + [0], dtype='i8')[weights.infIds.astype('i8')]
+    else:
+        infIds = [mapping[i] for i in weights.infIds]
+
+    remapped = SkinWeights(weights.vertIds, weights.offsets, infIds, weights.weights, targetNames,
+                           weights.meshName, weights.positions)
+    return _sortRows(remapped)
+
+
+def mirrorInfluences(infNames, rules):
+    """
+    Map each influence id to its mirror influence id by name, influences without a mirror map to themselves
+    Rules are applied both ways, [('l_', 'r_')] swaps l_ and r_
+    """
+    rules = list(rules) + [(new, old) for old, new in rules]
+    mapping = influenceMap(infNames, infNames, rules)
+    return [mirrorId if mirrorId >= 0 else infId for infId, mirrorId in enumerate(mapping)]
+
+
+def mirrorWeights(weights, axis=0, positive=True, tolerance=kTolerance, rules=(('l_', 'r_'),)):
+    """
+    Mirror a table across the plane through the origin facing axis
+    Rows on the positive side, or the negative side when positive is False, are copied to the vertices at their
+    mirrored positions with influences swapped through rules, see mirrorInfluences()
+    Vertices within tolerance of the plane are left alone
+    Returns (table of the other side's new rows, vertex ids that found no mirror vertex)
+    """
+    if weights.positions is None:
+        raise Exception('Weights have no vertex positions to mirror by')
+
+    sign = 1.0 if positive else -1.0
+    infMap = mirrorInfluences(weights.infNames, rules)
+
+    if np is not None:
+        points = np.asarray(weights.positions, dtype='f8').reshape(-1, 3)
+        side = points[:, axis] * sign
+        sourceRows = np.nonzero(side >= -tolerance)[0]
+        targetRows = np.nonzero(side < -tolerance)[0]
+        mirrored = points[targetRows]
+        mirrored[:, axis] *= -1.0
+
+        matches = SpatialHash(points[sourceRows], tolerance).match(mirrored)
+        found = matches >= 0
+        rows = weights.take(sourceRows[matches[found]])
+        table = SkinWeights(weights.vertIds[targetRows[found]], rows.offsets,
+                            np.asarray(infMap + [0], dtype='i8')[rows.infIds.astype('i8')], rows.weights,
+                            weights.infNames, weights.meshName, points[targetRows[found]].ravel())
+        return _sortRows(table), weights.vertIds[targetRows[~found]]
+
+    points = [tuple(weights.positions[i:i + 3]) for i in range(0, len(weights.positions), 3)]
+    sourceRows = [row for row, p in enumerate(points) if p[axis] * sign >= -tolerance]
+    targetRows = [row for row, p in enumerate(points) if p[axis] * sign < -tolerance]
+    mirrored = [tuple(-c if i == axis else c for i, c in enumerate(points[row])) for row in targetRows]
+    matches = SpatialHash([points[row] for row in sourceRows], tolerance).match(mirrored)
+
+    builder = SkinWeightsBuilder(weights.infNames, weights.meshName)
+    unmatched = []
+    for row, match in zip(targetRows, matches):
+        if match < 0:
+            unmatched.append(weights.vertIds[row])
+            continue
+        start, end = weights.offsets[sourceRows[match]], weights.offsets[sourceRows[match] + 1]
+        builder.addVertex(weights.vertIds[row], [infMap[i] for i in weights.infIds[start:end]],
+                          weights.weights[start:end], points[row])
+    return _sortRows(builder.build()), unmatched
+
+
+def _sortRows(weights):
+    # Keep influence ids ascending within each row after a renumber
+    # Influences renumbered onto the same id share a row entry, their weights are summed
+    if np is not None:
+        rows = weights.rowIndices()
+        order = np.lexsort((weights.infIds, rows))
+        rows, infIds, values = rows[order], weights.infIds[order], weights.weights[order]
+        offsets = weights.offsets
+        if len(rows):
+            starts = np.flatnonzero(np.concatenate(([True], (rows[1:] != rows[:-1]) | (infIds[1:] != infIds[:-1]))))
+            if len(starts) < len(rows):
+                values = np.add.reduceat(values, starts)
+                rows, infIds = rows[starts], infIds[starts]
+                offsets = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(weights)))))
+        return SkinWeights(weights.vertIds, offsets, infIds, values, weights.infNames, weights.meshName,
+                           weights.positions)
+
+    builder = SkinWeightsBuilder(weights.infNames, weights.meshName)
+    for vertId, infIds, values in weights:
+        summed = {}
+        for i, w in zip(infIds, values):
+            summed[i] = summed.get(i, 0.0) + w
+        pairs = sorted(summed.items())
+        builder.addVertex(vertId, [i for i, w in pairs], [w for i, w in pairs])
+    sortedWeights = builder.build()
+    sortedWeights.positions = weights.positions
+    return sortedWeights
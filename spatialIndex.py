@@ -0,0 +1,235 @@
+# ---- Spatial index ----
+# Nearest neighbour lookups over 3d points, used to match vertices by position.
+# scipy's cKDTree is used when it is available, otherwise a pure python kd-tree.
+# SpatialHash matches points within a fixed tolerance, vectorized with numpy when it is available.
+# Its numpy path packs grid cells into int64 keys, when the grid is too big for that it falls back to the kd-tree.
+# Nothing in here touches Maya.
+
+import heapq
+import itertools
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+kLeafSize = 8
+kTolerance = 0.001
+# Largest packed cell key, with headroom for the neighbouring cell offsets
+kMaxCellKey = 2 ** 62
+
+
+def groupPoints(points):
+    """
+    Turn a flat [x, y, z, x, y, z...] sequence or a sequence of points into a list of (x, y, z) tuples
+    """
+    points = list(points)
+    if points and not hasattr(points[0], '__len__'):
+        return [tuple(points[i:i + 3]) for i in range(0, len(points), 3)]
+    return [tuple(p[:3]) for p in points]
+
+
+class KDTree(object):
+    """
+    kd-tree over 3d points
+    query() is O(log n) per point on well distributed data
+    """
+    def __init__(self, points, leafSize=kLeafSize):
+        self.points = groupPoints(points)
+        self.leafSize = leafSize
+        self._tree = None
+        self._root = None
+
+        if cKDTree is not None and self.points:
+            self._tree = cKDTree(self.points, leafsize=leafSize)
+        elif self.points:
+            self._root = self._build(list(range(len(self.points))))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indices):
+        # Leaves are lists of point indices, branches are (axis, split, left, right)
+        if len(indices) <= self.leafSize:
+            return indices
+
+        # Split on the widest axis
+        points = self.points
+        spans = [max(points[i][a] for i in indices) - min(points[i][a] for i in indices) for a in range(3)]
+        axis = spans.index(max(spans))
+        if not spans[axis]:
+            return indices
+
+        indices.sort(key=lambda i: points[i][axis])
+        mid = len(indices) // 2
+        split = points[indices[mid]][axis]
+        return (axis, split, self._build(indices[:mid]), self._build(indices[mid:]))
+
+    def nearest(self, point, k=1):
+        """
+        Get the k nearest points to a point as ([index...], [distance...]), closest first
+        """
+        k = min(k, len(self.points))
+        if not k:
+            return [], []
+
+        if self._tree is not None:
+            distances, indices = self._tree.query(point[:3], k=k)
+            if k == 1:
+                return [int(indices)], [float(distances)]
+            return [int(i) for i in indices], [float(d) for d in distances]
+
+        # Max heap of (-distance squared, index)
+        heap = []
+        self._search(self._root, tuple(point[:3]), k, heap)
+        found = sorted((-d, i) for d, i in heap)
+        return [i for d, i in found], [math.sqrt(d) for d, i in found]
+
+    def _search(self, node, point, k, heap):
+        if isinstance(node, list):
+            points = self.points
+            for i in node:
+                p = points[i]
+                d = (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d, i))
+                elif d < -heap[0][0]:
+                    heapq.heapreplace(heap, (-d, i))
+            return
+
+        axis, split, left, right = node
+        delta = point[axis] - split
+        near, far = (left, right) if delta < 0 else (right, left)
+        self._search(near, point, k, heap)
+        if len(heap) < k or delta * delta < -heap[0][0]:
+            self._search(far, point, k, heap)
+
+    def query(self, points, k=1):
+        """
+        Get the k nearest points for many points as ([[index...]...], [[distance...]...])
+        """
+        points = groupPoints(points)
+        k = min(k, len(self.points))
+        if self._tree is not None and points and k:
+            distances, indices = self._tree.query(points, k=k)
+            if k == 1:
+                return [[int(i)] for i in indices], [[float(d)] for d in distances]
+            return [[int(i) for i in row] for row in indices], [[float(d) for d in row] for row in distances]
+
+        found = [self.nearest(p, k) for p in points]
+        return [f[0] for f in found], [f[1] for f in found]
+
+
+class SpatialHash(object):
+    """
+    Uniform grid of tolerance sized cells over 3d points
+    match() only looks in the 27 cells around a point so it is O(1) per point
+    """
+    def __init__(self, points, tolerance=kTolerance):
+        self.tolerance = tolerance
+        if np is not None:
+            self.points = np.asarray(points, dtype='f8').reshape(-1, 3)
+            self._cells = _gridCells(self.points, tolerance)
+        else:
+            self.points = groupPoints(points)
+            self._grid = {}
+            for index, point in enumerate(self.points):
+                self._grid.setdefault(self._cell(point), []).append(index)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, point):
+        return tuple(int(math.floor(c / self.tolerance)) for c in point)
+
+    def match(self, points):
+        """
+        Get the index of the closest point within tolerance of each point, -1 where there is none
+        """
+        if np is not None:
+            return self._matchArrays(np.asarray(points, dtype='f8').reshape(-1, 3))
+
+        tolerance = self.tolerance * self.tolerance
+        matches = []
+        for point in groupPoints(points):
+            cell = self._cell(point)
+            best, bestDistance = -1, tolerance
+            for offset in itertools.product((-1, 0, 1), repeat=3):
+                for index in self._grid.get(tuple(c + o for c, o in zip(cell, offset)), ()):
+                    p = self.points[index]
+                    d = (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2
+                    if d <= bestDistance and (best < 0 or d < bestDistance):
+                        best, bestDistance = index, d
+            matches.append(best)
+        return matches
+
+    def _matchArrays(self, query):
+        # Cells become single integer keys, a neighbouring cell is a constant key offset away
+        # so the query keys are sorted once and stay sorted for every offset
+        best = np.full(len(query), -1, dtype='i8')
+        if not len(query) or not len(self.points):
+            return best
+
+        queryCells = _gridCells(query, self.tolerance)
+        if self._cells is None or queryCells is None:
+            return self._matchTree(query)
+        low = np.minimum(self._cells.min(0), queryCells.min(0)) - 1
+        span = np.maximum(self._cells.max(0), queryCells.max(0)) + 2 - low
+        # Python ints so the check itself can't overflow
+        if int(span[0]) * int(span[1]) * int(span[2]) >= kMaxCellKey:
+            return self._matchTree(query)
+
+        def keys(cells):
+            cells = cells - low
+            return (cells[:, 0] * span[1] + cells[:, 1]) * span[2] + cells[:, 2]
+
+        pointKeys = keys(self._cells)
+        order = np.argsort(pointKeys, kind='mergesort')
+        sortedKeys = pointKeys[order]
+
+        queryKeys = keys(queryCells)
+        queryOrder = np.argsort(queryKeys, kind='mergesort')
+        queryKeys = queryKeys[queryOrder]
+        query = query[queryOrder]
+        found = np.full(len(query), -1, dtype='i8')
+        bestDistance = np.full(len(query), np.inf)
+
+        for x, y, z in itertools.product((-1, 0, 1), repeat=3):
+            offsetKeys = queryKeys + ((x * span[1] + y) * span[2] + z)
+            first = np.searchsorted(sortedKeys, offsetKeys, 'left')
+            counts = np.searchsorted(sortedKeys, offsetKeys, 'right') - first
+            # Cells rarely hold more than one point, walk the nth point of every cell together
+            for n in range(int(counts.max())):
+                rows = np.nonzero(counts > n)[0]
+                candidates = order[first[rows] + n]
+                distances = ((self.points[candidates] - query[rows]) ** 2).sum(1)
+                closer = distances < bestDistance[rows]
+                found[rows[closer]] = candidates[closer]
+                bestDistance[rows[closer]] = distances[closer]
+
+        found[bestDistance > self.tolerance * self.tolerance] = -1
+        best[queryOrder] = found
+        return best
+
+    def _matchTree(self, query):
+        # Points spread too far for packed cell keys, look up the nearest point with a kd-tree instead
+        indices, distances = KDTree(self.points.tolist()).query(query.tolist())
+        best = np.array([row[0] for row in indices], dtype='i8')
+        best[np.array([row[0] for row in distances]) > self.tolerance] = -1
+        return best
+
+
+def _gridCells(points, tolerance):
+    """
+    Get the integer grid cell of every point, None when a cell doesn't fit in a packed key
+    """
+    scaled = np.floor(points / tolerance)
+    if len(scaled) and not (np.isfinite(scaled).all() and np.abs(scaled).max() < kMaxCellKey // 4):
+        return None
+    return scaled.astype('i8')
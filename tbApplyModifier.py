@@ -0,0 +1,56 @@
+# ---- Undo support for utils.SceneBatch ----
+# Loaded by utils.loadBatchPlugin(), not by hand.
+# Scripts can't put an API modifier on Maya's undo queue, so SceneBatch.flush() runs this command,
+# which applies the pending batch and keeps its MDagModifier to undo and redo it.
+
+import sys
+
+import maya.OpenMayaMPx as ompx
+
+import utils
+
+kPluginCmdName = utils.kBatchCmdName
+
+
+class tbApplyModifier(ompx.MPxCommand):
+    def __init__(self):
+        ompx.MPxCommand.__init__(self)
+        self.modifier = None
+
+    def doIt(self, argList):
+        self.modifier = utils.popPendingBatch().apply()
+
+    def isUndoable(self):
+        return True
+
+    def undoIt(self):
+        self.modifier.undoIt()
+
+    def redoIt(self):
+        self.modifier.doIt()
+
+
+def cmdCreator():
+    """
+    Command Creator
+    """
+    return ompx.asMPxPtr(tbApplyModifier())
+
+
+def initializePlugin(mobject):
+    """ Load the command """
+    mplugin = ompx.MFnPlugin(mobject, 'Tom Banker', '1.0', 'Any')
+    try:
+        mplugin.registerCommand(kPluginCmdName, cmdCreator)
+    except Exception, e:
+        sys.stderr.write('Failed to register command: %s\n' % kPluginCmdName)
+        sys.stderr.write('%s\n' % e)
+
+
+def uninitializePlugin(mobject):
+    """ Unload the command """
+    mplugin = ompx.MFnPlugin(mobject)
+    try:
+        mplugin.deregisterCommand(kPluginCmdName)
+    except:
+        sys.stderr.write('Failed to unregister command: %s\n' % kPluginCmdName)
@@ -13,18 +13,93 @@
 # ---- Select Mesh ----
 # mel.eval('tbSaveSkinWeights -a "import" -f "c:/weights.xml"')
 
+# ---- Binary Weights ----
+# ---- Picked by a .tbw extension or the -fmt flag ----
+# mel.eval('tbSaveSkinWeights -a "export" -f "c:/weights.tbw"')
+# mel.eval('tbSaveSkinWeights -a "import" -fmt "binary" -f "c:/weights.dat"')
+
+# ---- Chunked Weights ----
+# ---- Picked by a .tbc extension or -fmt "chunked", compressed vertex blocks with an index for partial reads ----
+# mel.eval('tbSaveSkinWeights -a "export" -f "c:/weights.tbc"')
+
+# ---- Bulk Import ----
+# ---- Sets every weight with one MFnSkinCluster.setWeights call, undoable ----
+# mel.eval('tbSaveSkinWeights -a "import" -b -f "c:/weights.tbw"')
+
+# ---- Weight Conditioning ----
+# ---- Limit influences, prune small weights and quantize before export or import ----
+# mel.eval('tbSaveSkinWeights -a "export" -mi 4 -pw 0.001 -q 255 -f "c:/weights.tbw"')
+
+# ---- Position Based Import ----
+# ---- Match vertices by world position, blending the 4 nearest file vertices ----
+# mel.eval('tbSaveSkinWeights -a "import" -sp 4 -f "c:/weights.tbw"')
+
+# ---- Influence Remapping ----
+# ---- Influences are matched by name, -r swaps name prefixes and -ai adds missing influences ----
+# mel.eval('tbSaveSkinWeights -a "import" -r "l_=r_" -ai -f "c:/weights.tbw"')
+
+# ---- Many Meshes ----
+# ---- Select several meshes or pass -m per mesh, write one .zip archive or one file per mesh into a folder ----
+# mel.eval('tbSaveSkinWeights -a "export" -m "body" -m "head" -f "c:/character.zip"')
+# mel.eval('tbSaveSkinWeights -a "import" -fmt "binary" -f "c:/characterWeights"')
+# ---- -w sets the worker count, files are read and written on threads ----
+# ---- XML is pure python, with -w it goes to mayapy worker processes instead ----
+# mel.eval('tbSaveSkinWeights -a "export" -w 8 -fmt "xml" -f "c:/characterWeights"')
+
+# ---- Partial Weights ----
+# ---- Select vertices, edges or faces, or pass components with -m, only those vertices are written or set ----
+# mel.eval('tbSaveSkinWeights -a "export" -m "body.vtx[1200:1450]" -f "c:/hand.tbw"')
+# mel.eval('tbSaveSkinWeights -a "import" -f "c:/body.tbc"')
+
+# ---- Snapshots ----
+# ---- Checkpoint into a snapshot folder, only vertex blocks changed since the last snapshot are written ----
+# mel.eval('tbSaveSkinWeights -a "snapshot" -f "c:/weightSnapshots"')
+# mel.eval('tbSaveSkinWeights -a "restore" -sn "body.0003" -f "c:/weightSnapshots"')
+
+# ---- Mirror ----
+# ---- Copy +x side weights onto the -x side by mirrored vertex position, l_ and r_ influences swap by name ----
+# ---- -ax picks the source side (x, -x, y, -y, z, -z), -tol the position tolerance, -r the name rules ----
+# mel.eval('tbSaveSkinWeights -a "mirror" -ax "x" -tol 0.001 -r "l_=r_"')
+
+# ---- Smooth ----
+# ---- Laplacian smooth every influence at once, -it iterations of -st strength, selected vertices only if any ----
+# mel.eval('tbSaveSkinWeights -a "smooth" -it 10 -st 0.5')
+
+# ---- Background Export ----
+# ---- Capture runs in the command, encoding and writing finish on a worker thread while Maya stays usable ----
+# ---- Progress and the finished message are printed on the main thread, see weightWriter.submit() ----
+# mel.eval('tbSaveSkinWeights -a "export" -bg -f "c:/weights.tbc"')
+
+# ---- Parse Cache ----
+# ---- Parsed files are kept for the session, -nc skips the cache, -sc writes a binary sidecar next to the file ----
+# mel.eval('tbSaveSkinWeights -a "import" -sc -f "c:/weights.xml"')
+
+# ---- Profiling ----
+# ---- Time every phase to a JSON report, -cp also runs one phase under cProfile ----
+# mel.eval('tbSaveSkinWeights -a "import" -pro "c:/importProfile.json" -cp "parse" -f "c:/weights.xml"')
+# Listeners get every phase event, see phaseTimer.addListener()
+
 # Code Resources: Nicholas Bolden, Tyler Thornock
 # TO DO: Add boiler plate
 
+import os
 import sys
-import time
-import xml.etree.cElementTree as cElement
 
 import maya.OpenMaya as om
 import maya.OpenMayaMPx as ompx
 import maya.OpenMayaAnim as oma
 import maya.cmds as cmds
 import maya.mel as mel
+import maya.utils as mutils
+
+import weightFile
+import weightCache
+import weightSmooth
+import weightWriter
+from phaseTimer import PhaseTimer
+from weightSnapshot import SnapshotStore
+from skinWeights import SkinWeights, SkinWeightsBuilder, conditionWeights, transferWeights
+from skinWeights import missingInfluences, parseNameRules, remapInfluences, mirrorWeights
 
 # Param Flags
 kTbSaveWeightsFileParam = 'file'
@@ -37,17 +112,83 @@ kTbSaveWeightsFileFlag = '-f'
 kTbSaveWeightsFileLongFlag = '-File'
 kTbSaveWeightsActionFlag = "-a"
 kTbSaveWeightsActionLongFlag = "-Action"
+kTbSaveWeightsFormatFlag = '-fmt'
+kTbSaveWeightsFormatLongFlag = '-Format'
+kTbSaveWeightsBulkFlag = '-b'
+kTbSaveWeightsBulkLongFlag = '-Bulk'
+kTbSaveWeightsMaxInfluencesFlag = '-mi'
+kTbSaveWeightsMaxInfluencesLongFlag = '-MaxInfluences'
+kTbSaveWeightsPruneFlag = '-pw'
+kTbSaveWeightsPruneLongFlag = '-PruneWeight'
+kTbSaveWeightsQuantizeFlag = '-q'
+kTbSaveWeightsQuantizeLongFlag = '-Quantize'
+kTbSaveWeightsSpatialFlag = '-sp'
+kTbSaveWeightsSpatialLongFlag = '-Spatial'
+kTbSaveWeightsAddInfluencesFlag = '-ai'
+kTbSaveWeightsAddInfluencesLongFlag = '-AddInfluences'
+kTbSaveWeightsRenameFlag = '-r'
+kTbSaveWeightsRenameLongFlag = '-Rename'
+kTbSaveWeightsMeshFlag = '-m'
+kTbSaveWeightsMeshLongFlag = '-Mesh'
+kTbSaveWeightsSnapshotFlag = '-sn'
+kTbSaveWeightsSnapshotLongFlag = '-Snapshot'
+kTbSaveWeightsProfileFlag = '-pro'
+kTbSaveWeightsProfileLongFlag = '-Profile'
+kTbSaveWeightsCProfileFlag = '-cp'
+kTbSaveWeightsCProfileLongFlag = '-CProfile'
+kTbSaveWeightsNoCacheFlag = '-nc'
+kTbSaveWeightsNoCacheLongFlag = '-NoCache'
+kTbSaveWeightsSidecarFlag = '-sc'
+kTbSaveWeightsSidecarLongFlag = '-Sidecar'
+kTbSaveWeightsAxisFlag = '-ax'
+kTbSaveWeightsAxisLongFlag = '-Axis'
+kTbSaveWeightsToleranceFlag = '-tol'
+kTbSaveWeightsToleranceLongFlag = '-Tolerance'
+
+kTbSaveWeightsIterationsFlag = '-it'
+kTbSaveWeightsIterationsLongFlag = '-Iterations'
+kTbSaveWeightsStrengthFlag = '-st'
+kTbSaveWeightsStrengthLongFlag = '-Strength'
+kTbSaveWeightsBackgroundFlag = '-bg'
+kTbSaveWeightsBackgroundLongFlag = '-Background'
+kTbSaveWeightsWorkersFlag = '-w'
+kTbSaveWeightsWorkersLongFlag = '-Workers'
+
+kMirrorAxes = {'x': 0, 'y': 1, 'z': 2}
+kMirrorRules = [('l_', 'r_')]
 
 class tbSaveSkinWeights(ompx.MPxCommand):
     def __init__(self):
         ompx.MPxCommand.__init__(self)
 
         self.defaultFileName = 'c:/weights.xml'
-        self.maxInfluences = 4
+        self.maxInfluences = None
         self.minWeight = 0
         self.maxWeight = 1
         self.skinCluster = 'skinCluster1'
-        self.weights = {}
+        self.weights = None
+        self.bulk = False
+        self.background = False
+        self.lastPercent = -1
+        self.undoable = False
+        self.condition = False
+        self.quantize = None
+        self.spatial = 0
+        self.addInfluences = False
+        self.nameRules = []
+        self.mirrorAxis = 'x'
+        self.tolerance = 0.001
+        self.iterations = 1
+        self.strength = 0.5
+        self.meshNames = []
+        self.components = {}
+        self.workers = None
+        self.bulkEdits = []
+        self.snapshotName = None
+        self.profileFile = None
+        self.timer = PhaseTimer()
+        self.cache = weightCache.sessionCache
+        self.sidecars = False
 
     def doIt(self, argList):
         argData = om.MArgDatabase(self.syntax(), argList)
@@ -55,6 +196,58 @@ class tbSaveSkinWeights(ompx.MPxCommand):
         # Check our flags
         fileFlagSet = argData.isFlagSet(kTbSaveWeightsFileFlag)
         actionFlagSet = argData.isFlagSet(kTbSaveWeightsActionFlag)
+        formatFlagSet = argData.isFlagSet(kTbSaveWeightsFormatFlag)
+        self.bulk = argData.isFlagSet(kTbSaveWeightsBulkFlag)
+        self.background = argData.isFlagSet(kTbSaveWeightsBackgroundFlag)
+        self.sidecars = argData.isFlagSet(kTbSaveWeightsSidecarFlag)
+        if argData.isFlagSet(kTbSaveWeightsWorkersFlag):
+            self.workers = argData.flagArgumentInt(kTbSaveWeightsWorkersFlag, 0)
+        if argData.isFlagSet(kTbSaveWeightsNoCacheFlag):
+            self.cache = None
+
+        self.addInfluences = argData.isFlagSet(kTbSaveWeightsAddInfluencesFlag)
+        if argData.isFlagSet(kTbSaveWeightsRenameFlag):
+            self.nameRules = parseNameRules(argData.flagArgumentString(kTbSaveWeightsRenameFlag, 0))
+
+        if argData.isFlagSet(kTbSaveWeightsAxisFlag):
+            self.mirrorAxis = argData.flagArgumentString(kTbSaveWeightsAxisFlag, 0).lower()
+            if self.mirrorAxis.lstrip('+-') not in kMirrorAxes:
+                raise Exception('Mirror axis should be x, y or z: %s' % self.mirrorAxis)
+        if argData.isFlagSet(kTbSaveWeightsToleranceFlag):
+            self.tolerance = argData.flagArgumentDouble(kTbSaveWeightsToleranceFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsIterationsFlag):
+            self.iterations = argData.flagArgumentInt(kTbSaveWeightsIterationsFlag, 0)
+        if argData.isFlagSet(kTbSaveWeightsStrengthFlag):
+            self.strength = argData.flagArgumentDouble(kTbSaveWeightsStrengthFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsSnapshotFlag):
+            self.snapshotName = argData.flagArgumentString(kTbSaveWeightsSnapshotFlag, 0)
+
+        if argData.isFlagSet(kTbSaveWeightsProfileFlag):
+            self.profileFile = argData.flagArgumentString(kTbSaveWeightsProfileFlag, 0)
+        if argData.isFlagSet(kTbSaveWeightsCProfileFlag):
+            self.timer = PhaseTimer(argData.flagArgumentString(kTbSaveWeightsCProfileFlag, 0))
+
+        self.meshNames = []
+        for i in range(argData.numberOfFlagUses(kTbSaveWeightsMeshFlag)):
+            meshArgs = om.MArgList()
+            argData.getFlagArgumentList(kTbSaveWeightsMeshFlag, i, meshArgs)
+            self.meshNames.append(meshArgs.asString(0))
+
+        if argData.isFlagSet(kTbSaveWeightsSpatialFlag):
+            self.spatial = argData.flagArgumentInt(kTbSaveWeightsSpatialFlag, 0)
+
+        # Any conditioning flag turns conditioning on
+        if argData.isFlagSet(kTbSaveWeightsMaxInfluencesFlag):
+            self.maxInfluences = argData.flagArgumentInt(kTbSaveWeightsMaxInfluencesFlag, 0)
+            self.condition = True
+        if argData.isFlagSet(kTbSaveWeightsPruneFlag):
+            self.minWeight = argData.flagArgumentDouble(kTbSaveWeightsPruneFlag, 0)
+            self.condition = True
+        if argData.isFlagSet(kTbSaveWeightsQuantizeFlag):
+            self.quantize = argData.flagArgumentInt(kTbSaveWeightsQuantizeFlag, 0)
+            self.condition = True
 
         if fileFlagSet:
             self.fileName = argData.flagArgumentString(kTbSaveWeightsFileFlag, 0)
@@ -64,75 +257,434 @@ class tbSaveSkinWeights(ompx.MPxCommand):
         if actionFlagSet:
             self._action = argData.flagArgumentString(kTbSaveWeightsActionFlag, 0)
 
+        if formatFlagSet:
+            self.fileFormat = argData.flagArgumentString(kTbSaveWeightsFormatFlag, 0)
+        elif weightFile.isArchive(self.fileName):
+            self.fileFormat = weightFile.kFormatBinary
+        else:
+            self.fileFormat = weightFile.formatFromFileName(self.fileName)
+
+        if self.fileFormat not in (weightFile.kFormatXml, weightFile.kFormatBinary, weightFile.kFormatChunked):
+            raise Exception('Unknown weights file format: %s' % self.fileFormat)
+
         self.main()
 
+    def isUndoable(self):
+        """
+        Only bulk imports are undoable, setAttr imports are undone by Maya itself
+        """
+        return self.undoable
+
+    def redoIt(self):
+        """
+        Apply the bulk weights prepared by bulkSetWeights(), keeping the prior weights for undo
+        """
+        for edit in self.bulkEdits:
+            oldWeights = om.MDoubleArray()
+            edit['skinFn'].setWeights(edit['meshDag'], edit['component'], edit['infIds'],
+                                      edit['weights'], False, oldWeights)
+            edit['oldWeights'] = oldWeights
+
+    def undoIt(self):
+        """
+        Restore the weights replaced by redoIt()
+        """
+        for edit in reversed(self.bulkEdits):
+            edit['skinFn'].setWeights(edit['meshDag'], edit['component'], edit['infIds'],
+                                      edit['oldWeights'], False)
+
     def main(self):
-        print 'Running main...'
+        print('Running main...')
+
+        with self.timer.span('select') as span:
+            meshNames = self.getMeshNames()
+            span.add(meshes=len(meshNames))
+        batch = len(meshNames) > 1 or weightFile.isArchive(self.fileName) or os.path.isdir(self.fileName)
 
         if self._action == 'export':
-            print 'Exporting weights...'
-            self.skinCluster = self.getSkinCluster()
-            self.infDags = self.getInfDags(self.skinCluster)
-            self.weights = self.saveWeights(self.infDags, self.skinCluster)
-            self.exportWeights(self.weights, self.fileName)
+            print('Exporting weights...')
+            # Capture runs on the main thread, writing can go to a worker pool
+            tables = [self.captureMesh(meshName, self.components.get(meshName)) for meshName in meshNames]
+            if self.background:
+                # Times are reported by exportDone() once the worker has written the files
+                self.exportBackground(tables, batch)
+                return
+            if batch:
+                self.exportMany(tables)
+            else:
+                self.exportWeights(tables[0], self.fileName)
 
         elif self._action == 'import':
-            print 'Importing weights...'
-            startTime = time.time()
-            self.selName = self.getSelString()
-            self.skinCluster = self.getSkinCluster()
+            print('Importing weights...')
+            # Files are parsed up front, in parallel for batches, then applied on the main thread
+            if batch:
+                tables = self.importMany(meshNames)
+            else:
+                self.selName = meshNames[0]
+                tables = [self.importWeights()]
+            for meshName, weights in zip(meshNames, tables):
+                self.applyWeights(meshName, weights)
+
+        elif self._action == 'snapshot':
+            print('Saving weight snapshots...')
+            store = SnapshotStore(self.fileName)
+            for meshName in meshNames:
+                weights = self.captureMesh(meshName)
+                with self.timer.span('write', mesh=meshName) as span:
+                    name, numBlocks, seconds = store.save(weights)
+                    span.add(blocks=numBlocks)
+                print('Snapshot %s wrote %d blocks in %g seconds' % (name, numBlocks, seconds))
+
+        elif self._action == 'mirror':
+            print('Mirroring weights...')
+            for meshName in meshNames:
+                self.mirrorMesh(meshName)
+
+        elif self._action == 'smooth':
+            print('Smoothing weights...')
+            for meshName in meshNames:
+                self.smoothMesh(meshName)
+
+        elif self._action == 'restore':
+            print('Restoring weight snapshots...')
+            store = SnapshotStore(self.fileName)
+            for meshName in meshNames:
+                name = self.snapshotName or store.latest(meshName)
+                if not name:
+                    raise Exception('No snapshots of %s in %s' % (meshName, self.fileName))
+                with self.timer.span('parse', mesh=meshName) as span:
+                    weights = store.load(name)
+                    span.add(verts=len(weights), weights=weights.numWeights)
+                self.applyWeights(meshName, weights)
+
+        # Bulk edits of every mesh are applied together so one undo restores them all
+        if self.bulkEdits:
+            self.undoable = True
+            with self.timer.span('apply', meshes=len(self.bulkEdits)):
+                self.redoIt()
+
+        self.reportTimes()
+        return
+
+    def reportTimes(self):
+        """
+        Print the per phase totals and write the profile report when -pro is set
+        """
+        for line in self.timer.summary():
+            print(line)
+        if self.timer.profile is not None:
+            print(self.timer.profileStats())
+        if self.profileFile:
+            fileName, profileName = self.timer.write(self.profileFile)
+            print('Wrote profile %s' % fileName)
+
+    def captureMesh(self, meshName, vertIds=None):
+        """
+        Capture and condition one mesh's weights, only the given vertices when vertIds is set
+        """
+        self.selName = meshName
+        with self.timer.span('capture', mesh=meshName) as span:
+            self.skinCluster = self.getSkinCluster(meshName)
             self.infDags = self.getInfDags(self.skinCluster)
-            self.infNames = self.getInfNames(self.infDags, self.skinCluster)
-            self.weights = self.importWeights()
-            self.normalizeWeights(self.selName, self.infNames, self.skinCluster)
-            self.setWeights(self.skinCluster, self.weights)
-            endTime = time.time()
-            print('Import weights took %g seconds' % (endTime - startTime))
+            weights = self.captureWeights(self.infDags, self.skinCluster, vertIds)
+            span.add(verts=len(weights), weights=weights.numWeights, path=self.capturePath)
+        if self.condition:
+            weights = self.conditionWeights(weights)
+        return weights
 
-        return
+    def applyWeights(self, meshName, weights):
+        """
+        Remap, match, condition and set one mesh's weights
+        With a component selection only the selected vertices are set and pruned
+        """
+        self.selName = meshName
+        self.skinCluster = self.getSkinCluster(meshName)
+        self.infDags = self.getInfDags(self.skinCluster)
+        self.infNames = self.getInfNames(self.infDags, self.skinCluster)
+        vertIds = self.components.get(meshName)
+        weights = self.remapWeights(self.skinCluster, weights)
+        if self.spatial:
+            weights = self.matchWeights(weights, self.spatial, vertIds)
+        elif vertIds is not None:
+            weights = weights.subset(vertIds)
+        if self.condition:
+            weights = self.conditionWeights(weights)
+        if self.bulk:
+            # Applied by redoIt() at the end of main()
+            with self.timer.span('apply', mesh=meshName, verts=len(weights), weights=weights.numWeights, bulk=True):
+                self.bulkSetWeights(self.skinCluster, weights)
+        else:
+            with self.timer.span('normalize', mesh=meshName):
+                selStrings = self.selName
+                if vertIds is not None:
+                    selStrings = self.getVertStrings(self.selName, vertIds)
+                self.normalizeWeights(selStrings, self.infNames, self.skinCluster)
+            with self.timer.span('apply', mesh=meshName, verts=len(weights), weights=weights.numWeights):
+                self.setWeights(self.skinCluster, weights)
+        self.weights = weights
+
+    def mirrorMesh(self, meshName):
+        """
+        Mirror one mesh's weights across its world space symmetry plane:
+        Vertices are matched by mirrored position through a spatial hash, see skinWeights.mirrorWeights()
+        The mirrored side is always set as one bulk edit
+        With a component selection only the selected target vertices are set
+        """
+        weights = self.captureMesh(meshName)
+        self.infNames = self.getInfNames(self.infDags, self.skinCluster)
+
+        with self.timer.span('mirror', mesh=meshName) as span:
+            mirrored, unmatched = mirrorWeights(weights, kMirrorAxes[self.mirrorAxis.lstrip('+-')],
+                                                not self.mirrorAxis.startswith('-'), self.tolerance,
+                                                self.nameRules or kMirrorRules)
+            vertIds = self.components.get(meshName)
+            if vertIds is not None:
+                mirrored = mirrored.subset(vertIds)
+            span.add(verts=len(mirrored), weights=mirrored.numWeights)
+
+        if len(unmatched):
+            print('%d vertices of %s have no mirror vertex within %g' % (len(unmatched), meshName, self.tolerance))
+
+        with self.timer.span('apply', mesh=meshName, verts=len(mirrored), weights=mirrored.numWeights, bulk=True):
+            self.bulkSetWeights(self.skinCluster, mirrored)
+        self.weights = mirrored
+
+    def smoothMesh(self, meshName):
+        """
+        Smooth one mesh's captured weights over its edges, see weightSmooth.smoothWeights()
+        The adjacency is cached per topology, the result is set as one bulk edit
+        With a component selection only the selected vertices change
+        """
+        weights = self.captureMesh(meshName)
+        self.infNames = self.getInfNames(self.infDags, self.skinCluster)
+
+        with self.timer.span('smooth', mesh=meshName) as span:
+            adjacency = self.getAdjacency(self.getMeshDag(meshName))
+            smoothed = weightSmooth.smoothWeights(weights, adjacency, self.iterations, self.strength,
+                                                  mask=self.components.get(meshName))
+            span.add(verts=len(smoothed), weights=smoothed.numWeights, iterations=self.iterations)
+
+        with self.timer.span('apply', mesh=meshName, verts=len(smoothed), weights=smoothed.numWeights, bulk=True):
+            self.bulkSetWeights(self.skinCluster, smoothed)
+        self.weights = smoothed
+
+    def getAdjacency(self, meshDag):
+        """
+        Get a mesh's vertex adjacency from one MFnMesh.getVertices() call, cached until the topology changes
+        The key hashes the polygon vertex lists, rewiring polygons without changing any count is still a miss
+        """
+        meshFn = om.MFnMesh(meshDag)
+        vertexCount = om.MIntArray()
+        vertexList = om.MIntArray()
+        meshFn.getVertices(vertexCount, vertexList)
+        vertexCount, vertexList = list(vertexCount), list(vertexList)
+        key = (meshDag.fullPathName(), meshFn.numVertices(), weightSmooth.connectivityHash(vertexCount, vertexList))
+
+        def build():
+            return weightSmooth.Adjacency.fromPolygons(key[1], vertexCount, vertexList)
+
+        return weightSmooth.cachedAdjacency(key, build)
 
     def setWeights(self, clusterNode, weights):
         """
-        Using a weight dictionary, set the object weights:
-        Parse through the weight dictionary and use setAttr to set weights
+        Using a SkinWeights table, set the object weights:
+        Parse through the weight table and use setAttr to set weights
         setAttr is a faster method than MFnSkinCluster.setWeights()
         setAttr gives free undo capabilities
         """
-        # Check for a weight dictionary
-        if not type(weights) is dict:
-            raise Exception("Weights dict not found")
-            return False
+        # Check for a weight table
+        if not isinstance(weights, SkinWeights):
+            raise Exception("Weights table not found")
 
         clusterName = clusterNode.name()
 
-        # Loop through the weights dictionary
-        for vertId, weightData in weights.items():
-            wlAttr = '%s.weightList[%s]' % (clusterName, vertId)
+        # Per influence attributes and connection checks, built once
+        matrixIds = self.getMatrixIds(clusterNode)
+        wAttrs = ['.weights[%d]' % matrixId for matrixId in matrixIds]
+        connected = self.getConnectedInfluences(clusterNode, matrixIds)
+
+        # Loop through the weight table
+        # Weights are already floats, see importWeights()
+        for vertId, infIds, infValues in weights:
+            wlAttr = '%s.weightList[%d]' % (clusterName, vertId)
+
+            # TODO: Check to make sure influence object weights add to 1
+            infValueSumCheck = round(sum(infValues), 2)
 
-            for infId, infValue in weightData.items():
-                wAttr = '.weights[%s]' % infId
+            for infId, infValue in zip(infIds, infValues):
+                wAttr = wAttrs[infId]
 
-                # TODO: Check to make sure influence object weights add to 1
-                a = [float(i) for i in weightData.values()]
-                infValueSumCheck = round(sum(a), 2)
-                b = self.infNames[int(infId)] + '.worldMatrix[0]'
-                c = clusterName + '.matrix[%d]' % int(infId)
                 # Check to make sure influence objects are connected to mesh
-                isConnectedCheck = cmds.isConnected(b, c)
+                isConnectedCheck = connected[infId]
 
                 if infValueSumCheck and isConnectedCheck:
                     # PRIMARY METHOD - VERY FAST
-                    cmds.setAttr(wlAttr + wAttr, float(infValue))
+                    cmds.setAttr(wlAttr + wAttr, infValue)
                 else:
                     # ALT METHOD - VERY SLOW
-                    cmds.skinPercent(clusterName, '%s.vtx[%d]' % (self.selName, int(vertId)),
-                                     transformValue=[(self.infNames[int(infId)], float(infValue))])
+                    cmds.skinPercent(clusterName, '%s.vtx[%d]' % (self.selName, vertId),
+                                     transformValue=[(self.infNames[infId], infValue)])
+
+        return True
+
+    def remapWeights(self, clusterNode, weights):
+        """
+        Renumber file influences to the skin cluster's influence order by name:
+        The name to index map is built once, see skinWeights.remapInfluences()
+        Missing influences raise unless addInfluences is set, then they are added in one skinCluster call
+        Files without influence names are assumed to be in the skin cluster's order
+        """
+        if not weights.infNames:
+            print('Weights file has no influence names, assuming skin cluster order')
+            # Copied rather than renamed in place, the table may be shared by the parse cache
+            return SkinWeights(weights.vertIds, weights.offsets, weights.infIds, weights.weights,
+                               list(self.infNames), weights.meshName, weights.positions)
+
+        missing = missingInfluences(weights, self.infNames, self.nameRules)
+        if missing and self.addInfluences:
+            print('Adding influences: %s' % ', '.join(missing))
+            cmds.skinCluster(clusterNode.name(), edit=True, addInfluence=missing, weight=0)
+            self.infDags = self.getInfDags(clusterNode)
+            self.infNames = self.getInfNames(self.infDags, clusterNode)
+
+        return remapInfluences(weights, self.infNames, self.nameRules)
+
+    def getMatrixIds(self, clusterNode):
+        """
+        Get the matrix / weights logical index of every influence
+        """
+        return [int(clusterNode.indexForInfluenceObject(self.infDags[i])) for i in range(self.infDags.length())]
+
+    def getConnectedInfluences(self, clusterNode, matrixIds):
+        """
+        Check once per influence that its worldMatrix drives the skin cluster
+        """
+        clusterName = clusterNode.name()
+        return [cmds.isConnected(infName + '.worldMatrix[0]', clusterName + '.matrix[%d]' % matrixId)
+                for infName, matrixId in zip(self.infNames, matrixIds)]
+
+    def matchWeights(self, weights, neighbours=1, vertIds=None):
+        """
+        Map file weights onto the selected mesh by vertex world position:
+        Each vertex blends the weights of its nearest file vertices, see skinWeights.transferWeights()
+        Only the given vertices are matched when vertIds is set
+        """
+        if weights.positions is None:
+            raise Exception('Weights file has no vertex positions, re-export it to import by position')
+
+        with self.timer.span('match', mesh=self.selName) as span:
+            meshDag = self.getMeshDag(self.selName)
+            if vertIds is None:
+                vertIds = range(om.MFnMesh(meshDag).numVertices())
+            positions = self.getPositions(meshDag, vertIds)
+            weights = transferWeights(weights, positions, vertIds, k=neighbours)
+            span.add(verts=len(vertIds))
+        print('Matched %d vertices by position' % len(vertIds))
+        return weights
+
+    def getPositions(self, meshDag, vertIds):
+        """
+        Get world positions of vertices as a flat [x, y, z...] list
+        """
+        points = om.MPointArray()
+        om.MFnMesh(meshDag).getPoints(points, om.MSpace.kWorld)
+        positions = []
+        for vertId in vertIds:
+            point = points[vertId]
+            positions.extend((point.x, point.y, point.z))
+        return positions
+
+    def conditionWeights(self, weights):
+        """
+        Limit influences, prune, renormalize and quantize the in memory weights:
+        Uses maxInfluences, minWeight, maxWeight and quantize, see skinWeights.conditionWeights()
+        """
+        with self.timer.span('condition', mesh=self.selName) as span:
+            weights, stats = conditionWeights(weights, maxInfluences=self.maxInfluences, minWeight=self.minWeight,
+                                              maxWeight=self.maxWeight, quantize=self.quantize)
+            summary = stats.summary()
+            span.add(verts=summary['vertices'], weights=summary['weightsAfter'])
+        print('Conditioned %d vertices, %d of %d weights kept, largest pruned weight %g' % (
+            summary['vertices'], summary['weightsAfter'], summary['weightsBefore'], summary['maxPruned']))
+        return weights
 
+    def bulkSetWeights(self, clusterNode, weights):
+        """
+        Using a SkinWeights table, set every weight at once:
+        Influence connections are checked once per influence instead of once per weight
+        The table is flattened into one vertex major MDoubleArray for MFnSkinCluster.setWeights()
+        The edit is queued and applied by redoIt(), which keeps the prior weights for undoIt()
+        """
+        if not isinstance(weights, SkinWeights):
+            raise Exception("Weights table not found")
+
+        clusterName = clusterNode.name()
+        numInfs = self.infDags.length()
+
+        # Check to make sure influence objects are connected to mesh
+        connected = self.getConnectedInfluences(clusterNode, self.getMatrixIds(clusterNode))
+        for infId in range(numInfs):
+            if not connected[infId]:
+                raise Exception('Influence %s is not connected to %s' % (self.infNames[infId], clusterName))
+
+        if len(weights.infIds) and max(weights.infIds) >= numInfs:
+            raise Exception('Weights file has more influences than %s' % clusterName)
+
+        # Dense vertex major weights, one value per vertex per influence
+        dense = weights.toDense(numInfs)
+        if hasattr(dense, 'ravel'):
+            values = dense.ravel().tolist()
+        else:
+            values = [w for row in dense for w in row]
+
+        # Applied with every other mesh's edit by redoIt()
+        self.bulkEdits.append({'skinFn': clusterNode,
+                               'meshDag': self.getMeshDag(self.selName),
+                               'component': self.getVertComponent(weights.vertIds.tolist()),
+                               'infIds': self.intArray(range(numInfs)),
+                               'weights': self.doubleArray(values)})
         return True
 
+    def getMeshDag(self, selName):
+        """
+        Get the shape dag path of a mesh
+        """
+        sel = om.MSelectionList()
+        sel.add(selName)
+        meshDag = om.MDagPath()
+        sel.getDagPath(0, meshDag)
+        meshDag.extendToShape()
+        return meshDag
+
+    def getVertComponent(self, vertIds):
+        """
+        Get a vertex component holding the given vertex ids
+        """
+        compFn = om.MFnSingleIndexedComponent()
+        component = compFn.create(om.MFn.kMeshVertComponent)
+        compFn.addElements(self.intArray(vertIds))
+        return component
+
+    def intArray(self, values):
+        """
+        Build an MIntArray from a list in one call
+        """
+        util = om.MScriptUtil()
+        util.createFromList(values, len(values))
+        return om.MIntArray(util.asIntPtr(), len(values))
+
+    def doubleArray(self, values):
+        """
+        Build an MDoubleArray from a list in one call
+        """
+        util = om.MScriptUtil()
+        util.createFromList(values, len(values))
+        return om.MDoubleArray(util.asDoublePtr(), len(values))
+
     def normalizeWeights(self, selName, infNames, clusterNode):
         """
         Remove non-zero weighting:
+        selName is the mesh, or a list of vertex strings to prune only those vertices, see getVertStrings()
         Temporarily removing weight normalization allows for a weight prune
         Weight pruning is done to remove all non-zero weighting
         Non-zero weighting is removed to compress object data (faster speed) and file size
@@ -156,17 +708,21 @@ class tbSaveSkinWeights(ompx.MPxCommand):
             # cmds.setAttr('%s.normalizeWeights' % clusterName, normalizeSetting)
             cmds.setAttr('%s.normalizeWeights' % clusterName, normalizeSetting)
 
-    def getSkinCluster(self):
+    def getSkinCluster(self, meshName=None):
         """
-        Get a selected object's skin cluster as a MFnSkinCluster
+        Get a mesh's skin cluster as a MFnSkinCluster
+        Without a mesh name the selected object is used
         """
         # Store selection in MSelectionList
         sel = om.MSelectionList()
-        om.MGlobal.getActiveSelectionList(sel)
+        if meshName is None:
+            om.MGlobal.getActiveSelectionList(sel)
 
-        # Check only one object selected
-        if not sel.length() == 1:
-            raise Exception("Select only one object")
+            # Check only one object selected
+            if not sel.length() == 1:
+                raise Exception("Select only one object")
+        else:
+            sel.add(meshName)
 
         # Find mesh's related skin cluster
         selObjs = []
@@ -179,6 +735,82 @@ class tbSaveSkinWeights(ompx.MPxCommand):
         skinFn = oma.MFnSkinCluster(clusterObj)
         return skinFn
 
+    def getMeshNames(self):
+        """
+        Get the meshes to work on, from -m flags or else every selected object
+        Selected components are stored per mesh in self.components as sorted vertex ids
+        """
+        sel = om.MSelectionList()
+        if self.meshNames:
+            for meshName in self.meshNames:
+                sel.add(meshName)
+        else:
+            om.MGlobal.getActiveSelectionList(sel)
+        if sel.isEmpty():
+            raise Exception("Select at least one object")
+
+        meshNames = []
+        self.components = {}
+        for i in range(sel.length()):
+            selObjs = []
+            sel.getSelectionStrings(i, selObjs)
+            meshName = selObjs[0].split('.')[0]
+            if meshName not in meshNames:
+                meshNames.append(meshName)
+
+            vertIds = self.getSelectedVertices(sel, i, selObjs)
+            if vertIds is not None:
+                vertIds.update(self.components.get(meshName, ()))
+                self.components[meshName] = vertIds
+
+        for meshName, vertIds in self.components.items():
+            self.components[meshName] = sorted(vertIds)
+            print('%s: %d selected vertices' % (meshName, len(vertIds)))
+        return meshNames
+
+    def getSelectedVertices(self, sel, index, selObjs):
+        """
+        Get the vertex ids of a selection item's component as a set, None for a whole object
+        Edge and face components are converted to their vertices
+        """
+        component = om.MObject()
+        try:
+            sel.getDagPath(index, om.MDagPath(), component)
+        except RuntimeError:
+            return None
+        if component.isNull():
+            return None
+
+        if component.apiType() != om.MFn.kMeshVertComponent:
+            vertSel = om.MSelectionList()
+            for vertString in cmds.polyListComponentConversion(selObjs, toVertex=True) or []:
+                vertSel.add(vertString)
+            vertIds = set()
+            for i in range(vertSel.length()):
+                vertIds.update(self.getSelectedVertices(vertSel, i, []) or ())
+            return vertIds
+
+        elements = om.MIntArray()
+        om.MFnSingleIndexedComponent(component).getElements(elements)
+        return set(elements)
+
+    def getVertStrings(self, meshName, vertIds):
+        """
+        Get vertex component strings for sorted vertex ids, runs of ids become one vtx[start:end] string
+        """
+        vertStrings = []
+        start = end = None
+        for vertId in vertIds:
+            if end is not None and vertId == end + 1:
+                end = vertId
+                continue
+            if start is not None:
+                vertStrings.append('%s.vtx[%d:%d]' % (meshName, start, end))
+            start = end = vertId
+        if start is not None:
+            vertStrings.append('%s.vtx[%d:%d]' % (meshName, start, end))
+        return vertStrings
+
     def getSelString(self):
         """
         Get Selected object as a selectionString to be passed around methods
@@ -203,19 +835,65 @@ class tbSaveSkinWeights(ompx.MPxCommand):
         Influence names are used to iterate through and normalize weights
         See normalizeWeights()
         """
-        infNames = [infDags[i].partialPathName() for i in xrange(infDags.length())]
+        infNames = [infDags[i].partialPathName() for i in range(infDags.length())]
         return infNames
 
-    def saveWeights(self, infDags, skinFn):
+    def captureWeights(self, infDags, skinFn, vertIds=None):
         """
-        Uses a dictionary to save mesh weights:
+        Capture mesh weights with a single getWeights() call when possible:
+        Meshes with missing weightList elements fall back to the plug walk in saveWeights()
+        Only the given vertices are captured when vertIds is set
+        """
+        meshDag = self.getMeshDag(self.selName)
+        numVerts = om.MFnMesh(meshDag).numVertices()
+        wlPlug = skinFn.findPlug('weightList')
+
+        if wlPlug.numElements() == numVerts:
+            self.capturePath = 'getWeights'
+            weights = self.getWeights(infDags, skinFn, meshDag, numVerts, vertIds)
+        else:
+            self.capturePath = 'plugs'
+            weights = self.saveWeights(infDags, skinFn, vertIds)
+
+        # Store positions so the file can be imported by position
+        weights.setPositions(self.getPositions(meshDag, weights.vertIds.tolist()))
+
+        print('Captured weights with %s' % self.capturePath)
+        return weights
+
+    def getWeights(self, infDags, skinFn, meshDag, numVerts, vertIds=None):
+        """
+        Uses MFnSkinCluster.getWeights() to save mesh weights:
+        Every weight comes back in one flat vertex major array, zeros are dropped by SkinWeights.fromDense()
+        """
+        if vertIds is None:
+            compFn = om.MFnSingleIndexedComponent()
+            component = compFn.create(om.MFn.kMeshVertComponent)
+            compFn.setCompleteData(numVerts)
+        else:
+            component = self.getVertComponent(vertIds)
+
+        values = om.MDoubleArray()
+        util = om.MScriptUtil()
+        util.createFromInt(0)
+        infCountPtr = util.asUintPtr()
+        skinFn.getWeights(meshDag, component, values, infCountPtr)
+        numInfs = om.MScriptUtil.getUint(infCountPtr)
+
+        return SkinWeights.fromDense(list(values), numInfs, vertIds=vertIds,
+                                     infNames=self.getInfNames(infDags, skinFn), meshName=self.selName)
+
+    def saveWeights(self, infDags, skinFn, vertIds=None):
+        """
+        Uses a SkinWeights table to save mesh weights:
+        Walks every weightList element, or only the given vertices when vertIds is set
         """
         # infIds dictionary:
         # keys = MPlug index id
         # values = influence list id
         infIds = {}
         infs = []
-        for i in xrange(infDags.length()):
+        for i in range(infDags.length()):
             infPath = infDags[i].fullPathName()
             infId = int(skinFn.indexForInfluenceObject(infDags[i]))
             infIds[infId] = i
@@ -228,14 +906,16 @@ class tbSaveSkinWeights(ompx.MPxCommand):
         wAttr = wPlug.attribute()
         wInfIds = om.MIntArray()
 
-        # weights dictionary:
-        # weights keys = vertex id
-        # weights values = a vertex weights dictionary:
-        # vWeights keys = influence id
-        # vWeights values = influence weight (value)
-        weights = {}
-        for vId in xrange(wlPlug.numElements()):
-            vWeights = {}
+        # weights table, one row per vertex:
+        # row infIds = influence list id
+        # row weights = influence weight (value)
+        if vertIds is None:
+            vertIds = range(wlPlug.numElements())
+
+        weights = SkinWeightsBuilder(self.getInfNames(infDags, skinFn), self.selName)
+        for vId in vertIds:
+            vInfIds = []
+            vWeights = []
             wPlug.selectAncestorLogicalIndex(vId, wlAttr)
             wPlug.getExistingArrayAttributeIndices(wInfIds)
             infPlug = om.MPlug(wPlug)
@@ -244,85 +924,135 @@ class tbSaveSkinWeights(ompx.MPxCommand):
                 infPlug.selectAncestorLogicalIndex(infId, wAttr)
 
                 try:
-                    vWeights[infIds[infId]] = infPlug.asDouble()
+                    vInfIds.append(infIds[infId])
                 except KeyError:
-                    pass
-            weights[vId] = vWeights
+                    continue
+                vWeights.append(infPlug.asDouble())
+            weights.addVertex(vId, vInfIds, vWeights)
 
-        return weights
+        return weights.build()
 
-    def importWeights(self, weights={}):
+    def importWeights(self):
         """
         Open the file
-        Create a weights dictionary
+        Create a SkinWeights table
+        Weights are read into packed arrays and converted to floats once while parsing
         """
-        startTime = time.time()
-        tree = cElement.parse(self.fileName)
-        root = tree.getroot()
-        mesh = root.find('mesh')
-
-        if mesh.attrib.get('name') != self.selName:
+        with self.timer.span('parse', mesh=self.selName, bytes=os.path.getsize(self.fileName)) as span:
+            # Position matching needs every file vertex, otherwise only the selected vertices are read
+            vertIds = None if self.spatial else self.components.get(self.selName)
+            if self.cache is not None:
+                fileWeights = self.cache.read(self.fileName, self.fileFormat, vertIds, self.sidecars)
+            else:
+                fileWeights = weightFile.readWeights(self.fileName, self.fileFormat, vertIds)
+            span.add(verts=len(fileWeights), weights=fileWeights.numWeights)
+
+        if not self.spatial and fileWeights.meshName != self.selName:
             raise Exception('Selected mesh does not match weights file mesh')
 
-        for vertId in mesh:
-            # print vertId.tag, vertId.attrib
-            index = vertId.get('index')
-            # print 'index:', index
-            weights[index] = {}
-            for inf in vertId:
-                attribs = {inf.get('idx'): inf.get('weight')}
-                # print attribs
-                weights[index].update(attribs)
-
-        endTime = time.time()
-        print('Read time was %g seconds' % (endTime - startTime))
-        return weights
+        return fileWeights
 
-    def exportWeights(self, weights={}, fileName=None, printPretty=True):
+    def importMany(self, meshNames):
         """
-        Generate an XML document
+        Read the weights of many meshes, parsing in parallel
+        From an archive, tables are matched to meshes by mesh name
+        From a folder, each mesh reads its own file, see weightFile.memberName()
         """
-        # TO DO: Add pretty print option flag - will build this into qt widget ui
-        
-        startTime = time.time()
-
-        # Write to XML using cElementTree
-        root = cElement.Element("root")
-        mesh = cElement.SubElement(root, 'mesh', {'name': self.selName})
-
-        for (vertId, subWeights) in weights.iteritems():
-            vertIdElem = cElement.SubElement(
-                mesh, 'vertId', {'index': str(vertId), 'path': '%s.vtx[%s]' % (self.selName, str(vertId))})
-            for (infIndex, infWeight) in subWeights.iteritems():
-                cElement.SubElement(vertIdElem, 'inf', {'idx': str(infIndex), 'weight': str(infWeight)})
-
-        endComment = cElement.Comment('eof')
-        root.append(endComment)
-
-        if not fileName:
-            fileName = self.defaultFileName
-
-        f = open(fileName, 'w')
+        with self.timer.span('parse', meshes=len(meshNames)) as span:
+            tables = self.readTables(meshNames)
+            span.add(verts=sum(len(weights) for weights in tables),
+                     weights=sum(weights.numWeights for weights in tables))
+        return tables
 
-        if printPretty:
-            f.write(self.prettify(root))
+    def readTables(self, meshNames):
+        """
+        Read the table of each mesh from an archive or a folder
+        """
+        if weightFile.isArchive(self.fileName):
+            fileTables = weightFile.readArchive(self.fileName, self.workers)
+            byName = dict((weights.meshName, weights) for weights in fileTables)
+            if self.spatial and len(fileTables) == 1 and len(meshNames) == 1:
+                byName = {meshNames[0]: fileTables[0]}
+            missing = [meshName for meshName in meshNames if meshName not in byName]
+            if missing:
+                raise Exception('No weights in %s for: %s' % (self.fileName, ', '.join(missing)))
+            tables = [byName[meshName] for meshName in meshNames]
+        else:
+            jobs = [(os.path.join(self.fileName, weightFile.memberName(meshName, self.fileFormat)), self.fileFormat,
+                     None if self.spatial else self.components.get(meshName))
+                    for meshName in meshNames]
+            if self.cache is not None:
+                tables = self.cache.readMany(jobs, self.workers, self.sidecars)
+            else:
+                tables = weightFile.readMany(jobs, self.workers)
+            for meshName, weights in zip(meshNames, tables):
+                if not self.spatial and weights.meshName != meshName:
+                    raise Exception('Weights file for %s holds %s' % (meshName, weights.meshName))
+        return tables
+
+    def exportBackground(self, tables, batch, printPretty=True):
+        """
+        Queue the captured tables on the background writer and return straight away
+        Progress and completion come back to the main thread through executeDeferred
+        """
+        if batch:
+            write = lambda progress: self.exportMany(tables, printPretty, progress)
         else:
-            cElement.ElementTree(root).write(f)
+            write = lambda progress: self.exportWeights(tables[0], self.fileName, printPretty, progress)
+        print('Writing %s in the background...' % self.fileName)
+        return weightWriter.submit(write, self.fileName, self.exportProgress, self.exportDone, mutils.executeDeferred)
 
-        f.close()
+    def exportProgress(self, done, total):
+        """
+        Print background export progress every 10 percent
+        """
+        percent = 100 * done // max(total, 1) // 10 * 10
+        if percent != self.lastPercent:
+            self.lastPercent = percent
+            print('Writing %s: %d%%' % (self.fileName, percent))
 
-        endTime = time.time()
-        print("Export weights took %g seconds" % (endTime - startTime))
+    def exportDone(self, task):
+        """
+        Report a finished background export
+        """
+        if task.error is not None:
+            om.MGlobal.displayError('Failed writing %s: %s' % (task.name, task.error))
+            return
+        om.MGlobal.displayInfo('Wrote %s in %.2f seconds' % (task.name, task.seconds))
+        self.reportTimes()
 
-    def prettify(self, elem):
-        """Return a pretty-printed XML string for the Element.
+    def exportMany(self, tables, printPretty=True, progress=None):
         """
-        from xml.etree import ElementTree
-        from xml.dom import minidom
+        Write the weights of many meshes, encoding in parallel
+        A .zip file name writes one archive, anything else is a folder of one file per mesh
+        Encoding and writing overlap on the pool so they are timed together as the write phase
+        progress(done, total) counts meshes written
+        """
+        with self.timer.span('write', meshes=len(tables), verts=sum(len(weights) for weights in tables),
+                             weights=sum(weights.numWeights for weights in tables)) as span:
+            if weightFile.isArchive(self.fileName):
+                weightFile.writeArchive(self.fileName, tables, self.fileFormat, printPretty, self.workers,
+                                        progress=progress)
+                span.add(bytes=os.path.getsize(self.fileName))
+            else:
+                if not os.path.isdir(self.fileName):
+                    os.makedirs(self.fileName)
+                jobs = [(os.path.join(self.fileName, weightFile.memberName(weights.meshName, self.fileFormat)),
+                         weights, self.fileFormat, printPretty) for weights in tables]
+                fileNames = weightFile.writeMany(jobs, self.workers, progress=progress)
+                span.add(bytes=sum(os.path.getsize(fileName) for fileName in fileNames))
+
+    def exportWeights(self, weights, fileName=None, printPretty=True, progress=None):
+        """
+        Generate an XML document
+        """
+        # TO DO: Add pretty print option flag - will build this into qt widget ui
+
+        if not fileName:
+            fileName = self.defaultFileName
 
-        rough_string = ElementTree.tostring(elem, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ")
+        # XML is streamed straight to disk, serialize and write are timed apart
+        weightFile.writeWeights(fileName, weights, self.fileFormat, printPretty, timer=self.timer, progress=progress)
 
 
 #--------------------------------------------------#
@@ -346,6 +1076,27 @@ def syntaxCreator():
     syntax = om.MSyntax()
     syntax.addFlag(kTbSaveWeightsFileFlag, kTbSaveWeightsFileLongFlag, om.MSyntax.kString)
     syntax.addFlag(kTbSaveWeightsActionFlag, kTbSaveWeightsActionLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsFormatFlag, kTbSaveWeightsFormatLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsBulkFlag, kTbSaveWeightsBulkLongFlag)
+    syntax.addFlag(kTbSaveWeightsMaxInfluencesFlag, kTbSaveWeightsMaxInfluencesLongFlag, om.MSyntax.kLong)
+    syntax.addFlag(kTbSaveWeightsPruneFlag, kTbSaveWeightsPruneLongFlag, om.MSyntax.kDouble)
+    syntax.addFlag(kTbSaveWeightsQuantizeFlag, kTbSaveWeightsQuantizeLongFlag, om.MSyntax.kLong)
+    syntax.addFlag(kTbSaveWeightsSpatialFlag, kTbSaveWeightsSpatialLongFlag, om.MSyntax.kLong)
+    syntax.addFlag(kTbSaveWeightsAddInfluencesFlag, kTbSaveWeightsAddInfluencesLongFlag)
+    syntax.addFlag(kTbSaveWeightsRenameFlag, kTbSaveWeightsRenameLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsMeshFlag, kTbSaveWeightsMeshLongFlag, om.MSyntax.kString)
+    syntax.makeFlagMultiUse(kTbSaveWeightsMeshFlag)
+    syntax.addFlag(kTbSaveWeightsSnapshotFlag, kTbSaveWeightsSnapshotLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsProfileFlag, kTbSaveWeightsProfileLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsCProfileFlag, kTbSaveWeightsCProfileLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsNoCacheFlag, kTbSaveWeightsNoCacheLongFlag)
+    syntax.addFlag(kTbSaveWeightsSidecarFlag, kTbSaveWeightsSidecarLongFlag)
+    syntax.addFlag(kTbSaveWeightsAxisFlag, kTbSaveWeightsAxisLongFlag, om.MSyntax.kString)
+    syntax.addFlag(kTbSaveWeightsIterationsFlag, kTbSaveWeightsIterationsLongFlag, om.MSyntax.kLong)
+    syntax.addFlag(kTbSaveWeightsStrengthFlag, kTbSaveWeightsStrengthLongFlag, om.MSyntax.kDouble)
+    syntax.addFlag(kTbSaveWeightsToleranceFlag, kTbSaveWeightsToleranceLongFlag, om.MSyntax.kDouble)
+    syntax.addFlag(kTbSaveWeightsBackgroundFlag, kTbSaveWeightsBackgroundLongFlag)
+    syntax.addFlag(kTbSaveWeightsWorkersFlag, kTbSaveWeightsWorkersLongFlag, om.MSyntax.kLong)
     return syntax
 
 
@@ -354,7 +1105,7 @@ def initializePlugin(mobject):
     mplugin = ompx.MFnPlugin(mobject, 'Tom Banker', '1.1', 'Any')
     try:
         mplugin.registerCommand(kPluginCmdName, cmdCreator, syntaxCreator)
-    except Exception, e:
+    except Exception as e:
         sys.stderr.write('Failed to register command: %s\n" % kPluginCmdName')
         sys.stderr.write('%s\n' % e)
 
@@ -0,0 +1,485 @@
+# ---- Skin weight file tool ----
+# Converts, inspects, validates and diffs tbSaveSkinWeights files without Maya, for batch jobs on farm machines.
+# Every command streams its files through weightFile.iterBlocks() one block of rows at a time,
+# so multi-GB files never have to fit in memory. Blocks are processed with numpy when it is available.
+# Nothing in here touches Maya.
+
+# ---- Usage ----
+# python tbWeightTool.py convert body.xml body.tbc
+# python tbWeightTool.py convert assets/*.xml -o converted -fmt binary -w 8
+# python tbWeightTool.py stats body.tbw head.tbc
+# python tbWeightTool.py validate -t 0.001 assets/*.tbw
+# python tbWeightTool.py diff old/body.xml new/body.tbc -t 0.0001 --top 20 --csv bodyErrors.csv
+
+# ---- Exit Status ----
+# 0 when every file converts, validates or matches, 1 otherwise, so farm jobs can fail on it
+
+import argparse
+import bisect
+import heapq
+import json
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import weightFile
+import workerPool
+
+kTolerance = 1e-3
+kMaxListed = 10
+kExtensions = {weightFile.kFormatXml: '.xml',
+               weightFile.kFormatBinary: '.tbw',
+               weightFile.kFormatChunked: '.tbc'}
+
+
+def convertFile(source, destination, fileFormat=None, sourceFormat=None, pretty=True):
+    """
+    Convert a weight file block by block, the destination format comes from its extension when not given
+    Returns the number of vertices written
+    """
+    return weightFile.writeBlocks(destination, weightFile.iterBlocks(source, sourceFormat), fileFormat, pretty)
+
+
+def _convertJob(job):
+    source, destination, fileFormat, pretty = job
+    try:
+        return source, convertFile(source, destination, fileFormat, pretty=pretty), None
+    except Exception as e:
+        return source, 0, '%s: %s' % (type(e).__name__, e)
+
+
+class WeightStats(object):
+    """
+    Counts gathered over the blocks of one weight file
+    A vertex is badly normalized when its weights don't sum to 1 within tolerance, unweighted vertices included
+    """
+    def __init__(self, fileName, tolerance=kTolerance):
+        self.fileName = fileName
+        self.tolerance = tolerance
+        self.meshName = ''
+        self.infNames = []
+        self.hasPositions = True
+        self.numVerts = 0
+        self.numWeights = 0
+        self.histogram = []
+        self.usage = []
+        self.badSums = 0
+        self.maxSumError = 0.0
+        self.worstVertId = None
+        self.badVertIds = []
+        self.negative = 0
+        self.badInfIds = 0
+
+    def add(self, block):
+        """
+        Count one block of rows
+        """
+        if not self.numVerts:
+            self.meshName = block.meshName
+            self.infNames = list(block.infNames)
+            self.usage = [0] * len(self.infNames)
+        self.hasPositions = self.hasPositions and block.positions is not None
+        self.numVerts += len(block)
+        self.numWeights += block.numWeights
+        if not len(block):
+            return
+
+        if np is not None:
+            counts = np.diff(block.offsets.astype('i8'))
+            histogram = np.bincount(counts).tolist()
+            infIds = block.infIds.astype('i8')
+            usage = np.bincount(infIds, minlength=len(self.usage)).tolist()
+            sums = np.bincount(block.rowIndices(), weights=block.weights, minlength=len(block))
+            errors = np.abs(sums - 1.0)
+            bad = np.nonzero(errors > self.tolerance)[0]
+            worst = int(np.argmax(errors))
+            self.negative += int((block.weights < 0).sum())
+            badVertIds = block.vertIds[bad[:kMaxListed]].tolist()
+            errors = errors.tolist()
+        else:
+            histogram, usage, errors, bad, badVertIds = [], [0] * len(self.usage), [], [], []
+            for vertId, infIds, values in block:
+                count = len(infIds)
+                histogram.extend([0] * (count + 1 - len(histogram)))
+                histogram[count] += 1
+                for infId in infIds:
+                    usage.extend([0] * (infId + 1 - len(usage)))
+                    usage[infId] += 1
+                errors.append(abs(sum(values) - 1.0))
+                if errors[-1] > self.tolerance:
+                    bad.append(len(errors) - 1)
+                    if len(badVertIds) < kMaxListed:
+                        badVertIds.append(vertId)
+                self.negative += len([w for w in values if w < 0])
+            worst = errors.index(max(errors))
+
+        self.histogram.extend([0] * (len(histogram) - len(self.histogram)))
+        for count, numVerts in enumerate(histogram):
+            self.histogram[count] += numVerts
+        for infId, numVerts in enumerate(usage):
+            if infId < len(self.usage):
+                self.usage[infId] += numVerts
+            else:
+                self.badInfIds += numVerts
+
+        self.badSums += len(bad)
+        self.badVertIds.extend(badVertIds[:kMaxListed - len(self.badVertIds)])
+        if errors[worst] > self.maxSumError or self.worstVertId is None:
+            self.maxSumError = errors[worst]
+            self.worstVertId = int(block.vertIds[worst])
+
+    @property
+    def valid(self):
+        return not (self.badSums or self.negative or self.badInfIds)
+
+    @property
+    def sparsity(self):
+        """
+        Fraction of the dense vertices x influences matrix that holds no weight
+        """
+        cells = self.numVerts * len(self.infNames)
+        return 1.0 - float(self.numWeights) / cells if cells else 0.0
+
+    def report(self):
+        return {'file': self.fileName,
+                'bytes': os.path.getsize(self.fileName),
+                'mesh': self.meshName,
+                'vertices': self.numVerts,
+                'influences': len(self.infNames),
+                'unusedInfluences': [name for name, count in zip(self.infNames, self.usage) if not count],
+                'weights': self.numWeights,
+                'positions': self.hasPositions and self.numVerts > 0,
+                'weightsPerVertex': {'mean': float(self.numWeights) / self.numVerts if self.numVerts else 0.0,
+                                     'max': len(self.histogram) - 1 if self.histogram else 0,
+                                     'histogram': self.histogram},
+                'sparsity': self.sparsity,
+                'normalization': {'tolerance': self.tolerance,
+                                  'badVertices': self.badSums,
+                                  'maxError': self.maxSumError,
+                                  'worstVertex': self.worstVertId,
+                                  'firstBadVertices': self.badVertIds},
+                'negativeWeights': self.negative,
+                'unknownInfluenceIds': self.badInfIds,
+                'valid': self.valid}
+
+    def lines(self):
+        report = self.report()
+        perVertex = report['weightsPerVertex']
+        lines = ['%s' % self.fileName,
+                 '  mesh          %s' % self.meshName,
+                 '  vertices      %d' % self.numVerts,
+                 '  influences    %d, %d unused' % (len(self.infNames), len(report['unusedInfluences'])),
+                 '  weights       %d' % self.numWeights,
+                 '  per vertex    %.2f mean, %d max, %s' % (
+                     perVertex['mean'], perVertex['max'],
+                     ' '.join('%d:%d' % (count, numVerts) for count, numVerts in enumerate(self.histogram)
+                              if numVerts)),
+                 '  sparsity      %.2f%%' % (100.0 * self.sparsity),
+                 '  positions     %s' % ('yes' if report['positions'] else 'no')]
+        return lines + self.problems()
+
+    def problems(self):
+        """
+        Get the normalization and range lines of the report
+        """
+        lines = ['  normalized    %s' % ('yes' if not self.badSums else '%d vertices off by more than %g' % (
+            self.badSums, self.tolerance))]
+        if self.maxSumError > 0:
+            lines.append('  worst sum     %.6g off at vtx[%d]' % (self.maxSumError, self.worstVertId))
+        if self.badVertIds:
+            lines.append('  first bad     %s' % ' '.join(str(v) for v in self.badVertIds))
+        if self.negative:
+            lines.append('  negative      %d weights' % self.negative)
+        if self.badInfIds:
+            lines.append('  unknown infs  %d weights use an influence id with no name' % self.badInfIds)
+        return lines
+
+
+def fileStats(fileName, fileFormat=None, tolerance=kTolerance):
+    """
+    Stream a weight file into a WeightStats
+    """
+    stats = WeightStats(fileName, tolerance)
+    for block in weightFile.iterBlocks(fileName, fileFormat):
+        stats.add(block)
+    return stats
+
+
+class _SortedBlocks(object):
+    """
+    Rows of a block stream taken up to a vertex id at a time, the stream must be sorted by vertex id
+    """
+    def __init__(self, blocks, fileName):
+        self.blocks = iter(blocks)
+        self.fileName = fileName
+        self.table = None
+        self.lastId = -1
+        self.infNames = None
+        self._fill()
+
+    @property
+    def done(self):
+        return self.table is None
+
+    @property
+    def last(self):
+        return int(self.table.vertIds[-1])
+
+    def _fill(self):
+        while self.table is None or not len(self.table):
+            block = next(self.blocks, None)
+            if block is None:
+                self.table = None
+                return
+            if self.infNames is None:
+                self.infNames = list(block.infNames)
+            vertIds = block.vertIds
+            if np is not None:
+                ordered = not len(vertIds) or (vertIds[0] > self.lastId and
+                                               bool(np.all(np.diff(vertIds.astype('i8')) > 0)))
+            else:
+                ordered = all(a < b for a, b in zip([self.lastId] + list(vertIds), vertIds))
+            if not ordered:
+                raise Exception('%s is not sorted by vertex id, diff streams both files in vertex order' %
+                                self.fileName)
+            if len(vertIds):
+                self.lastId = int(vertIds[-1])
+            self.table = block
+
+    def take(self, cutoff):
+        """
+        Get the rows with vertex ids up to cutoff, None once the stream is done
+        """
+        if self.table is None:
+            return None
+        if np is not None:
+            row = int(np.searchsorted(self.table.vertIds, cutoff, side='right'))
+        else:
+            row = bisect.bisect_right(self.table.vertIds, cutoff)
+        taken = self.table.slice(0, row)
+        self.table = self.table.slice(row, len(self.table))
+        self._fill()
+        return taken
+
+
+def _influenceMap(infNames, unionNames):
+    """
+    Map a file's influence ids onto the union of both files' names, by id when a file has no names
+    """
+    if not infNames:
+        return None
+    lookup = dict((name, i) for i, name in enumerate(unionNames))
+    return [lookup[name] for name in infNames]
+
+
+def _blockErrors(tableA, tableB, mapA, mapB, numInfs):
+    """
+    Get (vertIds, max abs error, in A, in B) for the rows of two tables, rows missing from one side count as zeros
+    """
+    if np is not None:
+        empty = np.zeros(0, dtype='i8')
+        idsA = tableA.vertIds.astype('i8') if tableA is not None else empty
+        idsB = tableB.vertIds.astype('i8') if tableB is not None else empty
+        vertIds = np.union1d(idsA, idsB)
+        dense = np.zeros((len(vertIds), numInfs))
+        for table, ids, mapping, sign in ((tableA, idsA, mapA, 1.0), (tableB, idsB, mapB, -1.0)):
+            if table is None or not len(table):
+                continue
+            infIds = table.infIds.astype('i8')
+            if mapping is not None:
+                infIds = np.asarray(mapping, dtype='i8')[infIds]
+            rows = np.searchsorted(vertIds, ids)[table.rowIndices()]
+            np.add.at(dense, (rows, infIds), sign * table.weights)
+        errors = np.abs(dense).max(axis=1) if numInfs else np.zeros(len(vertIds))
+        return vertIds.tolist(), errors.tolist(), np.isin(vertIds, idsA).tolist(), np.isin(vertIds, idsB).tolist()
+
+    rowsA, rowsB = {}, {}
+    for table, mapping, rows in ((tableA, mapA, rowsA), (tableB, mapB, rowsB)):
+        for vertId, infIds, values in table or []:
+            row = rows[vertId] = {}
+            for infId, value in zip(infIds, values):
+                infId = mapping[infId] if mapping is not None else infId
+                row[infId] = row.get(infId, 0.0) + value
+    vertIds = sorted(set(rowsA) | set(rowsB))
+    errors = []
+    for vertId in vertIds:
+        rowA, rowB = rowsA.get(vertId, {}), rowsB.get(vertId, {})
+        errors.append(max([abs(rowA.get(i, 0.0) - rowB.get(i, 0.0)) for i in set(rowA) | set(rowB)] or [0.0]))
+    return vertIds, errors, [v in rowsA for v in vertIds], [v in rowsB for v in vertIds]
+
+
+def diffFiles(fileA, fileB, formatA=None, formatB=None, tolerance=kTolerance, top=kMaxListed, csvFile=None):
+    """
+    Compare two weight files vertex by vertex, streaming both in vertex id order
+    Influences are matched by name, the error of a vertex is the largest absolute weight difference over them
+    Every vertex's error is written to csvFile as vertId,maxAbsError,inA,inB when it is set
+    Returns a report dict
+    """
+    streamA = _SortedBlocks(weightFile.iterBlocks(fileA, formatA), fileA)
+    streamB = _SortedBlocks(weightFile.iterBlocks(fileB, formatB), fileB)
+    namesA, namesB = streamA.infNames or [], streamB.infNames or []
+    unionNames = namesA + [name for name in namesB if name not in set(namesA)]
+    mapA, mapB = _influenceMap(namesA, unionNames), _influenceMap(namesB, unionNames)
+    numInfs = len(unionNames)
+
+    report = {'fileA': fileA, 'fileB': fileB, 'tolerance': tolerance,
+              'influencesOnlyInA': [name for name in namesA if name not in set(namesB)],
+              'influencesOnlyInB': [name for name in namesB if name not in set(namesA)],
+              'compared': 0, 'onlyInA': 0, 'onlyInB': 0, 'overTolerance': 0,
+              'maxError': 0.0, 'meanError': 0.0, 'worstVertex': None, 'worst': []}
+    worst = []
+    totalError = 0.0
+
+    csv = open(csvFile, 'w') if csvFile else None
+    try:
+        if csv is not None:
+            csv.write('vertId,maxAbsError,inA,inB\n')
+        while not (streamA.done and streamB.done):
+            if streamA.done:
+                cutoff = streamB.last
+            elif streamB.done:
+                cutoff = streamA.last
+            else:
+                cutoff = min(streamA.last, streamB.last)
+            tableA, tableB = streamA.take(cutoff), streamB.take(cutoff)
+            if numInfs == 0:
+                numInfs = max(tableA.numInfluences if tableA is not None else 0,
+                              tableB.numInfluences if tableB is not None else 0)
+            vertIds, errors, inA, inB = _blockErrors(tableA, tableB, mapA, mapB, numInfs)
+
+            for vertId, error, a, b in zip(vertIds, errors, inA, inB):
+                if a and b:
+                    report['compared'] += 1
+                    totalError += error
+                elif a:
+                    report['onlyInA'] += 1
+                else:
+                    report['onlyInB'] += 1
+                if error > tolerance:
+                    report['overTolerance'] += 1
+                if error > report['maxError']:
+                    report['maxError'] = error
+                    report['worstVertex'] = vertId
+            if top:
+                worst = heapq.nlargest(top, worst + list(zip(errors, vertIds)))
+            if csv is not None:
+                csv.write(''.join('%d,%r,%d,%d\n' % row for row in zip(vertIds, errors, inA, inB)))
+    finally:
+        if csv is not None:
+            csv.close()
+
+    report['meanError'] = totalError / report['compared'] if report['compared'] else 0.0
+    report['worst'] = [{'vertId': vertId, 'error': error} for error, vertId in worst if error > 0]
+    report['matches'] = not (report['overTolerance'] or report['onlyInA'] or report['onlyInB'])
+    return report
+
+
+def diffLines(report):
+    lines = ['%s -> %s' % (report['fileA'], report['fileB']),
+             '  compared      %d vertices' % report['compared'],
+             '  only in one   %d in A, %d in B' % (report['onlyInA'], report['onlyInB']),
+             '  max error     %.6g%s' % (report['maxError'], '' if report['worstVertex'] is None else
+                                         ' at vtx[%d]' % report['worstVertex']),
+             '  mean error    %.6g' % report['meanError'],
+             '  over %-8g %d vertices' % (report['tolerance'], report['overTolerance'])]
+    for key, label in (('influencesOnlyInA', 'infs only A'), ('influencesOnlyInB', 'infs only B')):
+        if report[key]:
+            lines.append('  %-13s %s' % (label, ' '.join(report[key])))
+    for item in report['worst']:
+        lines.append('    vtx[%d] %.6g' % (item['vertId'], item['error']))
+    return lines
+
+
+def _print(lines, asJson, reports):
+    if asJson:
+        print(json.dumps(reports, indent=2, sort_keys=True))
+    else:
+        for line in lines:
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert, inspect and diff skin weight files without Maya')
+    commands = parser.add_subparsers(dest='command')
+
+    convert = commands.add_parser('convert', help='convert weight files between formats')
+    convert.add_argument('files', nargs='+', help='source files, then the destination file when -o is not set')
+    convert.add_argument('-o', '--output', help='destination folder, files keep their names with a new extension')
+    convert.add_argument('-fmt', '--format', choices=sorted(kExtensions),
+                         help='destination format, from the destination extension by default')
+    convert.add_argument('--compact', action='store_true', help='write XML without indentation')
+    convert.add_argument('-w', '--workers', type=int, default=1, help='files converted in parallel processes')
+
+    stats = commands.add_parser('stats', help='print vertex, influence and sparsity counts')
+    stats.add_argument('files', nargs='+')
+    stats.add_argument('-t', '--tolerance', type=float, default=kTolerance, help='normalization tolerance')
+    stats.add_argument('--json', action='store_true', help='print JSON instead of text')
+
+    validate = commands.add_parser('validate', help='check every vertex sums to 1 and weights are in range')
+    validate.add_argument('files', nargs='+')
+    validate.add_argument('-t', '--tolerance', type=float, default=kTolerance, help='normalization tolerance')
+    validate.add_argument('--json', action='store_true', help='print JSON instead of text')
+
+    diff = commands.add_parser('diff', help='per vertex max abs error between two weight files')
+    diff.add_argument('fileA')
+    diff.add_argument('fileB')
+    diff.add_argument('-t', '--tolerance', type=float, default=kTolerance, help='largest error that still matches')
+    diff.add_argument('--top', type=int, default=kMaxListed, help='worst vertices to print')
+    diff.add_argument('--csv', help='write every vertex error to this file')
+    diff.add_argument('--json', action='store_true', help='print JSON instead of text')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        if args.output:
+            if not os.path.isdir(args.output):
+                os.makedirs(args.output)
+            if not args.format:
+                parser.error('convert -o needs -fmt')
+            jobs = [(source, os.path.join(args.output, os.path.splitext(os.path.basename(source))[0] +
+                                          kExtensions[args.format]), args.format, not args.compact)
+                    for source in args.files]
+        elif len(args.files) == 2:
+            jobs = [(args.files[0], args.files[1], args.format, not args.compact)]
+        else:
+            parser.error('convert takes a source and a destination, or sources with -o')
+
+        failed = 0
+        results = workerPool.mapPool(_convertJob, jobs, args.workers, processes=True)
+        for (source, destination, fileFormat, pretty), (source, numVerts, error) in zip(jobs, results):
+            if error:
+                failed += 1
+                print('%s failed, %s' % (source, error))
+            else:
+                print('%s -> %s, %d vertices' % (source, destination, numVerts))
+        return 1 if failed else 0
+
+    if args.command in ('stats', 'validate'):
+        reports, lines = [], []
+        for fileName in args.files:
+            result = fileStats(fileName, tolerance=args.tolerance)
+            reports.append(result.report())
+            if args.command == 'stats':
+                lines.extend(result.lines())
+            else:
+                lines.append('%-8s %s' % ('ok' if result.valid else 'INVALID', fileName))
+                if not result.valid:
+                    lines.extend(result.problems())
+        _print(lines, args.json, reports)
+        return 0 if args.command == 'stats' or all(report['valid'] for report in reports) else 1
+
+    if args.command == 'diff':
+        report = diffFiles(args.fileA, args.fileB, tolerance=args.tolerance, top=args.top, csvFile=args.csv)
+        _print(diffLines(report), args.json, report)
+        return 0 if report['matches'] else 1
+
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# ---- Tests ----
+# python -m pytest tests
+# The pure modules run on python 2 and 3, with or without numpy.
+# test_tbSaveWeights drives the plugin through fakeMaya on either python.
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skinWeights import SkinWeightsBuilder
+
+
+def buildWeights(numVerts=40, numInfs=6, perVert=3, positions=True, seed=0, infNames=None, meshName='body'):
+    """
+    Build a table of normalized random weights on a row of points along x, centred on the origin
+    """
+    rng = random.Random(seed)
+    builder = SkinWeightsBuilder(infNames or ['joint%d' % i for i in range(numInfs)], meshName)
+    for vertId in range(numVerts):
+        infIds = sorted(rng.sample(range(numInfs), perVert))
+        values = [rng.random() + 0.01 for i in infIds]
+        total = sum(values)
+        position = (vertId - (numVerts - 1) / 2.0, rng.random(), 0.0) if positions else None
+        builder.addVertex(vertId, infIds, [v / total for v in values], position)
+    return builder.build()
+
+
+def assertSameWeights(a, b, places=12):
+    assert list(a.vertIds) == list(b.vertIds)
+    assert list(a.offsets) == list(b.offsets)
+    assert list(a.infIds) == list(b.infIds)
+    assert [round(w, places) for w in a.weights] == [round(w, places) for w in b.weights]
+    assert a.infNames == b.infNames
+    assert a.meshName == b.meshName
+    if a.positions is None:
+        assert b.positions is None
+    else:
+        assert [round(p, places) for p in a.positions] == [round(p, places) for p in b.positions]
+
+
+@pytest.fixture
+def weights():
+    return buildWeights()
@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+import controlShapes
+
+
+@pytest.fixture
+def customShape(monkeypatch):
+    """
+    Register shapes for one test only
+    """
+    monkeypatch.setattr(controlShapes, '_shapes', dict(controlShapes._shapes))
+    monkeypatch.setattr(controlShapes, '_cache', dict(controlShapes._cache))
+    return controlShapes.registerShape
+
+
+def assertValidKnots(args):
+    # Maya wants cvs + degree - 1 knots, never decreasing
+    assert len(args['k']) == len(args['p']) + args['d'] - 1
+    assert all(a <= b for a, b in zip(args['k'], args['k'][1:]))
+
+
+@pytest.mark.parametrize('shape, options', [('circle', {}), ('circle', {'sections': 12}), ('star', {}),
+                                            ('box', {}), ('square', {})])
+def test_knotCounts(shape, options):
+    args = controlShapes.curveArgs(shape, **options)
+    assertValidKnots(args)
+    if args.get('per'):
+        # The first degree cvs are repeated at the end
+        assert args['p'][-args['d']:] == args['p'][:args['d']]
+
+
+@pytest.mark.parametrize('numPoints', [4, 5, 9])
+def test_openCubicKnots(customShape, numPoints):
+    customShape('testCurve', lambda: ([(float(i), 0.0, 0.0) for i in range(numPoints)], 3, False))
+    args = controlShapes.curveArgs('testCurve')
+    assertValidKnots(args)
+    spans = numPoints - 3
+    assert args['k'][:3] == [0, 0, 0]
+    assert args['k'][-3:] == [spans] * 3
+
+
+def test_circleRadius():
+    # A periodic cubic passes through (p[i - 1] + 4 * p[i] + p[i + 1]) / 6 at every knot
+    points = controlShapes.shapePoints('circle', sections=8)[0]
+    for i in range(len(points)):
+        a, b, c = points[i - 1], points[i], points[(i + 1) % len(points)]
+        onCurve = [(a[axis] + 4 * b[axis] + c[axis]) / 6.0 for axis in range(3)]
+        assert math.sqrt(sum(v * v for v in onCurve)) == pytest.approx(1.0)
+
+
+def test_transform():
+    points = controlShapes.shapePoints('square', scale=(2, 1, 3), rotate=(0, 90, 0), translate=(1, 2, 3))[0]
+    expected = [(-2.0, 2.0, 5.0), (-2.0, 2.0, 1.0), (4.0, 2.0, 1.0), (4.0, 2.0, 5.0), (-2.0, 2.0, 5.0)]
+    for point, want in zip(points, expected):
+        assert list(point) == pytest.approx(list(want))
+
+
+def test_cached():
+    assert controlShapes.shapePoints('star', scale=0.5) is controlShapes.shapePoints('star', scale=0.5)
+
+
+def test_registerReplacesCachedShape(customShape):
+    customShape('testShape', lambda: ([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0)], 1, False))
+    assert controlShapes.shapePoints('testShape')[0][1] == (1.0, 0.0, 0.0)
+    customShape('testShape', lambda: ([(0.0, 0.0, 0.0), (2.0, 0.0, 0.0)], 1, False))
+    assert controlShapes.shapePoints('testShape')[0][1] == (2.0, 0.0, 0.0)
+    assert 'testShape' in controlShapes.shapeNames()
+
+
+def test_unknownShape():
+    with pytest.raises(Exception):
+        controlShapes.curveArgs('noSuchShape')
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+import phaseTimer
+import weightFile
+from phaseTimer import PhaseTimer
+
+
+def test_spansAreTotalled():
+    timer = PhaseTimer()
+    for i in range(3):
+        with timer.span('parse', mesh='body') as span:
+            span.add(verts=10, weights=30)
+    timer.add('write', 0.5, bytes=100)
+    assert timer.totals['parse']['calls'] == 3
+    assert timer.totals['parse']['verts'] == 30
+    assert timer.totals['parse']['weights'] == 90
+    assert 'mesh' not in timer.totals['parse']
+    assert timer.totals['write'] == {'calls': 1, 'seconds': 0.5, 'bytes': 100}
+    assert [event['phase'] for event in timer.events] == ['parse', 'parse', 'parse', 'write']
+    assert timer.events[0]['mesh'] == 'body'
+
+
+def test_summaryOrder():
+    timer = PhaseTimer()
+    for name in ('mirror', 'write', 'select'):
+        timer.add(name, 0.1)
+    assert [line.split()[0] for line in timer.summary()] == ['select', 'write', 'mirror']
+
+
+def test_spanRecordedOnError():
+    timer = PhaseTimer()
+    with pytest.raises(ValueError):
+        with timer.span('parse'):
+            raise ValueError()
+    assert timer.totals['parse']['calls'] == 1
+
+
+def test_listeners():
+    events = []
+    timer = PhaseTimer(listeners=[events.append])
+    phaseTimer.addListener(events.append)
+    try:
+        timer.add('parse', 0.1)
+    finally:
+        phaseTimer.removeListener(events.append)
+    timer.add('write', 0.1)
+    assert [event['phase'] for event in events] == ['parse', 'parse', 'write']
+
+
+def test_failingListener(capsys):
+    def fail(event):
+        raise RuntimeError('listener failed')
+
+    events = []
+    timer = PhaseTimer(listeners=[fail, events.append])
+    with timer.span('parse'):
+        pass
+    assert len(events) == 1
+    assert timer.totals['parse']['calls'] == 1
+    assert 'listener failed' in capsys.readouterr().err
+
+
+def test_profileSpan():
+    timer = PhaseTimer('parse')
+    with timer.span('select'):
+        pass
+    assert timer.profileStats() == ''
+    with timer.span('parse'):
+        sorted(range(1000))
+    assert 'function calls' in timer.profileStats()
+
+
+@pytest.mark.parametrize('fileName', ['body.xml', 'body.tbw'])
+@pytest.mark.parametrize('phase', ['serialize', 'write'])
+def test_profileWritePhases(tmpdir, weights, fileName, phase):
+    # serialize and write interleave, they are recorded with add() but still profiled
+    timer = PhaseTimer(phase)
+    weightFile.writeWeights(str(tmpdir.join(fileName)), weights, timer=timer)
+    assert sorted(timer.totals) == ['serialize', 'write']
+    assert 'function calls' in timer.profileStats()
+
+
+def test_write(tmpdir):
+    timer = PhaseTimer('parse')
+    with timer.span('parse', verts=5):
+        pass
+    fileName, profileName = timer.write(str(tmpdir.join('report.json')))
+    assert profileName == str(tmpdir.join('report.parse.prof'))
+    with open(fileName) as f:
+        report = json.load(f)
+    assert report['profilePhase'] == 'parse'
+    assert report['totals']['parse']['verts'] == 5
+    assert tmpdir.join('report.parse.prof').check()
@@ -0,0 +1,171 @@
+import contextlib
+
+import pytest
+
+import rigGraph
+
+
+class Scene(object):
+    """
+    Stand-in for a rig module's scene helpers, records what was built and torn down
+    """
+    def __init__(self):
+        self.data = {}
+        self.built = []
+        self.computed = []
+        self.tornDown = []
+        self.created = None
+        self.fail = None
+
+    def teardown(self, nodes):
+        self.tornDown.append(list(nodes))
+
+    @contextlib.contextmanager
+    def tracker(self):
+        self.created = []
+        yield self.created
+
+
+def readNode(component):
+    return component.context.data.get(component.name)
+
+
+def computeNode(component, data):
+    component.context.computed.append(component.name)
+    return component.settings.get('scale', 1) * 2
+
+
+def buildNode(component, data, computed, inputs):
+    scene = component.context
+    node = component.name
+    scene.built.append(component.name)
+    if scene.created is not None:
+        scene.created.append(node)
+    if scene.fail == component.name:
+        raise Exception('%s failed' % component.name)
+    return [node], {'node': node, 'computed': computed, 'inputs': sorted(inputs.values())}
+
+
+@pytest.fixture(autouse=True)
+def types(monkeypatch):
+    monkeypatch.setattr(rigGraph, '_types', {})
+    rigGraph.registerType('node', buildNode, readNode, computeNode)
+
+
+def describe(**settings):
+    """
+    root <- a <- b, root <- c
+    """
+    return {'name': 'arm',
+            'settings': {'prefix': 'l_'},
+            'components': [{'name': 'b', 'type': 'node', 'depends': ['a'], 'settings': settings.get('b', {})},
+                           {'name': 'a', 'type': 'node', 'depends': ['root'], 'settings': settings.get('a', {})},
+                           {'name': 'root', 'type': 'node', 'settings': settings.get('root', {})},
+                           {'name': 'c', 'type': 'node', 'depends': ['root'], 'settings': settings.get('c', {})}]}
+
+
+def run(scene, description, state=None, **kwargs):
+    graph = rigGraph.RigGraph(description, context=scene)
+    state = graph.run(state, teardown=scene.teardown, **kwargs)
+    return graph, state
+
+
+def test_sortComponents():
+    graph = rigGraph.RigGraph(describe())
+    assert [c.name for c in graph.order] == ['root', 'a', 'b', 'c']
+    assert graph.components['a'].settings == {'prefix': 'l_'}
+
+
+def test_describeErrors():
+    with pytest.raises(Exception):
+        rigGraph.RigGraph({'components': [{'name': 'a', 'type': 'node', 'depends': ['b']},
+                                          {'name': 'b', 'type': 'node', 'depends': ['a']}]})
+    with pytest.raises(Exception):
+        rigGraph.RigGraph({'components': [{'name': 'a', 'type': 'node', 'depends': ['missing']}]})
+    with pytest.raises(Exception):
+        rigGraph.RigGraph({'components': [{'name': 'a', 'type': 'node'}, {'name': 'a', 'type': 'node'}]})
+    with pytest.raises(Exception):
+        rigGraph.RigGraph({'components': [{'name': 'a', 'type': 'missing'}]})
+
+
+def test_firstRunBuildsEverything():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    assert graph.rebuilt == ['root', 'a', 'b', 'c']
+    assert scene.tornDown == []
+    assert state['components']['b']['outputs']['inputs'] == [state['components']['a']['outputs']]
+
+
+def test_unchangedRunBuildsNothing():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    scene.built = []
+    graph, state = run(scene, describe(), state)
+    assert graph.rebuilt == []
+    assert scene.built == []
+    assert scene.tornDown == []
+    assert sorted(state['components']) == ['a', 'b', 'c', 'root']
+
+
+def test_settingChangeRebuildsDownstream():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    scene.computed = []
+    graph, state = run(scene, describe(a={'scale': 3}), state)
+    assert graph.rebuilt == ['a', 'b']
+    assert scene.computed == ['a', 'b']
+    # Dependents come down before what they depend on
+    assert scene.tornDown == [['b'], ['a']]
+    assert state['components']['a']['outputs']['computed'] == 6
+
+
+def test_sharedSettingChangeRebuildsEverything():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    description = describe()
+    description['settings']['prefix'] = 'r_'
+    graph, state = run(scene, description, state)
+    assert graph.rebuilt == ['root', 'a', 'b', 'c']
+
+
+def test_sceneDataChangeRebuilds():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    scene.data['c'] = [1.0, 2.0, 3.0]
+    graph, state = run(scene, describe(), state)
+    assert graph.rebuilt == ['c']
+    assert scene.tornDown == [['c']]
+
+
+def test_removedComponentTornDown():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    description = describe()
+    description['components'] = [entry for entry in description['components'] if entry['name'] != 'c']
+    graph, state = run(scene, description, state)
+    assert graph.rebuilt == []
+    assert scene.tornDown == [['c']]
+    assert 'c' not in state['components']
+
+
+def test_force():
+    scene = Scene()
+    graph, state = run(scene, describe())
+    graph, state = run(scene, describe(), state, force=True)
+    assert graph.rebuilt == ['root', 'a', 'b', 'c']
+    assert sorted(scene.tornDown) == [['a'], ['b'], ['c'], ['root']]
+
+
+def test_failedBuildTornDown():
+    scene = Scene()
+    scene.fail = 'b'
+    graph = rigGraph.RigGraph(describe(), context=scene)
+    with pytest.raises(Exception):
+        graph.run(teardown=scene.teardown, tracker=scene.tracker)
+    assert scene.tornDown == [['b']]
+    # What was built before the failure is kept and not built again
+    assert sorted(graph.state['components']) == ['a', 'root']
+
+    scene.fail = None
+    graph, state = run(scene, describe(), graph.state, tracker=scene.tracker)
+    assert graph.rebuilt == ['b', 'c']
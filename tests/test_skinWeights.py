@@ -0,0 +1,161 @@
+import pytest
+
+import skinWeights
+from conftest import assertSameWeights, buildWeights
+from skinWeights import (SkinWeights, conditionWeights, joinWeights, mirrorWeights, remapInfluences,
+                         substituteName, transferWeights)
+
+
+def rowSums(weights):
+    return [sum(values) for vertId, infIds, values in weights]
+
+
+# ---- Conditioning ----
+
+
+def test_conditionNothingToDo(weights):
+    conditioned, stats = conditionWeights(weights)
+    assertSameWeights(weights, conditioned)
+    assert stats.summary()['verticesChanged'] == 0
+
+
+def test_conditionMaxInfluences():
+    weights = buildWeights(numInfs=8, perVert=6)
+    conditioned, stats = conditionWeights(weights, maxInfluences=4)
+    for (vertId, infIds, values), (keptId, keptInfs, kept) in zip(weights, conditioned):
+        largest = sorted(zip(values, infIds), reverse=True)[:4]
+        assert sorted(keptInfs) == list(keptInfs)
+        assert set(keptInfs) == set(i for w, i in largest)
+    assert [round(s, 12) for s in rowSums(conditioned)] == [1.0] * len(weights)
+    summary = stats.summary()
+    assert summary['weightsBefore'] == 6 * len(weights)
+    assert summary['weightsAfter'] == 4 * len(weights)
+
+
+def test_conditionMinWeight():
+    weights = SkinWeights([0, 1], [0, 3, 5], [0, 1, 2, 0, 1], [0.6, 0.395, 0.005, 0.999, 0.001], ['a', 'b', 'c'])
+    conditioned, stats = conditionWeights(weights, minWeight=0.01)
+    assert conditioned.toDict() == {0: {0: pytest.approx(0.6 / 0.995), 1: pytest.approx(0.395 / 0.995)},
+                                    1: {0: 1.0}}
+    assert stats.summary()['maxPruned'] == pytest.approx(0.005)
+
+
+def test_conditionQuantize(weights):
+    conditioned, stats = conditionWeights(weights, quantize=255)
+    for vertId, infIds, values in conditioned:
+        assert sum(values) == pytest.approx(1.0)
+        # Every weight but the largest, which takes the rounding error, sits on a 1 / 255 step
+        for w in sorted(values)[:-1]:
+            assert round(w * 255) == pytest.approx(w * 255)
+
+
+def test_conditionWithoutNormalize():
+    weights = SkinWeights([0], [0, 2], [0, 1], [0.3, 0.3], ['a', 'b'])
+    conditioned, stats = conditionWeights(weights, normalize=False)
+    assert conditioned.toDict() == {0: {0: 0.3, 1: 0.3}}
+    assert stats.summary()['maxSumError'] == pytest.approx(0.4)
+
+@pytest.mark.parametrize('useNumpy', [True, False])
+def test_conditionKeepsLargestWeight(monkeypatch, useNumpy):
+    if not useNumpy:
+        monkeypatch.setattr(skinWeights, 'np', None)
+    weights = SkinWeights([0, 1], [0, 2, 4], [0, 1, 0, 2], [0.004, 0.006, 0.5, 0.5], ['a', 'b', 'c'])
+    conditioned, stats = conditionWeights(weights, minWeight=0.01)
+    assert conditioned.toDict() == {0: {1: 1.0}, 1: {0: 0.5, 2: 0.5}}
+    assert stats.summary()['maxPruned'] == pytest.approx(0.004)
+
+
+# ---- Transfer ----
+
+
+def test_transferExactHits(weights):
+    transferred = transferWeights(weights, weights.positions, list(weights.vertIds), k=4)
+    assertSameWeights(weights, transferred)
+
+
+def test_transferBlend():
+    source = SkinWeights([0, 1], [0, 1, 2], [0, 1], [1.0, 1.0], ['a', 'b'], 'body', [0, 0, 0, 2, 0, 0])
+    transferred = transferWeights(source, [0.5, 0, 0, 1, 0, 0], [7, 8], k=2, power=1.0)
+    assert list(transferred.vertIds) == [7, 8]
+    assert transferred.toDict() == {7: {0: pytest.approx(0.75), 1: pytest.approx(0.25)},
+                                    8: {0: pytest.approx(0.5), 1: pytest.approx(0.5)}}
+    assert [round(s, 12) for s in rowSums(transferred)] == [1.0, 1.0]
+
+
+def test_transferEmpty(weights):
+    empty = SkinWeights([], [0], [], [], weights.infNames, 'body', [])
+    assert len(transferWeights(empty, [0, 0, 0], [0])) == 0
+    assert len(transferWeights(weights, [], [])) == 0
+
+
+def test_transferNeedsPositions():
+    with pytest.raises(Exception):
+        transferWeights(buildWeights(positions=False), [0, 0, 0])
+
+
+# ---- Mirror ----
+
+
+def test_mirrorSwapsSides():
+    infNames = ['l_arm', 'r_arm', 'spine']
+    points = [1, 0, 0, -1, 0, 0, 0, 1, 0, 2, 0, 0, -3, 0, 0]
+    weights = SkinWeights([0, 1, 2, 3, 4], [0, 2, 3, 4, 5, 6], [0, 2, 1, 2, 0, 1], [0.7, 0.3, 1.0, 1.0, 1.0, 1.0],
+                          infNames, 'body', points)
+    mirrored, unmatched = mirrorWeights(weights)
+    assert list(mirrored.vertIds) == [1]
+    assert mirrored.toDict() == {1: {1: 0.7, 2: 0.3}}
+    assert list(unmatched) == [4]
+
+
+def test_mirrorNegativeSide():
+    weights = SkinWeights([0, 1], [0, 1, 2], [1, 0], [1.0, 1.0], ['l_arm', 'r_arm'], 'body', [1, 0, 0, -1, 0, 0])
+    mirrored, unmatched = mirrorWeights(weights, positive=False)
+    assert mirrored.toDict() == {0: {1: 1.0}}
+    assert len(unmatched) == 0
+
+
+def test_mirrorTwiceIsIdentity(weights):
+    # The fixture's points sit in mirrored pairs along x once y is flattened
+    weights = SkinWeights(weights.vertIds, weights.offsets, weights.infIds, weights.weights,
+                          ['l_a', 'r_a', 'l_b', 'r_b', 'c', 'd'], 'body',
+                          [c if i % 3 == 0 else 0.0 for i, c in enumerate(weights.positions)])
+    positive = weights.subset([v for row, v in enumerate(weights.vertIds) if weights.positions[3 * row] > 0])
+    mirrored, unmatched = mirrorWeights(weights)
+    assert len(unmatched) == 0
+    assert len(mirrored) == len(positive)
+
+    both = joinWeights([mirrored, positive], weights.infNames, 'body')
+    back, unmatched = mirrorWeights(both, positive=False)
+    assert len(unmatched) == 0
+    assertSameWeights(positive, back)
+
+
+def test_mirrorNeedsPositions():
+    with pytest.raises(Exception):
+        mirrorWeights(buildWeights(positions=False))
+
+
+# ---- Influence remapping ----
+
+
+def test_substituteName():
+    assert substituteName('l_arm|l_elbow', [('l_', 'r_')]) == 'r_arm|r_elbow'
+    assert substituteName('spine', [('l_', 'r_')]) == 'spine'
+
+
+def test_remapInfluences():
+    weights = SkinWeights([0], [0, 2], [0, 1], [0.25, 0.75], ['l_arm', 'spine'])
+    remapped = remapInfluences(weights, ['spine', 'r_arm'], [('l_', 'r_')])
+    assert remapped.infNames == ['spine', 'r_arm']
+    assert remapped.toDict() == {0: {0: 0.75, 1: 0.25}}
+
+
+def test_remapSumsSharedTargets():
+    weights = SkinWeights([0], [0, 3], [0, 1, 2], [0.2, 0.3, 0.5], ['a', 'x:b', 'y:b'])
+    assert remapInfluences(weights, ['b', 'a']).toDict() == {0: {0: pytest.approx(0.8), 1: 0.2}}
+
+
+def test_remapMissing():
+    weights = SkinWeights([0], [0, 1], [0], [1.0], ['hand'])
+    with pytest.raises(Exception):
+        remapInfluences(weights, ['spine'])
@@ -0,0 +1,109 @@
+import math
+import random
+
+import pytest
+
+import spatialIndex
+from spatialIndex import KDTree, SpatialHash
+
+
+def randomPoints(count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-5, 5)) for i in range(count)]
+
+
+def bruteForce(points, point, k):
+    distances = sorted((math.sqrt(sum((a - b) ** 2 for a, b in zip(p, point))), i) for i, p in enumerate(points))
+    return [i for d, i in distances[:k]], [d for d, i in distances[:k]]
+
+
+# ---- KDTree ----
+
+
+@pytest.mark.parametrize('k', [1, 4])
+def test_nearestMatchesBruteForce(k):
+    points = randomPoints(300)
+    tree = KDTree(points, leafSize=4)
+    for point in randomPoints(50, seed=1):
+        indices, distances = tree.nearest(point, k)
+        expected, expectedDistances = bruteForce(points, point, k)
+        assert indices == expected
+        assert distances == pytest.approx(expectedDistances)
+
+
+def test_queryFlatPoints():
+    points = randomPoints(100)
+    tree = KDTree([c for p in points for c in p])
+    indices, distances = tree.query([c for p in points[:10] for c in p])
+    assert indices == [[i] for i in range(10)]
+    assert distances == [[0.0]] * 10
+
+
+def test_moreNeighboursThanPoints():
+    tree = KDTree([(0, 0, 0), (1, 0, 0)])
+    indices, distances = tree.nearest((0.9, 0, 0), k=5)
+    assert indices == [1, 0]
+    assert distances == pytest.approx([0.1, 0.9])
+
+
+def test_emptyTree():
+    tree = KDTree([])
+    assert len(tree) == 0
+    assert tree.nearest((0, 0, 0)) == ([], [])
+    assert tree.query([(0, 0, 0)]) == ([[]], [[]])
+
+
+def test_coincidentPoints():
+    # Points that can't be split still end up in a leaf
+    tree = KDTree([(1, 1, 1)] * 20, leafSize=2)
+    indices, distances = tree.nearest((1, 1, 1), k=3)
+    assert len(indices) == 3
+    assert distances == [0.0] * 3
+
+
+# ---- SpatialHash ----
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def useNumpy(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(spatialIndex, 'np', None)
+    elif spatialIndex.np is None:
+        pytest.skip('no numpy')
+    return request.param
+
+
+def test_hashMatch(useNumpy):
+    points = randomPoints(200)
+    jittered = [(x + 0.0004, y - 0.0004, z) for x, y, z in points[::-1]]
+    matches = SpatialHash(points, tolerance=0.001).match(jittered)
+    assert list(matches) == list(range(199, -1, -1))
+
+
+def test_hashNoMatch(useNumpy):
+    matches = SpatialHash([(0, 0, 0), (1, 0, 0)], tolerance=0.01).match([(0.02, 0, 0), (1, 0, 0.005), (5, 5, 5)])
+    assert list(matches) == [-1, 1, -1]
+
+
+def test_hashClosest(useNumpy):
+    # Both points are within tolerance and in neighbouring cells, the closer one wins
+    matches = SpatialHash([(0.0, 0, 0), (0.0015, 0, 0)], tolerance=0.001).match([(0.0009, 0, 0), (0.0004, 0, 0)])
+    assert list(matches) == [1, 0]
+
+
+def test_hashEmpty(useNumpy):
+    assert list(SpatialHash([], tolerance=0.001).match([(0, 0, 0)])) == [-1]
+    assert list(SpatialHash([(0, 0, 0)], tolerance=0.001).match([])) == []
+
+
+@pytest.mark.parametrize('scale, tree', [(10.0, False), (1e6, True), (1e17, True)])
+def test_hashHugeGrid(monkeypatch, useNumpy, scale, tree):
+    # Too many tolerance sized cells for an int64 key, the kd-tree takes over
+    trees = []
+    matchTree = SpatialHash._matchTree
+    monkeypatch.setattr(SpatialHash, '_matchTree', lambda self, query: trees.append(1) or matchTree(self, query))
+    points = [(-scale, 0, 0), (scale, 0, scale), (0, scale, -scale), (1.0, 2.0, 3.0)]
+    query = [(1.0005, 2.0, 3.0), (-scale, 0, 0), (0, scale, -scale), (2.0, 2.0, 3.0)]
+    assert list(SpatialHash(points, tolerance=0.001).match(query)) == [3, 0, 2, -1]
+    assert bool(trees) == (tree and useNumpy)
+
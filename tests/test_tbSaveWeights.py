@@ -0,0 +1,233 @@
+import pytest
+
+import fakeMaya
+fakeMaya.install()
+import tbSaveWeights
+import weightFile
+import weightWriter
+from conftest import buildWeights
+
+kFileNames = ['body.xml', 'body.tbw', 'body.tbc']
+
+
+@pytest.fixture(autouse=True)
+def scene():
+    scene = fakeMaya.newScene()
+    fakeMaya.loadPlugin(tbSaveWeights)
+    return scene
+
+
+def createMesh(weights, meshName='body', infNames=None, bind=True):
+    """
+    Create a skinned mesh at the table's positions, bound with the table's weights unless bind is off
+    """
+    points = [weights.positions[i:i + 3] for i in range(0, len(weights.positions), 3)]
+    return fakeMaya.createSkinnedMesh(meshName, points, infNames or weights.infNames, weights if bind else None)
+
+
+def clusterWeights(cluster):
+    """
+    Get a skin cluster's weights as {vertId: {infId: weight}} without the zeros
+    """
+    rows = {}
+    for infId, column in enumerate(cluster.columns):
+        for vertId, value in enumerate(column):
+            if value:
+                rows.setdefault(vertId, {})[infId] = value
+    return rows
+
+
+def assertSameRows(a, b):
+    assert sorted(a) == sorted(b)
+    for vertId in a:
+        assert sorted(a[vertId]) == sorted(b[vertId])
+        for infId, value in a[vertId].items():
+            assert value == pytest.approx(b[vertId][infId])
+
+
+def run(command):
+    fakeMaya.mel.eval('tbSaveSkinWeights ' + command)
+
+
+@pytest.mark.parametrize('fileName', kFileNames)
+def test_exportImport(tmpdir, weights, fileName):
+    path = str(tmpdir.join(fileName))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+    assertSameRows(weights.toDict(), weightFile.readWeights(path).toDict())
+
+    fakeMaya.newScene()
+    cluster = createMesh(weights, bind=False)
+    run('-a "import" -m "body" -f "%s"' % path)
+    assertSameRows(weights.toDict(), clusterWeights(cluster))
+
+
+@pytest.mark.parametrize('bulk', ['', '-b '])
+def test_importReplacesWeights(tmpdir, weights, bulk):
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+
+    fakeMaya.newScene()
+    cluster = createMesh(buildWeights(seed=5))
+    run('-a "import" %s-m "body" -f "%s"' % (bulk, path))
+    assertSameRows(weights.toDict(), clusterWeights(cluster))
+
+
+def test_bulkImportUndo(tmpdir, weights):
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+
+    fakeMaya.newScene()
+    before = buildWeights(seed=5)
+    cluster = createMesh(before)
+    run('-a "import" -b -m "body" -f "%s"' % path)
+    fakeMaya.undo()
+    assertSameRows(before.toDict(), clusterWeights(cluster))
+
+
+def test_exportMaxInfluences(tmpdir):
+    weights = buildWeights(numInfs=8, perVert=6)
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -mi 4 -f "%s"' % path)
+    for vertId, infIds, values in weightFile.readWeights(path):
+        assert len(infIds) == 4
+        assert sum(values) == pytest.approx(1.0)
+
+
+def test_exportPruneOnly(tmpdir, weights):
+    # -pw alone prunes without limiting the influence count
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -pw 0.0001 -f "%s"' % path)
+    assert weightFile.readWeights(path).numWeights == weights.numWeights
+
+
+def test_importByPosition(tmpdir, weights):
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+
+    # The same points in reverse vertex order
+    fakeMaya.newScene()
+    flipped = weights.take(range(len(weights) - 1, -1, -1))
+    cluster = createMesh(flipped, bind=False)
+    run('-a "import" -sp 1 -m "body" -f "%s"' % path)
+    expected = dict((len(weights) - 1 - vertId, row) for vertId, row in weights.toDict().items())
+    assertSameRows(expected, clusterWeights(cluster))
+
+
+def test_importRenamedInfluences(tmpdir):
+    # The file's left influences land on the right side joints, in the skin cluster's own order
+    weights = buildWeights(numInfs=3, infNames=['l_arm', 'l_elbow', 'spine'])
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+
+    fakeMaya.newScene()
+    cluster = createMesh(weights, infNames=['spine', 'r_elbow', 'r_arm'], bind=False)
+    run('-a "import" -r "l_=r_" -m "body" -f "%s"' % path)
+    order = [2, 1, 0]
+    expected = dict((vertId, dict((order[infId], w) for infId, w in row.items()))
+                    for vertId, row in weights.toDict().items())
+    assertSameRows(expected, clusterWeights(cluster))
+
+
+def test_importAddsInfluences(tmpdir, weights):
+    path = str(tmpdir.join('body.tbw'))
+    createMesh(weights)
+    run('-a "export" -m "body" -f "%s"' % path)
+
+    fakeMaya.newScene()
+    cluster = createMesh(weights, infNames=weights.infNames[:2], bind=False)
+    with pytest.raises(Exception):
+        run('-a "import" -m "body" -f "%s"' % path)
+    run('-a "import" -ai -m "body" -f "%s"' % path)
+    assert cluster.infNames == weights.infNames
+    assertSameRows(weights.toDict(), clusterWeights(cluster))
+
+
+def test_manyMeshesArchive(tmpdir):
+    body, head = buildWeights(seed=1), buildWeights(numVerts=10, seed=2, meshName='head')
+    createMesh(body)
+    createMesh(head, 'head')
+    path = str(tmpdir.join('character.zip'))
+    run('-a "export" -m "body" -m "head" -f "%s"' % path)
+    assert sorted(t.meshName for t in weightFile.readArchive(path)) == ['body', 'head']
+
+    fakeMaya.newScene()
+    bodyCluster = createMesh(body, bind=False)
+    headCluster = createMesh(head, 'head', bind=False)
+    run('-a "import" -m "body" -m "head" -f "%s"' % path)
+    assertSameRows(body.toDict(), clusterWeights(bodyCluster))
+    assertSameRows(head.toDict(), clusterWeights(headCluster))
+
+
+def test_manyMeshesFolder(tmpdir):
+    body, head = buildWeights(seed=1), buildWeights(numVerts=10, seed=2, meshName='head')
+    createMesh(body)
+    createMesh(head, 'head')
+    path = str(tmpdir.join('characterWeights'))
+    run('-a "export" -w 2 -fmt "xml" -m "body" -m "head" -f "%s"' % path)
+    assert sorted(tmpdir.join('characterWeights').listdir()) == [tmpdir.join('characterWeights', 'body.xml'),
+                                                                tmpdir.join('characterWeights', 'head.xml')]
+
+    fakeMaya.newScene()
+    bodyCluster = createMesh(body, bind=False)
+    headCluster = createMesh(head, 'head', bind=False)
+    run('-a "import" -fmt "xml" -m "body" -m "head" -f "%s"' % path)
+    assertSameRows(body.toDict(), clusterWeights(bodyCluster))
+    assertSameRows(head.toDict(), clusterWeights(headCluster))
+
+
+def test_snapshotRestore(tmpdir, weights):
+    path = str(tmpdir.join('snapshots'))
+    cluster = createMesh(weights)
+    run('-a "snapshot" -m "body" -f "%s"' % path)
+    for column in cluster.columns:
+        column[0] = 0.0
+    cluster.columns[0][0] = 1.0
+    run('-a "snapshot" -m "body" -f "%s"' % path)
+
+    run('-a "restore" -sn "body.0000" -m "body" -f "%s"' % path)
+    assertSameRows(weights.toDict(), clusterWeights(cluster))
+    run('-a "restore" -m "body" -f "%s"' % path)
+    assert clusterWeights(cluster)[0] == {0: 1.0}
+
+
+def test_profileSerialize(tmpdir, weights):
+    createMesh(weights)
+    report = str(tmpdir.join('profile.json'))
+    run('-a "export" -cp "serialize" -pro "%s" -m "body" -f "%s"' % (report, tmpdir.join('body.xml')))
+    assert tmpdir.join('profile.serialize.prof').size() > 0
+
+
+def test_mirror(tmpdir):
+    infNames = ['l_arm', 'r_arm', 'spine', 'c', 'd', 'e']
+    weights = buildWeights(infNames=infNames)
+    flat = [c if i % 3 == 0 else 0.0 for i, c in enumerate(weights.positions)]
+    weights.setPositions(flat)
+    cluster = createMesh(weights)
+    run('-a "mirror" -m "body" -ax "x" -r "l_=r_"')
+
+    mirrored = clusterWeights(cluster)
+    swap = {0: 1, 1: 0}
+    for vertId in range(len(weights)):
+        x = flat[3 * vertId]
+        if x > 0:
+            assert mirrored[vertId] == weights.toDict()[vertId]
+        else:
+            source = weights.toDict()[len(weights) - 1 - vertId]
+            assertSameRows({vertId: dict((swap.get(i, i), w) for i, w in source.items())},
+                           {vertId: mirrored[vertId]})
+
+
+def test_backgroundExport(tmpdir, weights):
+    path = str(tmpdir.join('body.tbc'))
+    createMesh(weights)
+    run('-a "export" -bg -m "body" -f "%s"' % path)
+    weightWriter.waitAll(10)
+    fakeMaya.processDeferred()
+    assertSameRows(weights.toDict(), weightFile.readWeights(path).toDict())
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import tbWeightTool
+import weightFile
+from conftest import assertSameWeights, buildWeights
+from skinWeights import SkinWeights
+
+
+def writeFile(tmpdir, fileName, weights):
+    path = str(tmpdir.join(fileName))
+    weightFile.writeWeights(path, weights)
+    return path
+
+
+def unnormalized(weights):
+    return SkinWeights(weights.vertIds, weights.offsets, weights.infIds, [w * 0.5 for w in weights.weights],
+                       weights.infNames, weights.meshName, weights.positions)
+
+
+# ---- convert ----
+
+
+@pytest.mark.parametrize('destination', ['body.tbc', 'body.tbw', 'copy.xml'])
+def test_convert(tmpdir, weights, destination):
+    source = writeFile(tmpdir, 'body.xml', weights)
+    assert tbWeightTool.main(['convert', source, str(tmpdir.join(destination))]) == 0
+    assertSameWeights(weights, weightFile.readWeights(str(tmpdir.join(destination))))
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_convertFolder(tmpdir, workers):
+    tables = [buildWeights(meshName='body', seed=1), buildWeights(numVerts=12, meshName='head', seed=2)]
+    sources = [writeFile(tmpdir, t.meshName + '.xml', t) for t in tables]
+    output = str(tmpdir.join('converted'))
+    assert tbWeightTool.main(['convert'] + sources + ['-o', output, '-fmt', 'binary', '-w', workers]) == 0
+    for table in tables:
+        assertSameWeights(table, weightFile.readWeights(str(tmpdir.join('converted', table.meshName + '.tbw'))))
+
+
+def test_convertFailure(tmpdir, weights, capsys):
+    good = writeFile(tmpdir, 'body.xml', weights)
+    bad = tmpdir.join('bad.xml')
+    bad.write('not xml')
+    output = str(tmpdir.join('converted'))
+    assert tbWeightTool.main(['convert', good, str(bad), '-o', output, '-fmt', 'chunked']) == 1
+    assert 'failed' in capsys.readouterr().out
+    assert tmpdir.join('converted', 'body.tbc').check()
+
+
+def test_convertArguments(tmpdir, weights):
+    source = writeFile(tmpdir, 'body.xml', weights)
+    with pytest.raises(SystemExit):
+        tbWeightTool.main(['convert', source, '-o', str(tmpdir.join('converted'))])
+    with pytest.raises(SystemExit):
+        tbWeightTool.main(['convert', source])
+
+
+# ---- stats and validate ----
+
+
+def test_stats(tmpdir, weights, capsys):
+    path = writeFile(tmpdir, 'body.tbw', unnormalized(weights))
+    # stats only reports, badly normalized files still exit 0
+    assert tbWeightTool.main(['stats', '--json', path]) == 0
+    report, = json.loads(capsys.readouterr().out)
+    assert report['vertices'] == len(weights)
+    assert report['weights'] == weights.numWeights
+    assert report['influences'] == len(weights.infNames)
+    assert report['normalization']['badVertices'] == len(weights)
+    assert not report['valid']
+
+
+@pytest.mark.parametrize('fileName', ['body.xml', 'body.tbw', 'body.tbc'])
+def test_validate(tmpdir, weights, fileName):
+    assert tbWeightTool.main(['validate', writeFile(tmpdir, fileName, weights)]) == 0
+
+
+def test_validateInvalid(tmpdir, weights, capsys):
+    good = writeFile(tmpdir, 'body.tbw', weights)
+    bad = writeFile(tmpdir, 'bad.tbw', unnormalized(weights))
+    assert tbWeightTool.main(['validate', good, bad]) == 1
+    out = capsys.readouterr().out
+    assert 'INVALID  %s' % bad in out
+    assert 'ok       %s' % good in out
+    # A looser tolerance lets it through
+    assert tbWeightTool.main(['validate', '-t', '0.6', bad]) == 0
+
+
+# ---- diff ----
+
+
+def test_diffSame(tmpdir, weights):
+    a = writeFile(tmpdir, 'body.xml', weights)
+    b = writeFile(tmpdir, 'body.tbc', weights)
+    assert tbWeightTool.main(['diff', a, b]) == 0
+
+
+def test_diffChanged(tmpdir, weights, capsys):
+    changed = weights.toDict()
+    changed[5] = {0: 1.0}
+    changed = SkinWeights.fromDict(changed, weights.infNames, weights.meshName)
+    a = writeFile(tmpdir, 'a.tbw', weights)
+    b = writeFile(tmpdir, 'b.tbw', changed)
+    csvFile = str(tmpdir.join('errors.csv'))
+    assert tbWeightTool.main(['diff', a, b, '--json', '--csv', csvFile]) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report['overTolerance'] == 1
+    assert report['worstVertex'] == 5
+    assert report['compared'] == len(weights)
+    with open(csvFile) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'vertId,maxAbsError,inA,inB'
+    assert len(lines) == len(weights) + 1
+    # Under a loose enough tolerance they match
+    assert tbWeightTool.main(['diff', a, b, '-t', '1.0']) == 0
+
+
+def test_diffMissingVertices(tmpdir, weights, capsys):
+    a = writeFile(tmpdir, 'a.tbw', weights)
+    b = writeFile(tmpdir, 'b.tbw', weights.slice(0, 30))
+    assert tbWeightTool.main(['diff', a, b, '--json']) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report['onlyInA'] == 10
+    assert report['onlyInB'] == 0
+
+
+def test_diffByInfluenceName(tmpdir):
+    # The same weights with influences stored in another order still match
+    a = SkinWeights([0, 1], [0, 2, 3], [0, 1, 1], [0.25, 0.75, 1.0], ['arm', 'spine'])
+    b = SkinWeights([0, 1], [0, 2, 3], [0, 1, 0], [0.75, 0.25, 1.0], ['spine', 'arm'])
+    assert tbWeightTool.main(['diff', writeFile(tmpdir, 'a.tbw', a), writeFile(tmpdir, 'b.tbw', b)]) == 0
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import transformMath
+
+kRotateOrders = list(range(6)) + ['zxy']
+
+
+def randomTransforms(count, seed=0):
+    """
+    Get random (translate, rotate, scale) triples
+    """
+    rng = random.Random(seed)
+    transforms = []
+    for n in range(count):
+        translate = [rng.uniform(-10, 10) for i in range(3)]
+        rotate = [rng.uniform(-179, 179) for i in range(3)]
+        scale = [rng.uniform(0.1, 3) for i in range(3)]
+        transforms.append((translate, rotate, scale))
+    return transforms
+
+
+def middleAxis(rotateOrder):
+    return transformMath.rotateOrderAxes(rotateOrder)[1]
+
+
+def flat(matrix):
+    if hasattr(matrix, 'ravel'):
+        return [float(v) for v in matrix.ravel()]
+    return list(matrix)
+
+
+def assertClose(a, b, tolerance=1e-9):
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        assert x == pytest.approx(y, abs=tolerance)
+
+
+@pytest.mark.parametrize('rotateOrder', kRotateOrders)
+def test_composeDecompose(rotateOrder):
+    for translate, rotate, scale in randomTransforms(20):
+        rotate[middleAxis(rotateOrder)] *= 85.0 / 179
+        matrix = transformMath.composeMatrix(translate, rotate, scale, rotateOrder)
+        t, r, s = transformMath.decomposeMatrix(matrix, rotateOrder)
+        assertClose(t, translate)
+        assertClose(r, rotate)
+        assertClose(s, scale)
+
+
+@pytest.mark.parametrize('rotateOrder', kRotateOrders)
+def test_gimbalLockKeepsMatrix(rotateOrder):
+    rotate = [30.0, 30.0, 30.0]
+    rotate[middleAxis(rotateOrder)] = 90.0
+    matrix = transformMath.composeMatrix((1, 2, 3), rotate, (1, 1, 1), rotateOrder)
+    t, r, s = transformMath.decomposeMatrix(matrix, rotateOrder)
+    assert r[transformMath.rotateOrderAxes(rotateOrder)[2]] == 0.0
+    assertClose(transformMath.composeMatrix(t, r, s, rotateOrder), matrix)
+
+
+def test_negativeScale():
+    matrix = transformMath.composeMatrix((0, 1, 0), (10, 20, 30), (-2, 1, 3))
+    t, r, s = transformMath.decomposeMatrix(matrix)
+    assert s[0] < 0
+    assertClose(transformMath.composeMatrix(t, r, s), matrix)
+
+
+def test_rotateAxisAndJointOrient():
+    rotateAxis, jointOrient = (5, -10, 15), (0, 45, -30)
+    matrix = transformMath.composeMatrix((1, 2, 3), (20, -40, 60), (1, 2, 1), 3, rotateAxis, jointOrient)
+    t, r, s = transformMath.decomposeMatrix(matrix, 3, rotateAxis, jointOrient)
+    assertClose(t, (1, 2, 3))
+    assertClose(r, (20, -40, 60))
+    assertClose(s, (1, 2, 1))
+
+
+def test_inverse():
+    for translate, rotate, scale in randomTransforms(10, seed=1):
+        matrix = transformMath.composeMatrix(translate, rotate, scale)
+        assertClose(transformMath.multiply(matrix, transformMath.inverse(matrix)), transformMath.kIdentity)
+
+
+def test_inverseSingular():
+    with pytest.raises(Exception):
+        transformMath.inverse(transformMath.composeMatrix(scale=(1, 0, 1)))
+
+
+def test_localMatrix():
+    (t1, r1, s1), (t2, r2, s2) = randomTransforms(2, seed=2)
+    local = transformMath.composeMatrix(t1, r1, s1)
+    parent = transformMath.composeMatrix(t2, r2, s2)
+    world = transformMath.multiply(local, parent)
+    assertClose(transformMath.localMatrix(world, parent), local)
+    assertClose(transformMath.transformPoint((0, 0, 0), world), world[12:15])
+
+
+@pytest.mark.parametrize('rotateOrder', [0, 4])
+def test_batchesMatchSingles(rotateOrder):
+    transforms = randomTransforms(15, seed=3)
+    for translate, rotate, scale in transforms:
+        rotate[middleAxis(rotateOrder)] *= 85.0 / 179
+    translates, rotates, scales = zip(*transforms)
+    matrices = transformMath.composeMatrices(translates, rotates, scales, rotateOrder)
+    for matrix, (translate, rotate, scale) in zip(matrices, transforms):
+        assertClose(flat(matrix), transformMath.composeMatrix(translate, rotate, scale, rotateOrder))
+
+    ts, rs, ss = transformMath.decomposeMatrices(matrices, rotateOrder)
+    for t, r, s, (translate, rotate, scale) in zip(ts, rs, ss, transforms):
+        assertClose(flat(t), translate)
+        assertClose(flat(r), rotate)
+        assertClose(flat(s), scale)
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import weightCache
+import weightFile
+from conftest import assertSameWeights, buildWeights
+from weightCache import WeightCache
+
+
+def writeTables(tmpdir, count, fileName='body%d.tbw'):
+    paths = []
+    for i in range(count):
+        paths.append(str(tmpdir.join(fileName % i)))
+        weightFile.writeWeights(paths[-1], buildWeights(seed=i))
+    return paths
+
+
+def test_hitReturnsSameTable(tmpdir, weights):
+    path = str(tmpdir.join('body.xml'))
+    weightFile.writeWeights(path, weights)
+    cache = WeightCache()
+    first = cache.read(path)
+    assert cache.read(path) is first
+    assertSameWeights(weights, first)
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_changedFileMisses(tmpdir, weights):
+    path = str(tmpdir.join('body.tbw'))
+    weightFile.writeWeights(path, weights)
+    cache = WeightCache()
+    cache.read(path)
+
+    # A new size
+    other = buildWeights(numVerts=20, seed=3)
+    weightFile.writeWeights(path, other)
+    assertSameWeights(other, cache.read(path))
+
+    # The same size, only the modification time moves
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    cache.read(path)
+    assert cache.stats()['misses'] == 3
+    assert cache.stats()['hits'] == 0
+
+
+def test_leastRecentlyUsedIsEvicted(tmpdir):
+    a, b, c = writeTables(tmpdir, 3)
+    size = weightCache.tableBytes(weightFile.readWeights(a))
+    cache = WeightCache(maxBytes=2 * size)
+    cache.read(a)
+    cache.read(b)
+    cache.read(a)
+    cache.read(c)
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 2 * size
+
+    cache.read(a)
+    assert cache.stats()['hits'] == 2
+    cache.read(b)
+    assert cache.stats()['misses'] == 4
+
+
+def test_tooBigIsNotCached(tmpdir):
+    path, = writeTables(tmpdir, 1)
+    cache = WeightCache(maxBytes=10)
+    cache.read(path)
+    assert len(cache) == 0
+
+
+def test_partialChunkedMissIsNotCached(tmpdir, weights):
+    path = str(tmpdir.join('body.tbc'))
+    weightFile.writeWeights(path, weights)
+    cache = WeightCache()
+    assertSameWeights(weights.subset([1, 2]), cache.read(path, vertIds=[1, 2]))
+    assert len(cache) == 0
+    cache.read(path)
+    assertSameWeights(weights.subset([1, 2]), cache.read(path, vertIds=[1, 2]))
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize('fileName', ['body.xml', 'body.tbc'])
+def test_sidecarRoundTrip(tmpdir, monkeypatch, weights, fileName):
+    path = str(tmpdir.join(fileName))
+    weightFile.writeWeights(path, weights)
+    WeightCache(sidecars=True).read(path)
+    assert os.path.exists(path + weightCache.kSidecarExtension)
+
+    # A new session reads the sidecar without parsing the source
+    def fail(*args, **kwargs):
+        raise AssertionError('source was parsed')
+
+    monkeypatch.setattr(weightFile, 'readWeights', fail)
+    assertSameWeights(weights, WeightCache(sidecars=True).read(path))
+
+
+def test_staleSidecarIsIgnored(tmpdir, weights):
+    path = str(tmpdir.join('body.xml'))
+    weightFile.writeWeights(path, weights)
+    WeightCache(sidecars=True).read(path)
+
+    other = buildWeights(numVerts=20, seed=3)
+    weightFile.writeWeights(path, other)
+    assertSameWeights(other, WeightCache(sidecars=True).read(path))
+    key = weightCache.fileKey(path)
+    assertSameWeights(other, weightCache.readSidecar(path + weightCache.kSidecarExtension, key))
+
+
+def test_noSidecarForBinary(tmpdir, weights):
+    path, = writeTables(tmpdir, 1)
+    WeightCache(sidecars=True).read(path)
+    assert not os.path.exists(path + weightCache.kSidecarExtension)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_readMany(tmpdir, workers):
+    paths = writeTables(tmpdir, 2, 'body%d.xml') + writeTables(tmpdir, 2)
+    cache = WeightCache()
+    jobs = [(path, None, None) for path in paths]
+    tables = cache.readMany(jobs, workers)
+    for i, table in enumerate(tables):
+        assertSameWeights(buildWeights(seed=i % 2), table)
+    assert len(cache) == 4
+    assert [t is c for t, c in zip(cache.readMany(jobs, workers), tables)] == [True] * 4
@@ -0,0 +1,150 @@
+import zipfile
+
+import pytest
+
+import weightFile
+from conftest import assertSameWeights, buildWeights
+
+kFormats = [(weightFile.kFormatXml, 'body.xml'),
+            (weightFile.kFormatBinary, 'body.tbw'),
+            (weightFile.kFormatChunked, 'body.tbc')]
+
+
+@pytest.mark.parametrize('fileFormat, fileName', kFormats)
+def test_roundTrip(tmpdir, weights, fileFormat, fileName):
+    path = str(tmpdir.join(fileName))
+    weightFile.writeWeights(path, weights)
+    assert weightFile.formatFromFileName(path) == fileFormat
+    assertSameWeights(weights, weightFile.readWeights(path))
+
+
+@pytest.mark.parametrize('fileFormat, fileName', kFormats)
+def test_roundTripWithoutPositions(tmpdir, fileFormat, fileName):
+    weights = buildWeights(positions=False)
+    path = str(tmpdir.join(fileName))
+    weightFile.writeWeights(path, weights, fileFormat)
+    assertSameWeights(weights, weightFile.readWeights(path, fileFormat))
+
+
+@pytest.mark.parametrize('fileFormat, fileName', kFormats)
+def test_roundTripEmpty(tmpdir, fileFormat, fileName):
+    weights = buildWeights(numVerts=0)
+    path = str(tmpdir.join(fileName))
+    weightFile.writeWeights(path, weights)
+    read = weightFile.readWeights(path)
+    assert len(read) == 0
+    assert read.infNames == weights.infNames
+
+
+@pytest.mark.parametrize('fileFormat', [weightFile.kFormatXml, weightFile.kFormatBinary, weightFile.kFormatChunked])
+def test_encodeDecode(weights, fileFormat):
+    data = weightFile.encodeWeights(weights, fileFormat)
+    assertSameWeights(weights, weightFile.decodeWeights(data, fileFormat))
+
+
+def test_rewriteReadTable(tmpdir, weights):
+    # A table read from a file must not keep the file open, writing it back replaces the same path
+    path = str(tmpdir.join('body.tbw'))
+    weightFile.writeWeights(path, weights)
+    read = weightFile.readWeights(path)
+    weightFile.writeWeights(path, read)
+    assertSameWeights(weights, weightFile.readWeights(path))
+
+
+def test_notBinary(tmpdir, weights):
+    path = str(tmpdir.join('body.xml'))
+    weightFile.writeWeights(path, weights)
+    with pytest.raises(Exception):
+        weightFile.readWeights(path, weightFile.kFormatBinary)
+
+
+def test_xmlSparseInfluenceIdx(tmpdir):
+    # Influence idx values in a hand edited file don't have to start at 0 or be contiguous
+    path = tmpdir.join('body.xml')
+    path.write('<root><influences>'
+               '<influence idx="7" name="hand"/><influence idx="2" name="arm"/>'
+               '</influences><mesh name="body">'
+               '<vertId index="0"><inf idx="2" weight="0.25"/><inf idx="7" weight="0.75"/></vertId>'
+               '<vertId index="1"><inf idx="7" weight="1.0"/></vertId>'
+               '</mesh></root>')
+    read = weightFile.readWeights(str(path))
+    assert read.infNames == ['arm', 'hand']
+    rows = [(vertId, list(infIds), list(values)) for vertId, infIds, values in read]
+    assert rows == [(0, [0, 1], [0.25, 0.75]), (1, [1], [1.0])]
+
+
+def test_xmlUnlistedInfluenceIdx(tmpdir):
+    path = tmpdir.join('body.xml')
+    path.write('<root><influences><influence idx="0" name="arm"/></influences><mesh name="body">'
+               '<vertId index="0"><inf idx="3" weight="1.0"/></vertId>'
+               '</mesh></root>')
+    with pytest.raises(Exception):
+        weightFile.readWeights(str(path))
+
+
+@pytest.mark.parametrize('fileFormat', [weightFile.kFormatXml, weightFile.kFormatBinary])
+def test_archiveRoundTrip(tmpdir, fileFormat):
+    tables = [buildWeights(meshName='body', seed=1), buildWeights(numVerts=12, meshName='head', seed=2)]
+    path = str(tmpdir.join('character.zip'))
+    weightFile.writeArchive(path, tables, fileFormat, workers=1)
+    assert sorted(zipfile.ZipFile(path).namelist()) == sorted(weightFile.memberName(t.meshName, fileFormat)
+                                                              for t in tables)
+    for table, read in zip(tables, weightFile.readArchive(path, workers=1)):
+        assertSameWeights(table, read)
+
+
+def test_writeReadMany(tmpdir):
+    tables = [buildWeights(meshName='body', seed=1), buildWeights(numVerts=12, meshName='head', seed=2)]
+    jobs = [(str(tmpdir.join(weightFile.memberName(t.meshName, weightFile.kFormatBinary))), t, None, True)
+            for t in tables]
+    fileNames = weightFile.writeMany(jobs, workers=2)
+    assert fileNames == [job[0] for job in jobs]
+    for table, read in zip(tables, weightFile.readMany([(f, None) for f in fileNames], workers=2)):
+        assertSameWeights(table, read)
+
+
+def test_poolProcesses(monkeypatch):
+    assert not weightFile.poolProcesses([weightFile.kFormatBinary, weightFile.kFormatChunked])
+    assert weightFile.poolProcesses([weightFile.kFormatBinary, weightFile.kFormatXml])
+    # Interactive Maya only spawns mayapy workers when they are asked for
+    monkeypatch.setattr(weightFile, 'inMaya', lambda: True)
+    assert not weightFile.poolProcesses([weightFile.kFormatXml])
+    assert weightFile.poolProcesses([weightFile.kFormatXml], workers=4)
+
+
+def test_chunkedPartialRead(tmpdir, weights):
+    path = str(tmpdir.join('body.tbc'))
+    weightFile.writeChunked(path, weights, chunkSize=8)
+    vertIds = [3, 17, 18, 39]
+    assertSameWeights(weights.subset(vertIds), weightFile.readChunked(path, vertIds))
+
+
+def test_chunkedReadsOnlyNeededChunks(tmpdir, weights):
+    path = str(tmpdir.join('body.tbc'))
+    weightFile.writeChunked(path, weights, chunkSize=8)
+    with weightFile.ChunkedReader(path) as reader:
+        assert len(reader.index) == 5
+        assert [entry[:2] for entry in reader.index] == [(i, i + 7) for i in range(0, 40, 8)]
+        read = []
+        readChunk = reader.readChunk
+        reader.readChunk = lambda chunk: read.append(chunk) or readChunk(chunk)
+        assertSameWeights(weights.subset(range(9, 13)), reader.readRange(9, 12))
+        assert read == [1]
+
+
+@pytest.mark.parametrize('codec', [weightFile.kCodecNone, weightFile.kCodecZlib, weightFile.kCodecLzma])
+def test_chunkedCodecs(tmpdir, weights, codec):
+    if codec == weightFile.kCodecLzma and weightFile.lzma is None:
+        pytest.skip('no lzma module')
+    path = str(tmpdir.join('body.tbc'))
+    weightFile.writeChunked(path, weights, chunkSize=16, codec=codec)
+    assertSameWeights(weights, weightFile.readChunked(path))
+
+
+@pytest.mark.parametrize('fileFormat, fileName', kFormats)
+def test_blocksRoundTrip(tmpdir, weights, fileFormat, fileName):
+    source = str(tmpdir.join(fileName))
+    copy = str(tmpdir.join('copy_' + fileName))
+    weightFile.writeWeights(source, weights)
+    weightFile.writeBlocks(copy, weightFile.iterBlocks(source, blockSize=7))
+    assertSameWeights(weights, weightFile.readWeights(copy))
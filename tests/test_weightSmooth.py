@@ -0,0 +1,122 @@
+import pytest
+
+import weightSmooth
+from conftest import buildWeights
+from weightSmooth import Adjacency, smoothWeights
+
+kSide = 6
+
+
+def gridPolygons(side=kSide):
+    """
+    Quad faces of a side x side vertex grid as (counts, vertexList)
+    """
+    vertexList = []
+    for row in range(side - 1):
+        for column in range(side - 1):
+            v = row * side + column
+            vertexList.extend([v, v + 1, v + side + 1, v + side])
+    return [4] * (len(vertexList) // 4), vertexList
+
+
+def gridAdjacency(side=kSide):
+    return Adjacency.fromPolygons(side * side, *gridPolygons(side))
+
+
+def assertSameRows(a, b):
+    assert sorted(a) == sorted(b)
+    for vertId in a:
+        assert sorted(a[vertId]) == sorted(b[vertId])
+        for infId, value in a[vertId].items():
+            assert value == pytest.approx(b[vertId][infId])
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def useNumpy(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(weightSmooth, 'np', None)
+    elif weightSmooth.np is None:
+        pytest.skip('no numpy')
+    return request.param
+
+
+def smoothBothWays(monkeypatch, *args, **kwargs):
+    """
+    Smooth on the vectorized path and on the pure python one
+    """
+    weights = buildWeights(numVerts=kSide * kSide, perVert=2)
+    vectorized = smoothWeights(weights, gridAdjacency(), *args, **kwargs)
+    monkeypatch.setattr(weightSmooth, 'np', None)
+    python = smoothWeights(weights, gridAdjacency(), *args, **kwargs)
+    return weights, vectorized, python
+
+
+def test_neighbours(useNumpy):
+    adjacency = gridAdjacency()
+    assert adjacency.neighbours(0) == [1, kSide]
+    assert adjacency.neighbours(kSide + 1) == [1, kSide, kSide + 2, 2 * kSide + 1]
+
+
+@pytest.mark.parametrize('mask', [None, [7, 8, 9, 14], {7: 1.0, 8: 0.5, 20: 0.25}])
+def test_numpyMatchesPython(monkeypatch, mask):
+    if weightSmooth.np is None:
+        pytest.skip('no numpy')
+    weights, vectorized, python = smoothBothWays(monkeypatch, iterations=3, strength=0.6, mask=mask)
+    assert list(vectorized.vertIds) == list(python.vertIds)
+    assertSameRows(vectorized.toDict(), python.toDict())
+
+
+def test_smoothingEvensOut(useNumpy):
+    weights = buildWeights(numVerts=kSide * kSide, perVert=2)
+    smoothed = smoothWeights(weights, gridAdjacency(), iterations=20, strength=1.0)
+    assert len(smoothed) == len(weights)
+    for vertId, infIds, values in smoothed:
+        assert sum(values) == pytest.approx(1.0)
+    # Every influence spreads out, rows end up holding more influences than they started with
+    assert smoothed.numWeights > weights.numWeights
+
+
+def test_mask(useNumpy):
+    weights = buildWeights(numVerts=kSide * kSide, perVert=2)
+    smoothed = smoothWeights(weights, gridAdjacency(), mask={7: 1.0, 8: 0.0})
+    assert list(smoothed.vertIds) == [7, 8]
+    rows = smoothed.toDict()
+    assert rows[7] != weights.toDict()[7]
+    assertSameRows({8: weights.toDict()[8]}, {8: rows[8]})
+
+
+def test_threshold(useNumpy):
+    weights = buildWeights(numVerts=kSide * kSide, perVert=2)
+    smoothed = smoothWeights(weights, gridAdjacency(), iterations=2, threshold=0.05)
+    for vertId, infIds, values in smoothed:
+        assert min(values) > 0.05
+        assert sum(values) == pytest.approx(1.0)
+
+
+def test_thresholdKeepsLargestWeight(useNumpy):
+    # Every weight is under the threshold, each vertex still keeps its largest one
+    weights = buildWeights(numVerts=kSide * kSide, numInfs=6, perVert=6)
+    smoothed = smoothWeights(weights, gridAdjacency(), iterations=1, threshold=0.9)
+    assert len(smoothed) == len(weights)
+    assert [len(infIds) for vertId, infIds, values in smoothed] == [1] * len(weights)
+    assert [values[0] for vertId, infIds, values in smoothed] == [1.0] * len(weights)
+
+
+def test_isolatedVertexKeepsWeights(useNumpy):
+    weights = buildWeights(numVerts=5, perVert=2)
+    adjacency = Adjacency(5, [0, 1, 2], [1, 2, 3])
+    smoothed = smoothWeights(weights, adjacency, iterations=4, strength=1.0, mask=[4])
+    assertSameRows({4: weights.toDict()[4]}, smoothed.toDict())
+
+
+def test_cachedAdjacency():
+    builds = []
+    build = lambda: builds.append(1) or gridAdjacency()
+    key = ('body', kSide * kSide, weightSmooth.connectivityHash(*gridPolygons()))
+    weightSmooth.clearAdjacencyCache()
+    try:
+        assert weightSmooth.cachedAdjacency(key, build) is weightSmooth.cachedAdjacency(key, build)
+        assert len(builds) == 1
+        assert weightSmooth.connectivityHash(*gridPolygons(5)) != key[2]
+    finally:
+        weightSmooth.clearAdjacencyCache()
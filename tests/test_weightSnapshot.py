@@ -0,0 +1,100 @@
+import os
+
+from conftest import assertSameWeights, buildWeights
+from skinWeights import SkinWeights
+from weightSnapshot import SnapshotStore
+
+
+def chunkCount(store):
+    return len(os.listdir(store.chunkPath))
+
+
+def setRow(weights, row, infIds, values):
+    """
+    Get a copy of a table with one row's weights replaced
+    """
+    rows = weights.toDict()
+    rows[weights.vertIds[row]] = dict(zip(infIds, values))
+    changed = SkinWeights.fromDict(rows, weights.infNames, weights.meshName)
+    changed.setPositions(weights.positions)
+    return changed
+
+
+def test_unchangedBlocksAreShared(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    name, numWritten, seconds = store.save(weights)
+    assert name == 'body.0000'
+    assert numWritten == 5
+    assert seconds >= 0
+
+    # Nothing changed, nothing new is stored
+    name, numWritten, seconds = store.save(weights)
+    assert name == 'body.0001'
+    assert numWritten == 0
+    assert chunkCount(store) == 5
+    assert store.manifest(name)['blocks'] == {}
+
+
+def test_changedBlockOnly(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    store.save(weights)
+    changed = setRow(weights, 10, [0, 1], [0.5, 0.5])
+    name, numWritten, seconds = store.save(changed)
+    assert numWritten == 1
+    assert sorted(store.manifest(name)['blocks']) == ['1']
+    assertSameWeights(changed, store.load(name))
+    assertSameWeights(weights, store.load('body.0000'))
+
+
+def test_restoreThroughParents(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    tables = [weights]
+    store.save(weights)
+    for row in (3, 17, 35):
+        tables.append(setRow(tables[-1], row, [2], [1.0]))
+        store.save(tables[-1])
+    assert store.snapshots('body') == ['body.0000', 'body.0001', 'body.0002', 'body.0003']
+    for name, table in zip(store.snapshots('body'), tables):
+        assertSameWeights(table, store.load(name))
+
+
+def test_positionsAreStored(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    store.save(weights)
+    moved = SkinWeights(weights.vertIds, weights.offsets, weights.infIds, weights.weights, weights.infNames,
+                        weights.meshName, [p + 1.0 if i == 0 else p for i, p in enumerate(weights.positions)])
+    name, numWritten, seconds = store.save(moved)
+    assert numWritten == 1
+    assertSameWeights(moved, store.load(name))
+
+
+def test_fullManifestEndsTheWalk(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8, fullInterval=2)
+    table = weights
+    for row in range(5):
+        table = setRow(table, row * 8, [1], [1.0])
+        store.save(table)
+    manifests = [store.manifest(name) for name in store.snapshots('body')]
+    assert [m['full'] for m in manifests] == [True, False, True, False, True]
+    assert len(manifests[2]['blocks']) == 5
+
+    # Restoring the latest never reads past the last full manifest
+    os.remove(os.path.join(store.snapshotPath, 'body.0000.json'))
+    os.remove(os.path.join(store.snapshotPath, 'body.0001.json'))
+    assertSameWeights(table, store.load('body.0004'))
+
+
+def test_newInfluencesStartANewChain(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    store.save(weights)
+    renamed = buildWeights(infNames=['root'] + weights.infNames[1:])
+    name, numWritten, seconds = store.save(renamed)
+    assert store.manifest(name)['parent'] is None
+    assertSameWeights(renamed, store.load(name))
+
+
+def test_noTempFilesLeft(tmpdir, weights):
+    store = SnapshotStore(str(tmpdir), blockSize=8)
+    store.save(weights)
+    store.save(weights)
+    assert sorted(os.listdir(store.snapshotPath)) == ['body.0000.json', 'body.0001.json']
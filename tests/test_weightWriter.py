@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+import weightFile
+import weightWriter
+from conftest import assertSameWeights
+
+
+def test_writeFile(tmpdir, weights):
+    path = str(tmpdir.join('body.tbc'))
+    progress = []
+    done = []
+    task = weightWriter.submit(lambda report: weightFile.writeWeights(path, weights, progress=report), path,
+                               progress=lambda d, t: progress.append((d, t)), done=done.append)
+    task.wait(10)
+    assert task.finished
+    assert task.error is None
+    assert done == [task]
+    assert progress[-1] == (len(weights), len(weights))
+    assertSameWeights(weights, weightFile.readWeights(path))
+
+
+def test_tasksRunInOrder():
+    order = []
+
+    def write(name, delay):
+        def run(progress):
+            time.sleep(delay)
+            order.append(name)
+            return name
+        return run
+
+    tasks = [weightWriter.submit(write('slow', 0.05)), weightWriter.submit(write('fast', 0.0))]
+    weightWriter.waitAll(10)
+    assert order == ['slow', 'fast']
+    assert [task.result for task in tasks] == ['slow', 'fast']
+    assert weightWriter.pending() == []
+
+
+def test_runsOffTheCallingThread():
+    task = weightWriter.submit(lambda progress: threading.current_thread().name)
+    assert task.wait(10) == 'weightWriter'
+
+
+def test_errorIsRaisedByWait():
+    done = []
+
+    def fail(progress):
+        raise IOError('disk full')
+
+    task = weightWriter.submit(fail, 'body.tbw', done=done.append)
+    with pytest.raises(IOError):
+        task.wait(10)
+    assert done == [task]
+    assert str(task.error) == 'disk full'
+
+
+def test_failingCallback(capsys):
+    def progress(done, total):
+        raise RuntimeError('progress failed')
+
+    task = weightWriter.submit(lambda report: report(1, 1) or 'written', progress=progress)
+    assert task.wait(10) == 'written'
+    assert 'progress failed' in capsys.readouterr().err
+
+
+def test_deferrer():
+    # Callbacks wait on the deferrer's queue, like executeDeferred waits for Maya to go idle
+    deferred = []
+    done = []
+    task = weightWriter.submit(lambda report: report(1, 2), progress=lambda d, t: done.append((d, t)),
+                               done=lambda t: done.append('done'),
+                               deferrer=lambda func, *args: deferred.append((func, args)))
+    task.wait(10)
+    assert done == []
+    for func, args in deferred:
+        func(*args)
+    assert done == [(1, 2), 'done']
+
+
+def test_listeners():
+    finished = []
+    weightWriter.addListener(finished.append)
+    try:
+        task = weightWriter.submit(lambda progress: None)
+        task.wait(10)
+    finally:
+        weightWriter.removeListener(finished.append)
+    assert finished == [task]
+
+
+def test_waitTimeout():
+    event = threading.Event()
+    task = weightWriter.submit(lambda progress: event.wait(10))
+    try:
+        with pytest.raises(Exception):
+            task.wait(0.01)
+    finally:
+        event.set()
+    task.wait(10)
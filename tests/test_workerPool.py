@@ -0,0 +1,34 @@
+import pytest
+
+import workerPool
+
+
+def square(x):
+    return x * x
+
+
+@pytest.mark.parametrize('workers', [None, 1, 3])
+def test_mapPoolKeepsOrder(workers):
+    assert workerPool.mapPool(square, range(20), workers) == [x * x for x in range(20)]
+
+
+def test_mapPoolProcesses():
+    assert workerPool.mapPool(abs, range(-5, 5), 2, processes=True) == [abs(x) for x in range(-5, 5)]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_mapPoolProgress(workers):
+    calls = []
+    workerPool.mapPool(square, range(6), workers, progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(done, 6) for done in range(1, 7)]
+
+
+def test_mapPoolEmpty():
+    assert workerPool.mapPool(square, []) == []
+
+
+def test_inMaya(monkeypatch):
+    monkeypatch.setattr(workerPool.sys, 'executable', '/usr/autodesk/maya2020/bin/maya.bin')
+    assert workerPool.inMaya()
+    monkeypatch.setattr(workerPool.sys, 'executable', '/usr/autodesk/maya2020/bin/mayapy')
+    assert not workerPool.inMaya()
@@ -0,0 +1,259 @@
+# ---- Transform math ----
+# World matrix composition and decomposition with Maya's conventions, so transforms can be worked out
+# in python and written to the scene in one pass instead of snapping with temporary constraints.
+# Nothing in here touches Maya.
+
+# ---- Conventions ----
+# Matrices are 16 floats, row major, points are row vectors and translation is the last row,
+# the same layout as xform -q -m and the worldMatrix attribute.
+# Rotations are in degrees, rotate orders are Maya's rotateOrder enum (0 xyz ... 5 zyx) or its names.
+# A transform is  scale * rotateAxis * rotate * jointOrient * translate,  pivots and shear are not modelled.
+# The *Matrices functions take and return arrays of many transforms at once, vectorized with numpy
+# when it is available.
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+kRotateOrders = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')
+kIdentity = (1.0, 0.0, 0.0, 0.0,
+             0.0, 1.0, 0.0, 0.0,
+             0.0, 0.0, 1.0, 0.0,
+             0.0, 0.0, 0.0, 1.0)
+kGimbalTolerance = 1e-9
+
+_axes = {'x': 0, 'y': 1, 'z': 2}
+
+
+def rotateOrderAxes(rotateOrder):
+    """
+    Get the axis indices of a rotate order, in the order they are applied
+    """
+    if not isinstance(rotateOrder, str):
+        rotateOrder = kRotateOrders[rotateOrder]
+    return [_axes[axis] for axis in rotateOrder.lower()]
+
+
+def axisMatrix(axis, angle):
+    """
+    Get the 3x3 rotation about one axis as 3 rows, angle in degrees
+    """
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+    rows = [[0.0] * 3 for n in range(3)]
+    rows[axis][axis] = 1.0
+    rows[i][i], rows[i][j] = c, s
+    rows[j][i], rows[j][j] = -s, c
+    return rows
+
+
+def _multiply3(a, b):
+    return [[a[r][0] * b[0][c] + a[r][1] * b[1][c] + a[r][2] * b[2][c] for c in range(3)] for r in range(3)]
+
+
+def _transpose3(a):
+    return [[a[c][r] for c in range(3)] for r in range(3)]
+
+
+def eulerToRotation(rotate, rotateOrder=0):
+    """
+    Get the 3x3 rotation of euler angles as 3 rows
+    """
+    rows = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for axis in rotateOrderAxes(rotateOrder):
+        rows = _multiply3(rows, axisMatrix(axis, rotate[axis]))
+    return rows
+
+
+def rotationToEuler(rows, rotateOrder=0):
+    """
+    Get the euler angles of a 3x3 rotation without scale
+    At gimbal lock the last axis is zeroed
+    """
+    i, j, k = rotateOrderAxes(rotateOrder)
+    # xyz, yzx and zxy are the cyclic orders
+    parity = 1.0 if (j - i) % 3 == 1 else -1.0
+    sinB = max(-1.0, min(1.0, -parity * rows[i][k]))
+    angles = [0.0, 0.0, 0.0]
+    angles[j] = math.asin(sinB)
+    if abs(sinB) < 1.0 - kGimbalTolerance:
+        angles[i] = math.atan2(parity * rows[j][k], rows[k][k])
+        angles[k] = math.atan2(parity * rows[i][j], rows[i][i])
+    else:
+        angles[i] = math.atan2(-parity * rows[k][j], rows[j][j])
+    return [math.degrees(angle) for angle in angles]
+
+
+def composeMatrix(translate=(0.0, 0.0, 0.0), rotate=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0), rotateOrder=0,
+                  rotateAxis=None, jointOrient=None):
+    """
+    Get the local matrix of transform attribute values
+    """
+    rows = eulerToRotation(rotate, rotateOrder)
+    if rotateAxis is not None:
+        rows = _multiply3(eulerToRotation(rotateAxis), rows)
+    if jointOrient is not None:
+        rows = _multiply3(rows, eulerToRotation(jointOrient))
+    matrix = []
+    for axis in range(3):
+        matrix.extend([value * scale[axis] for value in rows[axis]] + [0.0])
+    matrix.extend(list(translate) + [1.0])
+    return matrix
+
+
+def decomposeMatrix(matrix, rotateOrder=0, rotateAxis=None, jointOrient=None):
+    """
+    Get (translate, rotate, scale) of a local matrix, a negative determinant flips the x scale
+    """
+    rows = [list(matrix[4 * r:4 * r + 3]) for r in range(3)]
+    scale = [math.sqrt(sum(v * v for v in row)) for row in rows]
+    if _determinant3(rows) < 0:
+        scale[0] = -scale[0]
+    rows = [[v / s if s else 0.0 for v in row] for row, s in zip(rows, scale)]
+    if rotateAxis is not None:
+        rows = _multiply3(_transpose3(eulerToRotation(rotateAxis)), rows)
+    if jointOrient is not None:
+        rows = _multiply3(rows, _transpose3(eulerToRotation(jointOrient)))
+    return list(matrix[12:15]), rotationToEuler(rows, rotateOrder), scale
+
+
+def _determinant3(a):
+    return (a[0][0] * (a[1][1] * a[2][2] - a[1][2] * a[2][1]) -
+            a[0][1] * (a[1][0] * a[2][2] - a[1][2] * a[2][0]) +
+            a[0][2] * (a[1][0] * a[2][1] - a[1][1] * a[2][0]))
+
+
+def multiply(a, b):
+    """
+    Get a * b, apply a then b
+    """
+    return [sum(a[4 * r + n] * b[4 * n + c] for n in range(4)) for r in range(4) for c in range(4)]
+
+
+def inverse(matrix):
+    """
+    Invert an affine matrix
+    """
+    rows = [list(matrix[4 * r:4 * r + 3]) for r in range(3)]
+    det = _determinant3(rows)
+    if abs(det) < 1e-12:
+        raise Exception('Matrix has no inverse')
+    cofactors = [[rows[(c + 1) % 3][(r + 1) % 3] * rows[(c + 2) % 3][(r + 2) % 3] -
+                  rows[(c + 1) % 3][(r + 2) % 3] * rows[(c + 2) % 3][(r + 1) % 3] for c in range(3)]
+                 for r in range(3)]
+    inverted = [[value / det for value in row] for row in cofactors]
+    translate = transformPoint(matrix[12:15], [row + [0.0] for row in inverted] + [[0.0, 0.0, 0.0, 1.0]],
+                               rotateOnly=True)
+    result = []
+    for row in inverted:
+        result.extend(row + [0.0])
+    result.extend([-v for v in translate] + [1.0])
+    return result
+
+
+def transformPoint(point, matrix, rotateOnly=False):
+    """
+    Get a point times a matrix, matrix can also be 4 rows of 4
+    """
+    if len(matrix) == 16:
+        matrix = [matrix[4 * r:4 * r + 4] for r in range(4)]
+    return [point[0] * matrix[0][c] + point[1] * matrix[1][c] + point[2] * matrix[2][c] +
+            (0.0 if rotateOnly else matrix[3][c]) for c in range(3)]
+
+
+def localMatrix(world, parentWorld):
+    """
+    Get the local matrix that puts a node at world under a parent at parentWorld
+    """
+    return multiply(world, inverse(parentWorld))
+
+
+def withoutScale(matrix):
+    """
+    Get a matrix with unit length axes, the translation is kept
+    """
+    result = list(matrix)
+    for r in range(3):
+        row = matrix[4 * r:4 * r + 3]
+        length = math.sqrt(sum(v * v for v in row)) or 1.0
+        result[4 * r:4 * r + 3] = [v / length for v in row]
+    return result
+
+
+# ---- Batches ----
+
+def _axisMatrices(axis, angles):
+    c, s = np.cos(np.radians(angles)), np.sin(np.radians(angles))
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+    rows = np.zeros((len(angles), 3, 3))
+    rows[:, axis, axis] = 1.0
+    rows[:, i, i], rows[:, i, j] = c, s
+    rows[:, j, i], rows[:, j, j] = -s, c
+    return rows
+
+
+def eulerToRotations(rotates, rotateOrder=0):
+    """
+    Get the n x 3 x 3 rotations of n x 3 euler angles sharing one rotate order
+    """
+    if np is None:
+        return [eulerToRotation(rotate, rotateOrder) for rotate in rotates]
+    rotates = np.asarray(rotates, dtype='f8').reshape(-1, 3)
+    rows = np.broadcast_to(np.eye(3), (len(rotates), 3, 3))
+    for axis in rotateOrderAxes(rotateOrder):
+        rows = np.matmul(rows, _axisMatrices(axis, rotates[:, axis]))
+    return rows
+
+
+def rotationsToEuler(rows, rotateOrder=0):
+    """
+    Get the n x 3 euler angles of n x 3 x 3 rotations without scale, see rotationToEuler()
+    """
+    if np is None:
+        return [rotationToEuler(r, rotateOrder) for r in rows]
+    rows = np.asarray(rows, dtype='f8')
+    i, j, k = rotateOrderAxes(rotateOrder)
+    parity = 1.0 if (j - i) % 3 == 1 else -1.0
+    sinB = np.clip(-parity * rows[:, i, k], -1.0, 1.0)
+    angles = np.zeros((len(rows), 3))
+    angles[:, j] = np.arcsin(sinB)
+    locked = np.abs(sinB) >= 1.0 - kGimbalTolerance
+    angles[:, i] = np.where(locked, np.arctan2(-parity * rows[:, k, j], rows[:, j, j]),
+                            np.arctan2(parity * rows[:, j, k], rows[:, k, k]))
+    angles[:, k] = np.where(locked, 0.0, np.arctan2(parity * rows[:, i, j], rows[:, i, i]))
+    return np.degrees(angles)
+
+
+def composeMatrices(translates, rotates, scales=None, rotateOrder=0):
+    """
+    Get n x 4 x 4 local matrices of n transforms sharing one rotate order
+    """
+    if np is None:
+        scales = scales or [(1.0, 1.0, 1.0)] * len(translates)
+        return [composeMatrix(t, r, s, rotateOrder) for t, r, s in zip(translates, rotates, scales)]
+    translates = np.asarray(translates, dtype='f8').reshape(-1, 3)
+    matrices = np.zeros((len(translates), 4, 4))
+    matrices[:, :3, :3] = eulerToRotations(rotates, rotateOrder)
+    if scales is not None:
+        matrices[:, :3, :3] *= np.asarray(scales, dtype='f8').reshape(-1, 3, 1)
+    matrices[:, 3, :3] = translates
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def decomposeMatrices(matrices, rotateOrder=0):
+    """
+    Get (translates, rotates, scales) of n x 4 x 4 or n x 16 matrices sharing one rotate order
+    """
+    if np is None:
+        results = [decomposeMatrix(m, rotateOrder) for m in matrices]
+        return [r[0] for r in results], [r[1] for r in results], [r[2] for r in results]
+    matrices = np.asarray(matrices, dtype='f8').reshape(-1, 4, 4)
+    rows = matrices[:, :3, :3]
+    scales = np.sqrt((rows ** 2).sum(axis=2))
+    scales[np.linalg.det(rows) < 0, 0] *= -1.0
+    safe = np.where(scales == 0, 1.0, scales)
+    return matrices[:, 3, :3].copy(), rotationsToEuler(rows / safe[:, :, None], rotateOrder), scales
@@ -1,10 +1,511 @@
+import contextlib
+import json
+import math
+import os
+
 import maya.cmds as cmds
+import maya.OpenMaya as om
+
+import controlShapes
+import transformMath
+
+# ---- Batched Scene Edits ----
+# with myUtils.batch():
+#     group = myUtils.createNullGroup('l_handCON')
+#     myUtils.lockAttrs('l_handCON', rotate=True, scale=True)
+# Creates, renames and parents inside the with block are queued on one MDagModifier,
+# setAttrs, locks and connects follow once the new nodes have their names. The whole block is one undo step.
+# Nodes made inside a batch come back as BatchNodes, pass them to the Utilities helpers or format them as names
+# once the batch has been flushed.
+
+# ---- Snapping ----
+# myUtils.snap(zip(bindJoints, ikJoints))
+# Matches each target's world position and orientation to its source's without temporary constraints.
+# Every matrix is read once through the API, the local values are worked out with transformMath
+# and all targets are written in one batch. parentSnap, pointSnap and orientSnap snap one pair.
+
+# ---- Scene Index ----
+# index = utils.sceneIndex()
+# missing = index.missing(['l_shoulder_bind', 'l_elbow_bind'])
+# Maps every node name to its MObjectHandle, built from one pass over the scene the first time it's used
+# and kept current by node added, removed and renamed callbacks, so existence checks and lookups are dict hits.
+# Names with a '|' path go through an MSelectionList, a short name shared by several DAG nodes is ambiguous.
+# Reloading utils stops the previous index's callbacks before a new index is made.
+
+kBatchCmdName = 'tbApplyModifier'
+kBatchPlugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tbApplyModifier.py')
+
+_pendingBatches = []
+
+
+class BatchNode(object):
+    """
+    A node created by a SceneBatch, formats as the requested name until the batch is flushed, then its real name
+    """
+    def __init__(self, mobject, name):
+        self.mobject = mobject
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return 'BatchNode(%r)' % self.name
+
+
+class SceneBatch(object):
+    """
+    Records scene edits and applies them through one MDagModifier as one undoable command
+    Nodes can be names, MObjects or BatchNodes, parent None is the world
+    """
+    def __init__(self):
+        self.modifier = om.MDagModifier()
+        self.nodes = []
+        self.attrOps = []
+        self.numEdits = 0
+
+    def __enter__(self):
+        cmds.undoInfo(openChunk=True)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        try:
+            if excType is None:
+                self.flush()
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def create(self, nodeType, name=None, parent=None):
+        """
+        Queue a new node and get its BatchNode
+        """
+        try:
+            if parent is None:
+                mobject = self.modifier.createNode(nodeType)
+            else:
+                mobject = self.modifier.createNode(nodeType, self.mobject(parent))
+        except RuntimeError:
+            # Not a dag node type
+            mobject = om.MDGModifier.createNode(self.modifier, nodeType)
+        if name:
+            self.modifier.renameNode(mobject, name)
+        node = BatchNode(mobject, name or nodeType)
+        self.nodes.append(node)
+        self.numEdits += 1
+        return node
+
+    def rename(self, node, name):
+        self.modifier.renameNode(self.mobject(node), name)
+        if isinstance(node, BatchNode):
+            node.name = name
+        self.numEdits += 1
+
+    def parent(self, node, parent=None):
+        """
+        Queue a reparent, the node keeps its local transform
+        """
+        if parent is None:
+            self.modifier.reparentNode(self.mobject(node))
+        else:
+            self.modifier.reparentNode(self.mobject(node), self.mobject(parent))
+        self.numEdits += 1
+
+    def setAttr(self, node, attr, value):
+        """
+        Queue a value in UI units, a list or tuple sets a compound's children
+        """
+        self.attrOps.append(('set', node, attr, value))
+        self.numEdits += 1
+
+    def lock(self, node, attrs, lock=True, keyable=False, channelBox=False):
+        self.attrOps.append(('lock', node, attrs, (lock, keyable, channelBox)))
+        self.numEdits += 1
+
+    def connect(self, source, sourceAttr, destination, destinationAttr):
+        self.attrOps.append(('connect', (source, sourceAttr), (destination, destinationAttr), None))
+        self.numEdits += 1
+
+    def mobject(self, node):
+        if isinstance(node, BatchNode):
+            return node.mobject
+        if isinstance(node, om.MObject):
+            return node
+        sel = om.MSelectionList()
+        sel.add(node)
+        mobject = om.MObject()
+        sel.getDependNode(0, mobject)
+        return mobject
+
+    def flush(self):
+        """
+        Apply every queued edit through the tbApplyModifier command so Maya can undo it
+        Without the plugin the edits are applied straight away and can't be undone
+        """
+        if not self.numEdits:
+            return
+        if loadBatchPlugin():
+            _pendingBatches.append(self)
+            cmds.tbApplyModifier()
+        else:
+            self.apply()
+
+    def apply(self):
+        """
+        Run the queued edits and get the modifier that holds them for undo, later edits go to a new modifier
+        """
+        modifier = self.modifier
+        self.modifier = om.MDagModifier()
+        nodes, attrOps = self.nodes, self.attrOps
+        self.nodes = []
+        self.attrOps = []
+        self.numEdits = 0
+
+        modifier.doIt()
+        try:
+            for node in nodes:
+                node.name = nodeName(node.mobject)
+
+            # New nodes only have plugs once they exist, so every plug is looked up before any value is queued
+            plugs = []
+            for kind, node, attr, value in attrOps:
+                if kind == 'set':
+                    plugs.append(self.plug(node, attr))
+                elif kind == 'connect':
+                    plugs.append((self.plug(*node), self.plug(*attr)))
+                else:
+                    plugs.append(None)
+
+            commands = []
+            for (kind, node, attr, value), plug in zip(attrOps, plugs):
+                if kind == 'set':
+                    self.newPlugValue(modifier, plug, value)
+                elif kind == 'connect':
+                    modifier.connect(*plug)
+                else:
+                    flags = '-lock %d -keyable %d -channelBox %d' % value
+                    commands.extend('setAttr %s "%s.%s";' % (flags, self.name(node), a) for a in attr)
+            if commands:
+                modifier.commandToExecute(' '.join(commands))
+            modifier.doIt()
+        except Exception:
+            # The command fails and never reaches the undo queue, so take the created nodes back out here
+            modifier.undoIt()
+            raise
+        return modifier
+
+    def name(self, node):
+        if isinstance(node, BatchNode):
+            return node.name
+        if isinstance(node, om.MObject):
+            return nodeName(node)
+        return node
+
+    def plug(self, node, attr):
+        sel = om.MSelectionList()
+        sel.add('%s.%s' % (self.name(node), attr))
+        plug = om.MPlug()
+        sel.getPlug(0, plug)
+        return plug
+
+    def newPlugValue(self, modifier, plug, value):
+        if isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                self.newPlugValue(modifier, plug.child(index), item)
+            return
+
+        attr = plug.attribute()
+        if isinstance(value, basestring):
+            modifier.newPlugValueString(plug, value)
+        elif isinstance(value, bool):
+            modifier.newPlugValueBool(plug, value)
+        elif attr.hasFn(om.MFn.kUnitAttribute):
+            unitType = om.MFnUnitAttribute(attr).unitType()
+            if unitType == om.MFnUnitAttribute.kAngle:
+                modifier.newPlugValueMAngle(plug, om.MAngle(value, om.MAngle.uiUnit()))
+            elif unitType == om.MFnUnitAttribute.kDistance:
+                modifier.newPlugValueMDistance(plug, om.MDistance(value, om.MDistance.uiUnit()))
+            else:
+                modifier.newPlugValueDouble(plug, value)
+        elif attr.hasFn(om.MFn.kNumericAttribute) and om.MFnNumericAttribute(attr).unitType() in (
+                om.MFnNumericData.kDouble, om.MFnNumericData.kFloat):
+            modifier.newPlugValueDouble(plug, value)
+        else:
+            modifier.newPlugValueInt(plug, int(value))
+
+
+def nodeName(mobject):
+    """
+    Get the shortest unique name of a node
+    """
+    if mobject.hasFn(om.MFn.kDagNode):
+        return om.MFnDagNode(mobject).partialPathName()
+    return om.MFnDependencyNode(mobject).name()
+
+
+class SceneIndex(object):
+    """
+    Node names to MObjectHandles, see sceneIndex() for the shared, self updating one
+    """
+    def __init__(self):
+        self.names = None
+        self.callbackIds = []
+
+    def build(self):
+        """
+        Index every node in the scene with one dependency node iteration
+        """
+        self.names = {}
+        nodeIt = om.MItDependencyNodes()
+        while not nodeIt.isDone():
+            self.add(nodeIt.thisNode())
+            nodeIt.next()
+
+    def clear(self):
+        self.names = None
+
+    def start(self):
+        """
+        Keep the index current through scene callbacks, it's rebuilt lazily after a new or opened scene
+        """
+        if self.callbackIds:
+            return
+        self.callbackIds = [
+            om.MDGMessage.addNodeAddedCallback(self.nodeAdded, 'dependNode'),
+            om.MDGMessage.addNodeRemovedCallback(self.nodeRemoved, 'dependNode'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self.nameChanged)]
+        for message in (om.MSceneMessage.kBeforeNew, om.MSceneMessage.kBeforeOpen):
+            self.callbackIds.append(om.MSceneMessage.addCallback(message, self.sceneChanged))
+
+    def stop(self):
+        for callbackId in self.callbackIds:
+            om.MMessage.removeCallback(callbackId)
+        self.callbackIds = []
+        self.clear()
+
+    def add(self, mobject, name=None):
+        if name is None:
+            name = om.MFnDependencyNode(mobject).name()
+        self.names.setdefault(name, []).append(om.MObjectHandle(mobject))
+
+    def remove(self, mobject, name=None):
+        if name is None:
+            name = om.MFnDependencyNode(mobject).name()
+        handles = self.names.get(name)
+        if not handles:
+            return
+        handle = om.MObjectHandle(mobject)
+        handles[:] = [h for h in handles if h.isValid() and h.hashCode() != handle.hashCode()]
+        if not handles:
+            del self.names[name]
+
+    def nodeAdded(self, mobject, clientData):
+        if self.names is not None:
+            self.add(mobject)
+
+    def nodeRemoved(self, mobject, clientData):
+        if self.names is not None:
+            self.remove(mobject)
+
+    def nameChanged(self, mobject, previousName, clientData):
+        if self.names is not None:
+            self.remove(mobject, previousName)
+            self.add(mobject)
+
+    def sceneChanged(self, clientData):
+        self.clear()
+
+    def handles(self, name):
+        """
+        Get the live handles of the nodes called name
+        """
+        if self.names is None:
+            self.build()
+        handles = self.names.get(name)
+        if handles and not all(h.isValid() for h in handles):
+            handles[:] = [h for h in handles if h.isValid()]
+        return handles or []
+
+    def exists(self, name):
+        name = str(name)
+        if '|' in name:
+            return bool(cmds.objExists(name))
+        return bool(self.handles(name))
+
+    def missing(self, names):
+        """
+        Get the names that don't exist, in order
+        """
+        return [name for name in names if not self.exists(name)]
+
+    def lookup(self, name):
+        """
+        Get the MObject of a node name, None when it doesn't exist
+        """
+        name = str(name)
+        if '|' in name:
+            sel = om.MSelectionList()
+            try:
+                sel.add(name)
+            except RuntimeError:
+                return None
+            mobject = om.MObject()
+            sel.getDependNode(0, mobject)
+            return mobject
+        handles = self.handles(name)
+        if len(handles) > 1:
+            raise Exception('More than one object matches name: %s' % name)
+        return handles[0].object() if handles else None
+
+    def lookupMany(self, names):
+        """
+        Get a dict of name to MObject, or None for names that don't exist
+        """
+        return dict((name, self.lookup(name)) for name in names)
+
+    def dagPath(self, name):
+        mobject = self.lookup(name)
+        if mobject is None or not mobject.hasFn(om.MFn.kDagNode):
+            raise Exception('No dag node called: %s' % name)
+        path = om.MDagPath()
+        om.MDagPath.getAPathTo(mobject, path)
+        return path
+
+
+# reload(utils) runs this again in the same namespace, stop the previous index first or its callbacks
+# would keep firing alongside the new one's
+if globals().get('_sceneIndex') is not None:
+    _sceneIndex.stop()
+_sceneIndex = None
+
+
+def sceneIndex():
+    """
+    Get the shared SceneIndex, started the first time it's asked for
+    """
+    global _sceneIndex
+    if _sceneIndex is None:
+        _sceneIndex = SceneIndex()
+        _sceneIndex.start()
+    return _sceneIndex
+
+
+def dagPath(node):
+    return sceneIndex().dagPath(node)
+
+
+def matrixList(matrix):
+    """
+    Get an MMatrix as 16 floats, see transformMath
+    """
+    return [matrix(row, column) for row in range(4) for column in range(4)]
+
+
+def worldMatrices(nodes):
+    """
+    Get the world matrix of each node in internal units
+    """
+    return [matrixList(dagPath(node).inclusiveMatrix()) for node in nodes]
+
+
+def readTransforms(nodes):
+    """
+    Read what snapping needs of each transform in one pass through the API
+    Distances are in internal units, angles in degrees, jointOrient is None on anything but joints
+    """
+    transforms = []
+    for node in nodes:
+        path = dagPath(node)
+        fn = om.MFnDependencyNode(path.node())
+        fullPath = path.fullPathName()
+
+        def values(attr, convert=float):
+            plug = fn.findPlug(attr)
+            return [convert(plug.child(index).asDouble()) for index in range(3)]
+
+        transforms.append({
+            'path': fullPath,
+            'parent': fullPath.rpartition('|')[0],
+            'world': matrixList(path.inclusiveMatrix()),
+            'parentWorld': matrixList(path.exclusiveMatrix()),
+            'translate': values('translate'),
+            'rotate': values('rotate', math.degrees),
+            'scale': values('scale'),
+            'rotateAxis': values('rotateAxis', math.degrees),
+            'jointOrient': values('jointOrient', math.degrees) if fn.hasAttribute('jointOrient') else None,
+            'rotateOrder': fn.findPlug('rotateOrder').asInt()})
+    return transforms
+
+
+def snapValues(worlds, transforms, translate=True, rotate=True):
+    """
+    Get the (translate, rotate) local values that put each transform at the matching world matrix
+    Transforms are placed in order, one under an earlier transform is placed against that one's new matrix
+    """
+    placed = {}
+    results = []
+    for world, transform in zip(worlds, transforms):
+        parentWorld = transform['parentWorld']
+        ancestor = transform['parent']
+        while ancestor:
+            if ancestor in placed:
+                oldWorld, newWorld = placed[ancestor]
+                parentWorld = transformMath.multiply(transformMath.multiply(
+                    parentWorld, transformMath.inverse(oldWorld)), newWorld)
+                break
+            ancestor = ancestor.rpartition('|')[0]
+
+        local = transformMath.localMatrix(world, parentWorld)
+        newTranslate, newRotate, scale = transformMath.decomposeMatrix(
+            local, transform['rotateOrder'], transform['rotateAxis'], transform['jointOrient'])
+        if not translate:
+            newTranslate = transform['translate']
+        if not rotate:
+            newRotate = transform['rotate']
+
+        newLocal = transformMath.composeMatrix(newTranslate, newRotate, transform['scale'], transform['rotateOrder'],
+                                               transform['rotateAxis'], transform['jointOrient'])
+        placed[transform['path']] = (transform['world'], transformMath.multiply(newLocal, parentWorld))
+        results.append((newTranslate, newRotate))
+    return results
+
+
+def loadBatchPlugin():
+    """
+    Load the tbApplyModifier command that gives SceneBatch undo, False when it can't be loaded
+    """
+    if cmds.pluginInfo(kBatchCmdName, q=True, loaded=True):
+        return True
+    try:
+        cmds.loadPlugin(kBatchPlugin, quiet=True)
+    except RuntimeError:
+        return False
+    return True
+
+
+def popPendingBatch():
+    return _pendingBatches.pop(0)
 
 
 class Utilities(object):
     """
     General Maya command utilities
+    Inside batch() the scene editing helpers queue onto the active SceneBatch instead of calling cmds
     """
+    _batch = None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Queue the edits of every helper called in the with block onto one SceneBatch, see SceneBatch
+        """
+        batch = SceneBatch()
+        previous, self._batch = self._batch, batch
+        try:
+            with batch:
+                yield batch
+        finally:
+            self._batch = previous
+
     def sel(self):
         return cmds.ls(sl=True, fl=True)
 
@@ -15,14 +516,119 @@ class Utilities(object):
     def clearSel(self):
         cmds.select(clear=True)
 
+    def createNode(self, nodeType, name=None, parent=None):
+        if self._batch is not None:
+            return self._batch.create(nodeType, name, parent)
+        kwargs = {}
+        if name:
+            kwargs['name'] = name
+        if parent is not None:
+            kwargs['parent'] = str(parent)
+        return cmds.createNode(nodeType, **kwargs)
+
+    def rename(self, node, name):
+        if self._batch is not None:
+            self._batch.rename(node, name)
+            return node
+        return cmds.rename(str(node), name)
+
+    def parent(self, node, parent=None):
+        """
+        Reparent keeping the world transform, inside a batch the local transform is kept instead
+        """
+        if self._batch is not None:
+            self._batch.parent(node, parent)
+        elif parent is None:
+            cmds.parent(str(node), world=True)
+        else:
+            cmds.parent(str(node), str(parent))
+
+    def setAttr(self, node, attr, value):
+        if self._batch is not None:
+            self._batch.setAttr(node, attr, value)
+        elif isinstance(value, (list, tuple)):
+            cmds.setAttr('%s.%s' % (node, attr), *value)
+        else:
+            cmds.setAttr('%s.%s' % (node, attr), value)
+
+    def connectAttr(self, source, sourceAttr, destination, destinationAttr):
+        if self._batch is not None:
+            self._batch.connect(source, sourceAttr, destination, destinationAttr)
+        else:
+            cmds.connectAttr('%s.%s' % (source, sourceAttr), '%s.%s' % (destination, destinationAttr))
+
+    def deleteNodes(self, nodes):
+        """
+        Delete the nodes that still exist, children already gone with their parents are skipped
+        """
+        index = sceneIndex()
+        for node in nodes:
+            if index.exists(node):
+                cmds.delete(node)
+
+    @contextlib.contextmanager
+    def trackNodes(self):
+        """
+        Collect the names of the nodes created inside the block, the list is filled when the block exits
+        Nodes that were created and deleted again inside the block are left out
+        """
+        created = []
+        handles = []
+
+        def nodeAdded(mobject, clientData):
+            handles.append(om.MObjectHandle(mobject))
+
+        callbackId = om.MDGMessage.addNodeAddedCallback(nodeAdded)
+        try:
+            yield created
+        finally:
+            om.MMessage.removeCallback(callbackId)
+            created.extend(nodeName(handle.object()) for handle in handles if handle.isValid())
+
+    def loadBuildState(self, node):
+        """
+        Get the rigGraph state stored on a network node, None when there isn't one
+        """
+        if not sceneIndex().exists(node):
+            return None
+        return json.loads(cmds.getAttr('%s.buildState' % node) or 'null')
+
+    def saveBuildState(self, node, state):
+        if not sceneIndex().exists(node):
+            cmds.createNode('network', name=node)
+            cmds.addAttr(node, longName='buildState', dataType='string')
+        cmds.setAttr('%s.buildState' % node, json.dumps(state), type='string')
+
     def parentSnap(self, source, target):
-        cmds.delete(cmds.parentConstraint(source, target))
+        self.snap([(source, target)])
 
     def pointSnap(self, source, target):
-        cmds.delete(cmds.pointConstraint(source, target))
+        self.snap([(source, target)], rotate=False)
 
     def orientSnap(self, source, target):
-        cmds.delete(cmds.orientConstraint(source, target))
+        self.snap([(source, target)], translate=False)
+
+    def snap(self, pairs, translate=True, rotate=True):
+        """
+        Match each (source, target) target's world position and orientation to its source's, scale is kept
+        Sources and targets are read before anything is written, so targets have to exist outside a pending batch
+        Pivots are ignored, snapping matches the nodes' origins where the constraints matched rotate pivots
+        """
+        pairs = [(str(source), str(target)) for source, target in pairs]
+        if not pairs:
+            return
+        if self._batch is None:
+            with self.batch():
+                return self.snap(pairs, translate, rotate)
+
+        targets = [target for source, target in pairs]
+        values = snapValues(worldMatrices([source for source, target in pairs]), readTransforms(targets),
+                            translate, rotate)
+        for target, (newTranslate, newRotate) in zip(targets, values):
+            if translate:
+                self.setAttr(target, 'translate', [om.MDistance.internalToUI(value) for value in newTranslate])
+            if rotate:
+                self.setAttr(target, 'rotate', [om.MAngle.internalToUI(math.radians(value)) for value in newRotate])
 
     def parentConstraint(self, source, target):
         try:
@@ -48,10 +654,24 @@ class Utilities(object):
     def createNullGroup(self, source, name=None):
         xyz = ['X', 'Y', 'Z']
         if name is None:
-            if 'CON' in source:
-                name = ('%sNUL' % source.replace('CON', ''))
+            if 'CON' in str(source):
+                name = ('%sNUL' % str(source).replace('CON', ''))
             else:
                 name = ('%sNUL' % source)
+
+        if self._batch is not None:
+            # The group takes the source's local transform under the source's parent and the source is zeroed,
+            # the same world result as snapping a world space group then parenting, without the round trips
+            sourceParent = cmds.listRelatives(str(source), p=True, f=True)
+            group = self._batch.create('transform', name, sourceParent[0] if sourceParent else None)
+            for attr in ('translate', 'rotate'):
+                self._batch.setAttr(group, attr, cmds.getAttr('%s.%s' % (source, attr))[0])
+            self._batch.setAttr(group, 'rotateOrder', cmds.getAttr('%s.rotateOrder' % source))
+            self._batch.parent(source, group)
+            self._batch.setAttr(source, 'translate', (0.0, 0.0, 0.0))
+            self._batch.setAttr(source, 'rotate', (0.0, 0.0, 0.0))
+            return group
+
         group = cmds.group(em=True, name=name)
         trans = cmds.xform(source, q=True, ws=True, t=True)
         rots = cmds.xform(source, q=True, ws=True, ro=True)
@@ -68,6 +688,15 @@ class Utilities(object):
         return group
 
     def lockAttrs(self, source, translate=False, rotate=False, scale=False, visibility=False):
+        if self._batch is not None:
+            attrs = ['%s%s' % (attr, axis) for attr, flag in (('translate', translate), ('rotate', rotate),
+                                                              ('scale', scale)) if flag for axis in 'XYZ']
+            if visibility:
+                attrs.append('visibility')
+            if attrs:
+                self._batch.lock(source, attrs)
+            return
+
         for axis in ['X', 'Y', 'Z']:
             if translate:
                 cmds.setAttr('%s.%s%s' % (source, 'translate', axis), keyable=False, lock=True, channelBox=False)
@@ -79,43 +708,46 @@ class Utilities(object):
             cmds.setAttr('%s.%s' % (source, 'visibility'), keyable=False, lock=True, channelBox=False)
 
     def jointCheck(self, jointCheckList=[]):
-        for joint in jointCheckList:
-            if cmds.objExists(joint):
-                continue
-            else:
-                cmds.error('Could not find joint: %s, please check joint names' % joint)
-                break
+        missing = sceneIndex().missing(jointCheckList)
+        if missing:
+            cmds.error('Could not find joint: %s, please check joint names' % missing[0])
         print '\\nFound all bind joints...'
 
     def createJoints(self, jointPositions=[], prefix='', suffix='', radius=1):
         print 'Building skeleton joints...'
         self.clearSel()
         myJoints = []
-        for joint in jointPositions:
-            jointOrients = cmds.getAttr('%s.jointOrient' % joint)
+        # One indexed pass reads every source's orient instead of a getAttr per joint
+        for joint, source in zip(jointPositions, readTransforms(jointPositions)):
+            jointOrients = [om.MAngle.internalToUI(math.radians(value)) for value in source['jointOrient']]
             myJointName = joint.replace('bind', suffix).replace('l_', prefix) or joint.replace('r_', prefix)
-            myJoint = cmds.joint(n=myJointName, radius=radius, orientation=jointOrients[0])
-            self.parentSnap(joint, myJoint)
+            myJoint = cmds.joint(n=myJointName, radius=radius, orientation=jointOrients)
             myJoints.append(myJoint)
+        self.snap(zip(jointPositions, myJoints))
         return myJoints
 
+    def createControl(self, shape, name='', **options):
+        """
+        Create a control curve with one cmds.curve call, options go to controlShapes.curveArgs
+        """
+        return cmds.curve(name=name, **controlShapes.curveArgs(shape, **options))
+
+    def createControls(self, controls):
+        """
+        Create many (shape, name, options) controls as one undo step
+        """
+        cmds.undoInfo(openChunk=True)
+        try:
+            return [self.createControl(shape, name, **options) for shape, name, options in controls]
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
     def createBoxControl(self, name='', scale=1):
-        curveShape = [(scale, -scale, scale), (scale, scale, scale), (scale, scale, -scale), (scale, -scale, -scale),
-                      (-scale, -scale, -scale), (-scale, scale, -scale), (-scale, scale, scale), (-scale, -scale, scale),
-                      (scale, -scale, scale), (scale, -scale, -scale), (-scale, -scale, -scale), (-scale, -scale, scale),
-                      (-scale, scale, scale), (scale, scale, scale), (scale, scale, -scale), (-scale, scale, -scale)]
-        boxControl = cmds.curve(name=name, d=1, p=curveShape)
-        return boxControl
+        return self.createControl('box', name, scale=scale)
 
     def createCircleControl(self, name='', radius=1, sections=8):
-        circleControl = cmds.circle(name=name, radius=radius, sections=sections)
-        return circleControl
+        # A list like cmds.circle returns, without the makeNurbsCircle history
+        return [self.createControl('circle', name, sections=sections, scale=radius)]
 
     def createStarControl(self, name='', radius=0.5, sections=16, parentSpace=None):
-        self.clearSel()
-        starControl = self.createCircleControl(name, radius, sections)
-        cvs = [cvs for cvs in range(1, sections) if cvs % 2 != 0]
-        for cv in cvs:
-            cmds.select('%s.cv[%d]' % (starControl[0], cv), add=1)
-            cmds.scale(.1, .1, .1, '%s.cv[%d]' % (starControl[0], cv), r=1)
-        return starControl
+        return [self.createControl('star', name, sections=sections, scale=radius)]
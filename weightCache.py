@@ -0,0 +1,211 @@
+# ---- Parsed weight cache ----
+# Keeps parsed SkinWeights tables for the session so importing the same file again skips parsing.
+# Entries are keyed by absolute path, modification time and size, any change to the file is a miss.
+# The least recently used tables are dropped once the cache holds more than maxBytes of arrays.
+# Nothing in here touches Maya.
+
+# ---- Sidecars ----
+# With sidecars on, XML and chunked files get their decoded binary form written next to them as
+# <file>.tbwc, the binary layout followed by the source size uint64, source mtime float64 and magic 'TBWC'.
+# A new session reads the sidecar instead of parsing the source, as long as the size and mtime still match.
+
+import collections
+import os
+import struct
+import threading
+
+import weightFile
+import workerPool
+
+kCacheBytes = 512 * 1024 * 1024
+kSidecarExtension = '.tbwc'
+kSidecarMagic = b'TBWC'
+
+_sidecarStruct = struct.Struct('<Qd4s')
+
+
+def tableBytes(weights):
+    """
+    Get the size of a table's arrays in bytes
+    """
+    total = 0
+    for data in (weights.vertIds, weights.offsets, weights.infIds, weights.weights, weights.positions):
+        if data is None:
+            continue
+        total += data.nbytes if hasattr(data, 'nbytes') else len(data) * data.itemsize
+    return total
+
+
+def fileKey(fileName):
+    """
+    Get (absolute path, mtime, size) of a file
+    """
+    path = os.path.abspath(fileName)
+    stat = os.stat(path)
+    return path, stat.st_mtime, stat.st_size
+
+
+class WeightCache(object):
+    """
+    LRU cache of parsed weight tables
+    Tables are shared between every caller so treat them as read only
+    """
+    def __init__(self, maxBytes=kCacheBytes, sidecars=False):
+        self.maxBytes = maxBytes
+        self.sidecars = sidecars
+        self.numBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tables = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tables)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.numBytes = 0
+
+    def read(self, fileName, fileFormat=None, vertIds=None, sidecars=None):
+        """
+        Read a weight file through the cache, see weightFile.readWeights()
+        Partial chunked reads that miss are read straight from the file and not cached
+        sidecars overrides the cache's sidecar setting for this read
+        """
+        if fileFormat is None:
+            fileFormat = weightFile.formatFromFileName(fileName)
+        key = fileKey(fileName)
+
+        with self._lock:
+            weights = self._tables.pop(key, None)
+            if weights is not None:
+                self._tables[key] = weights
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if weights is None:
+            if vertIds is not None and fileFormat == weightFile.kFormatChunked:
+                return weightFile.readWeights(fileName, fileFormat, vertIds)
+            weights = self.load(fileName, fileFormat, key, sidecars)
+            self.add(key, weights)
+
+        if vertIds is not None:
+            weights = weights.subset(vertIds)
+        return weights
+
+    def readMany(self, jobs, workers=None, sidecars=None, processes=None):
+        """
+        Read many weight files through the cache from a list of (fileName, fileFormat, vertIds)
+        XML files that miss are parsed on a process pool first, see weightFile.poolProcesses(),
+        everything else is read through read() on a thread pool
+        """
+        jobs = [(fileName, fileFormat or weightFile.formatFromFileName(fileName), vertIds)
+                for fileName, fileFormat, vertIds in jobs]
+        if processes is None:
+            processes = weightFile.poolProcesses([job[1] for job in jobs], workers)
+        if sidecars is None:
+            sidecars = self.sidecars
+
+        keys = [fileKey(job[0]) for job in jobs]
+        loaded = {}
+        if processes:
+            with self._lock:
+                missing = dict((key, (job[0], job[1], key, sidecars)) for job, key in zip(jobs, keys)
+                               if job[1] == weightFile.kFormatXml and key not in self._tables)
+                self.misses += len(missing)
+            for key, weights in zip(missing.keys(), workerPool.mapPool(_loadJob, missing.values(), workers, True)):
+                loaded[key] = weights
+                self.add(key, weights)
+
+        def readJob(item):
+            job, key = item
+            if key not in loaded:
+                return self.read(job[0], job[1], job[2], sidecars)
+            if job[2] is not None:
+                return loaded[key].subset(job[2])
+            return loaded[key]
+
+        return workerPool.mapPool(readJob, list(zip(jobs, keys)), workers)
+
+    def add(self, key, weights):
+        numBytes = tableBytes(weights)
+        if numBytes > self.maxBytes:
+            return
+        with self._lock:
+            old = self._tables.pop(key, None)
+            if old is not None:
+                self.numBytes -= tableBytes(old)
+            self._tables[key] = weights
+            self.numBytes += numBytes
+            while self.numBytes > self.maxBytes:
+                oldKey, old = self._tables.popitem(last=False)
+                self.numBytes -= tableBytes(old)
+                self.evictions += 1
+
+    def load(self, fileName, fileFormat, key, sidecars=None):
+        if sidecars is None:
+            sidecars = self.sidecars
+        return loadFile(fileName, fileFormat, key, sidecars)
+
+    def stats(self):
+        return {'tables': len(self._tables),
+                'bytes': self.numBytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+def loadFile(fileName, fileFormat, key, sidecars=False):
+    """
+    Parse a file, going through its sidecar when sidecars are on
+    """
+    if not sidecars or fileFormat == weightFile.kFormatBinary:
+        return weightFile.readWeights(fileName, fileFormat)
+
+    sidecarName = fileName + kSidecarExtension
+    weights = readSidecar(sidecarName, key)
+    if weights is None:
+        weights = weightFile.readWeights(fileName, fileFormat)
+        writeSidecar(sidecarName, weights, key)
+    return weights
+
+
+def _loadJob(job):
+    return loadFile(*job)
+
+
+def writeSidecar(sidecarName, weights, key):
+    """
+    Write a table's binary form with the source's size and mtime, through a temp file so readers never see half
+    """
+    try:
+        with weightFile.atomicWrite(sidecarName) as f:
+            weightFile.writeBinaryStream(f, weights)
+            f.write(_sidecarStruct.pack(key[2], key[1], kSidecarMagic))
+    except (IOError, OSError):
+        # A read only folder just means no sidecar
+        pass
+
+
+def readSidecar(sidecarName, key):
+    """
+    Read a sidecar, None when it is missing or was written for another version of the source
+    The arrays view bytes read into memory rather than a memory map, cached tables mustn't keep the file mapped
+    or re-exporting it would fail to replace it on Windows
+    """
+    if not os.path.exists(sidecarName) or os.path.getsize(sidecarName) < _sidecarStruct.size:
+        return None
+    with open(sidecarName, 'rb') as f:
+        f.seek(-_sidecarStruct.size, os.SEEK_END)
+        size, mtime, magic = _sidecarStruct.unpack(f.read(_sidecarStruct.size))
+        if magic != kSidecarMagic or size != key[2] or mtime != key[1]:
+            return None
+        f.seek(0)
+        buf = f.read()
+    return weightFile.readBinaryBuffer(buf, sidecarName)
+
+
+sessionCache = WeightCache()
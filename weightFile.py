@@ -0,0 +1,921 @@
+# ---- Skin weight file formats ----
+# Pure python readers and writers for the files written by tbSaveSkinWeights.
+# Nothing in here touches Maya so the formats can be tested and converted headless.
+
+# ---- Binary Layout (.tbw) ----
+# All values are little endian
+# header:   magic 'TBSW', version uint16, flags uint16,
+#           numVerts uint32, numWeights uint32, numInfs uint32
+# strings:  mesh name, then one entry per influence name
+#           each string is a uint32 byte length followed by utf-8 bytes
+# arrays:   vertIds uint32[numVerts]
+#           offsets uint32[numVerts + 1]
+#           infIds  uint16[numWeights]
+#           weights float64[numWeights]
+#           positions float64[numVerts * 3], only when flags has kBinaryPositions set
+# Every array starts on an 8 byte boundary so it can be viewed straight out of a memory map
+
+# ---- XML Layout (.xml) ----
+# <root>
+#   <influences>
+#     <influence idx="0" name="joint1"/>
+#   </influences>
+#   <mesh name="pCube1">
+#     <vertId index="0" path="pCube1.vtx[0]" pos="0.0 1.0 0.0">
+#       <inf idx="0" weight="0.5"/>
+#     </vertId>
+#   </mesh>
+#   <!--eof-->
+# </root>
+# pos is the vertex world position, older files may not have it or the influences element
+
+# ---- Chunked Layout (.tbc) ----
+# All values are little endian
+# header:   magic 'TBSC', version uint16, codec uint16,
+#           numVerts uint32, numChunks uint32, numInfs uint32
+# strings:  mesh name then influence names, as in the binary layout
+# chunks:   each chunk is up to kChunkSize rows written as a compressed binary layout without names
+# index:    one entry per chunk: firstVertId uint32, lastVertId uint32, firstRow uint32, numRows uint32,
+#           offset uint64, size uint64, the vertex ids are the lowest and highest in the chunk
+# footer:   index offset uint64, magic 'TBSI'
+# A vertex range is read by decompressing only the chunks whose id range overlaps it
+
+# ---- Atomic Writes ----
+# Every writer goes through atomicWrite(), the file is built as <name>.<pid>.<thread>.tmp next to the target
+# and renamed over it once complete, so an interrupted write leaves the old file, never a truncated one.
+# progress callbacks are called as progress(done, total) with rows written, or files written for batches.
+
+# ---- Streaming ----
+# iterBlocks() yields a file as tables of up to kChunkSize rows and writeBlocks() writes a file from them,
+# so files can be converted, checked or diffed holding one block at a time whatever their size.
+# XML is parsed with iterparse, chunked files a chunk at a time and binary files through a memory map.
+
+import array
+import bisect
+import contextlib
+import io
+import itertools
+import mmap
+import time
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import zipfile
+import zlib
+import xml.etree.cElementTree as cElement
+from xml.sax.saxutils import quoteattr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+from skinWeights import SkinWeights, SkinWeightsBuilder, joinWeights
+from workerPool import inMaya, mapPool
+
+kBinaryMagic = b'TBSW'
+kBinaryVersion = 1
+kBinaryPositions = 1
+kBinaryExtensions = ('.tbw',)
+kXmlExtensions = ('.xml',)
+kChunkedMagic = b'TBSC'
+kChunkedIndexMagic = b'TBSI'
+kChunkedVersion = 1
+kChunkSize = 4096
+kCodecNone = 0
+kCodecZlib = 1
+kCodecLzma = 2
+kChunkedExtensions = ('.tbc',)
+kArchiveExtensions = ('.zip',)
+kXmlBlockSize = 4096
+
+kFormatXml = 'xml'
+kFormatBinary = 'binary'
+kFormatChunked = 'chunked'
+
+_headerStruct = struct.Struct('<4sHHIII')
+_lengthStruct = struct.Struct('<I')
+_chunkStruct = struct.Struct('<IIIIQQ')
+_footerStruct = struct.Struct('<Q4s')
+
+# (array typecode, numpy dtype, item size)
+_vertIdType = ('I', '<u4', 4)
+_offsetType = ('I', '<u4', 4)
+_infIdType = ('H', '<u2', 2)
+_weightType = ('d', '<f8', 8)
+
+
+def formatFromFileName(fileName, default=kFormatXml):
+    """
+    Pick a weight file format from a file extension
+    """
+    ext = os.path.splitext(fileName)[1].lower()
+    if ext in kBinaryExtensions:
+        return kFormatBinary
+    if ext in kChunkedExtensions:
+        return kFormatChunked
+    if ext in kXmlExtensions:
+        return kFormatXml
+    return default
+
+
+@contextlib.contextmanager
+def atomicWrite(fileName, mode='wb'):
+    """
+    Open a temp file next to fileName for writing, it replaces fileName only once the with block finishes
+    On an exception the temp file is removed and fileName is left as it was
+    """
+    tempName = '%s.%d.%d.tmp' % (fileName, os.getpid(), threading.current_thread().ident or 0)
+    f = open(tempName, mode)
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        _replace(tempName, fileName)
+    except BaseException:
+        f.close()
+        if os.path.exists(tempName):
+            os.remove(tempName)
+        raise
+
+
+def _replace(source, destination):
+    """
+    Rename source over destination, python 2 on windows can't rename onto an existing file
+    """
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    if os.name == 'nt' and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+def writeXml(fileName, weights, pretty=True, progress=None):
+    """
+    Write a SkinWeights table as XML
+    Vertex elements are written kXmlBlockSize at a time so the document never exists in memory
+    """
+    with atomicWrite(fileName) as f:
+        for rows, data in _encodeXmlBlocks(weights, pretty):
+            f.write(data)
+            if progress is not None:
+                progress(rows, len(weights))
+
+
+def _encodeXmlBlocks(weights, pretty, chunks=None):
+    """
+    Yield (rows written so far, utf-8 block) over the XML document, the first chunk is the header
+    """
+    if chunks is None:
+        chunks = iterXml(weights, pretty)
+    rows = 0
+    while True:
+        data = ''.join(itertools.islice(chunks, kXmlBlockSize)).encode('utf-8')
+        if not data:
+            return
+        rows = min(rows + kXmlBlockSize, len(weights))
+        yield rows, data
+
+
+def readXml(fileName):
+    """
+    Read an XML weight file into packed arrays
+    """
+    blocks = list(iterXmlBlocks(fileName))
+    return joinWeights(blocks, blocks[0].infNames, blocks[0].meshName)
+
+
+def iterXmlBlocks(fileName, blockSize=kChunkSize):
+    """
+    Yield an XML weight file as tables of up to blockSize rows, at least one even when it has no vertices
+    The file is streamed with iterparse and each vertex element is dropped once its weights are stored
+    """
+    builder = None
+    mesh = None
+    infNames = {}
+    # Influence idx in the file to influence id in the table, idx values don't have to be contiguous
+    infIndex = {}
+    numBlocks = 0
+
+    for event, elem in cElement.iterparse(fileName, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'mesh':
+                mesh = elem
+                # Influences come before the mesh element
+                infIndex = dict((idx, infId) for infId, idx in enumerate(sorted(infNames)))
+                infNames = [infNames[idx] for idx in sorted(infNames)]
+                builder = SkinWeightsBuilder(infNames, elem.get('name'))
+            continue
+
+        if elem.tag == 'influence':
+            infNames[int(elem.get('idx'))] = elem.get('name')
+            continue
+
+        if elem.tag != 'vertId' or builder is None:
+            continue
+
+        pos = elem.get('pos')
+        if pos is not None:
+            pos = [float(p) for p in pos.split()]
+        vertId = int(elem.get('index'))
+        infIds = [int(inf.get('idx')) for inf in elem]
+        if infIndex:
+            try:
+                infIds = [infIndex[idx] for idx in infIds]
+            except KeyError as e:
+                raise Exception('%s: vertex %d uses influence idx %s which is not listed' % (fileName, vertId, e))
+        builder.addVertex(vertId, infIds, [float(inf.get('weight')) for inf in elem], pos)
+
+        elem.clear()
+        mesh.remove(elem)
+
+        if len(builder.vertIds) >= blockSize:
+            yield builder.build()
+            numBlocks += 1
+            builder = SkinWeightsBuilder(infNames, builder.meshName)
+
+    if mesh is None:
+        raise Exception('%s has no mesh element' % fileName)
+    if len(builder.vertIds) or not numBlocks:
+        yield builder.build()
+
+
+def iterXml(weights, pretty=True):
+    """
+    Yield the XML document one vertex element at a time
+    """
+    for chunk in _xmlHeader(weights, pretty):
+        yield chunk
+    for chunk in _xmlVertices(weights, pretty):
+        yield chunk
+    yield _xmlFooter(pretty)
+
+
+def _xmlIndent(pretty):
+    if pretty:
+        return '\n', '  '
+    return '', ''
+
+
+def _xmlHeader(weights, pretty):
+    meshName = weights.meshName
+    newLine, indent = _xmlIndent(pretty)
+
+    yield '<?xml version="1.0" encoding="utf-8"?>%s<root>%s' % (newLine, newLine)
+
+    if weights.infNames:
+        lines = [indent + '<influences>' + newLine]
+        for infId, name in enumerate(weights.infNames):
+            lines.append('%s<influence idx="%d" name=%s/>%s' % (indent * 2, infId, quoteattr(name), newLine))
+        lines.append(indent + '</influences>' + newLine)
+        yield ''.join(lines)
+
+    yield '%s<mesh name=%s>%s' % (indent, quoteattr(meshName), newLine)
+
+
+def _xmlVertices(weights, pretty):
+    meshName = weights.meshName
+    newLine, indent = _xmlIndent(pretty)
+
+    if weights.positions is not None:
+        vertOpen = indent * 2 + '<vertId index="%d" path=%s pos="%r %r %r">' + newLine
+        positions = weights.positions.tolist()
+    else:
+        vertOpen = indent * 2 + '<vertId index="%d" path=%s>' + newLine
+        positions = None
+    vertClose = indent * 2 + '</vertId>' + newLine
+    infElem = indent * 3 + '<inf idx="%d" weight="%r"/>' + newLine
+
+    for row, (vertId, infIds, values) in enumerate(weights):
+        path = quoteattr('%s.vtx[%d]' % (meshName, vertId))
+        if positions is not None:
+            lines = [vertOpen % ((vertId, path) + tuple(positions[3 * row:3 * row + 3]))]
+        else:
+            lines = [vertOpen % (vertId, path)]
+        for infId, value in zip(infIds, values):
+            lines.append(infElem % (infId, value))
+        lines.append(vertClose)
+        yield ''.join(lines)
+
+
+def _xmlFooter(pretty):
+    newLine, indent = _xmlIndent(pretty)
+    return '%s</mesh>%s%s<!--eof-->%s</root>%s' % (indent, newLine, indent, newLine, newLine)
+
+
+def writeBinary(fileName, weights):
+    """
+    Write a SkinWeights table as packed arrays
+    """
+    with atomicWrite(fileName) as f:
+        writeBinaryStream(f, weights)
+
+
+def writeBinaryStream(f, weights):
+    """
+    Write a SkinWeights table as packed arrays to an open binary file
+    """
+    flags = 0
+    arrays = [(weights.vertIds, _vertIdType), (weights.offsets, _offsetType),
+              (weights.infIds, _infIdType), (weights.weights, _weightType)]
+    if weights.positions is not None:
+        flags |= kBinaryPositions
+        arrays.append((weights.positions, _weightType))
+
+    f.write(_headerStruct.pack(kBinaryMagic, kBinaryVersion, flags,
+                               len(weights), weights.numWeights, len(weights.infNames)))
+    for name in [weights.meshName] + weights.infNames:
+        data = name.encode('utf-8')
+        f.write(_lengthStruct.pack(len(data)))
+        f.write(data)
+
+    for data, arrayType in arrays:
+        _pad(f)
+        f.write(_arrayBytes(data, arrayType))
+
+
+def readBinary(fileName, mapped=False):
+    """
+    Read a binary weight file, with numpy the arrays are read only views onto the file's bytes
+    mapped views a memory map instead of reading the file in, for streaming. The map stays open while any
+    array is alive and Windows can't replace a mapped file, so never keep mapped tables in a cache
+    """
+    with open(fileName, 'rb') as f:
+        if mapped:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+    return readBinaryBuffer(buf, fileName)
+
+
+def readBinaryBuffer(buf, fileName='buffer'):
+    """
+    Read binary weights from anything supporting the buffer protocol, arrays are views onto it with numpy
+    """
+    magic, version, flags, numVerts, numWeights, numInfs = _headerStruct.unpack_from(buf, 0)
+    if magic != kBinaryMagic:
+        raise Exception('%s is not a binary weights file' % fileName)
+    if version > kBinaryVersion:
+        raise Exception('Unsupported binary weights version: %d' % version)
+
+    pos = _headerStruct.size
+    names = []
+    for i in range(numInfs + 1):
+        length = _lengthStruct.unpack_from(buf, pos)[0]
+        pos += _lengthStruct.size
+        names.append(buf[pos:pos + length].decode('utf-8'))
+        pos += length
+
+    layout = [(_vertIdType, numVerts), (_offsetType, numVerts + 1),
+              (_infIdType, numWeights), (_weightType, numWeights)]
+    if flags & kBinaryPositions:
+        layout.append((_weightType, numVerts * 3))
+
+    arrays = []
+    for arrayType, count in layout:
+        pos = _align(pos)
+        arrays.append(_readArray(buf, pos, arrayType, count))
+        pos += arrayType[2] * count
+
+    weights = SkinWeights(*arrays[:4], infNames=names[1:], meshName=names[0])
+    if flags & kBinaryPositions:
+        weights.setPositions(arrays[4])
+    return weights
+
+
+def writeChunked(fileName, weights, chunkSize=kChunkSize, codec=kCodecZlib, progress=None):
+    """
+    Write a SkinWeights table as compressed row chunks followed by a vertex range index
+    """
+    with atomicWrite(fileName) as f:
+        writeChunkedStream(f, weights, chunkSize, codec, progress)
+
+
+def writeChunkedStream(f, weights, chunkSize=kChunkSize, codec=kCodecZlib, progress=None):
+    """
+    Write a chunked weight file to an open binary file, chunks are written as they are compressed
+    """
+    writeChunkedBlocks(f, [weights], chunkSize, codec, progress, len(weights))
+
+
+def writeChunkedBlocks(f, blocks, chunkSize=kChunkSize, codec=kCodecZlib, progress=None, total=None):
+    """
+    Write a chunked weight file from tables sharing the first table's names to an open, seekable binary file
+    The header counts are written last, once every block has been seen
+    Returns the number of rows written
+    """
+    compress = _codec(codec)[0]
+    blocks = iter(blocks)
+    first = next(blocks)
+    blocks = itertools.chain([first], blocks)
+
+    start = f.tell()
+    f.write(_headerStruct.pack(kChunkedMagic, kChunkedVersion, codec, 0, 0, len(first.infNames)))
+    for name in [first.meshName] + first.infNames:
+        data = name.encode('utf-8')
+        f.write(_lengthStruct.pack(len(data)))
+        f.write(data)
+
+    index = []
+    numVerts = 0
+    for weights in blocks:
+        for row in range(0, len(weights), chunkSize):
+            block = weights.slice(row, row + chunkSize)
+            data = compress(encodeWeights(SkinWeights(block.vertIds, block.offsets, block.infIds, block.weights,
+                                                      positions=block.positions), kFormatBinary))
+            index.append(_chunkStruct.pack(int(min(block.vertIds)), int(max(block.vertIds)),
+                                           numVerts, len(block), f.tell(), len(data)))
+            f.write(data)
+            numVerts += len(block)
+            if progress is not None:
+                progress(numVerts, total or numVerts)
+
+    indexOffset = f.tell()
+    f.write(b''.join(index))
+    f.write(_footerStruct.pack(indexOffset, kChunkedIndexMagic))
+    end = f.tell()
+    f.seek(start)
+    f.write(_headerStruct.pack(kChunkedMagic, kChunkedVersion, codec, numVerts, len(index), len(first.infNames)))
+    f.seek(end)
+    return numVerts
+
+
+class ChunkedReader(object):
+    """
+    Random access to a chunked weight file by vertex range
+    Only the header and the index are read when it is opened
+    """
+    def __init__(self, fileName):
+        if hasattr(fileName, 'read'):
+            self.fileName = getattr(fileName, 'name', 'buffer')
+            self._file = fileName
+            self._owner = False
+        else:
+            self.fileName = fileName
+            self._file = open(fileName, 'rb')
+            self._owner = True
+
+        f = self._file
+        f.seek(0)
+        magic, version, self.codec, self.numVerts, numChunks, numInfs = _headerStruct.unpack(
+            f.read(_headerStruct.size))
+        if magic != kChunkedMagic:
+            raise Exception('%s is not a chunked weights file' % self.fileName)
+        if version > kChunkedVersion:
+            raise Exception('Unsupported chunked weights version: %d' % version)
+        self._decompress = _codec(self.codec)[1]
+
+        names = []
+        for i in range(numInfs + 1):
+            length = _lengthStruct.unpack(f.read(_lengthStruct.size))[0]
+            names.append(f.read(length).decode('utf-8'))
+        self.meshName = names[0]
+        self.infNames = names[1:]
+
+        f.seek(-_footerStruct.size, os.SEEK_END)
+        indexOffset, magic = _footerStruct.unpack(f.read(_footerStruct.size))
+        if magic != kChunkedIndexMagic:
+            raise Exception('%s has no chunk index' % self.fileName)
+        f.seek(indexOffset)
+        data = f.read(_chunkStruct.size * numChunks)
+        # (firstVertId, lastVertId, firstRow, numRows, offset, size)
+        self.index = [_chunkStruct.unpack_from(data, i * _chunkStruct.size) for i in range(numChunks)]
+
+    def __len__(self):
+        return self.numVerts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._owner:
+            self._file.close()
+
+    def chunks(self, firstVertId, lastVertId):
+        """
+        Get the indices of the chunks that may hold vertex ids in [firstVertId, lastVertId]
+        """
+        return [i for i, entry in enumerate(self.index) if entry[0] <= lastVertId and entry[1] >= firstVertId]
+
+    def readChunk(self, chunk):
+        """
+        Decompress one chunk as a SkinWeights table
+        """
+        offset, size = self.index[chunk][4:]
+        self._file.seek(offset)
+        weights = readBinaryBuffer(self._decompress(self._file.read(size)), self.fileName)
+        weights.infNames = self.infNames
+        weights.meshName = self.meshName
+        return weights
+
+    def readRange(self, firstVertId, lastVertId):
+        """
+        Read the rows with vertex ids in [firstVertId, lastVertId]
+        """
+        return self.read(range(firstVertId, lastVertId + 1))
+
+    def read(self, vertIds=None):
+        """
+        Read the rows of the given vertex ids, or every row
+        Chunks whose id range misses every requested id are never decompressed
+        """
+        if vertIds is None:
+            chunks = range(len(self.index))
+        else:
+            vertIds = sorted(set(int(v) for v in vertIds))
+            chunks = []
+            if vertIds:
+                chunks = [i for i in self.chunks(vertIds[0], vertIds[-1])
+                          if _anyBetween(vertIds, self.index[i][0], self.index[i][1])]
+
+        blocks = [self.readChunk(i) for i in chunks]
+        if vertIds is not None:
+            blocks = [block.subset(vertIds) for block in blocks]
+        return joinWeights(blocks, self.infNames, self.meshName)
+
+
+def readChunked(fileName, vertIds=None):
+    """
+    Read a chunked weight file, or only the rows of the given vertex ids
+    """
+    with ChunkedReader(fileName) as reader:
+        return reader.read(vertIds)
+
+
+def readWeights(fileName, fileFormat=None, vertIds=None):
+    """
+    Read a weight file, the format comes from the extension when not given
+    vertIds limits the table to those vertices, chunked files only decompress the chunks holding them
+    """
+    if fileFormat is None:
+        fileFormat = formatFromFileName(fileName)
+    if fileFormat == kFormatChunked:
+        return readChunked(fileName, vertIds)
+    if fileFormat == kFormatBinary:
+        weights = readBinary(fileName)
+    else:
+        weights = readXml(fileName)
+    if vertIds is not None:
+        weights = weights.subset(vertIds)
+    return weights
+
+
+def iterBlocks(fileName, fileFormat=None, blockSize=kChunkSize):
+    """
+    Yield a weight file as tables of up to blockSize rows in file order, at least one even when it is empty
+    Every block carries the file's influence names and mesh name
+    Chunked files yield one block per chunk whatever blockSize is
+    """
+    if fileFormat is None:
+        fileFormat = formatFromFileName(fileName)
+    if fileFormat == kFormatChunked:
+        with ChunkedReader(fileName) as reader:
+            if not reader.index:
+                yield SkinWeights([], [0], [], [], reader.infNames, reader.meshName)
+            for chunk in range(len(reader.index)):
+                yield reader.readChunk(chunk)
+    elif fileFormat == kFormatBinary:
+        weights = readBinary(fileName, mapped=True)
+        for start in range(0, max(len(weights), 1), blockSize):
+            yield weights.slice(start, start + blockSize)
+    else:
+        for block in iterXmlBlocks(fileName, blockSize):
+            yield block
+
+
+def writeBlocks(fileName, blocks, fileFormat=None, pretty=True, progress=None):
+    """
+    Write a weight file from tables sharing the first table's names, like iterBlocks() yields
+    Only one block is held at a time, binary arrays are spooled to temp files then copied in after the header
+    progress(rows, rows) is called after each block as the total isn't known up front
+    Returns the number of rows written
+    """
+    if fileFormat is None:
+        fileFormat = formatFromFileName(fileName)
+    blocks = iter(blocks)
+    first = next(blocks)
+    blocks = itertools.chain([first], blocks)
+
+    with atomicWrite(fileName) as f:
+        if fileFormat == kFormatChunked:
+            return writeChunkedBlocks(f, blocks, progress=progress)
+        if fileFormat == kFormatBinary:
+            return _writeBinaryBlocks(f, first, blocks, progress)
+
+        numVerts = 0
+        f.write(''.join(_xmlHeader(first, pretty)).encode('utf-8'))
+        for weights in blocks:
+            for rows, data in _encodeXmlBlocks(weights, pretty, _xmlVertices(weights, pretty)):
+                f.write(data)
+            numVerts += len(weights)
+            if progress is not None:
+                progress(numVerts, numVerts)
+        f.write(_xmlFooter(pretty).encode('utf-8'))
+        return numVerts
+
+
+def _writeBinaryBlocks(f, first, blocks, progress=None):
+    """
+    Write the binary layout from tables, each array goes to its own temp file until the counts are known
+    """
+    hasPositions = first.positions is not None
+    spools = [tempfile.TemporaryFile() for i in range(5 if hasPositions else 4)]
+    try:
+        numVerts = numWeights = 0
+        spools[1].write(_arrayBytes(array.array(_offsetType[0], [0]), _offsetType))
+        for weights in blocks:
+            if np is not None:
+                offsets = weights.offsets[1:].astype('i8') + numWeights
+            else:
+                offsets = array.array(_offsetType[0], [o + numWeights for o in weights.offsets[1:]])
+            spools[0].write(_arrayBytes(weights.vertIds, _vertIdType))
+            spools[1].write(_arrayBytes(offsets, _offsetType))
+            spools[2].write(_arrayBytes(weights.infIds, _infIdType))
+            spools[3].write(_arrayBytes(weights.weights, _weightType))
+            if hasPositions:
+                if weights.positions is None:
+                    raise Exception('Every block needs positions when the first has them')
+                spools[4].write(_arrayBytes(weights.positions, _weightType))
+            numVerts += len(weights)
+            numWeights += weights.numWeights
+            if progress is not None:
+                progress(numVerts, numVerts)
+
+        f.write(_headerStruct.pack(kBinaryMagic, kBinaryVersion, kBinaryPositions if hasPositions else 0,
+                                   numVerts, numWeights, len(first.infNames)))
+        for name in [first.meshName] + first.infNames:
+            data = name.encode('utf-8')
+            f.write(_lengthStruct.pack(len(data)))
+            f.write(data)
+        for spool in spools:
+            _pad(f)
+            spool.seek(0)
+            shutil.copyfileobj(spool, f)
+        return numVerts
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def writeWeights(fileName, weights, fileFormat=None, pretty=True, timer=None, progress=None):
+    """
+    Write a weight file, the format comes from the extension when not given
+    With a timer the serialize and write phases are timed apart, see writeTimed()
+    """
+    if fileFormat is None:
+        fileFormat = formatFromFileName(fileName)
+    if timer is not None:
+        writeTimed(fileName, weights, fileFormat, pretty, timer, progress)
+    elif fileFormat == kFormatBinary:
+        writeBinary(fileName, weights)
+        if progress is not None:
+            progress(len(weights), len(weights))
+    elif fileFormat == kFormatChunked:
+        writeChunked(fileName, weights, progress=progress)
+    else:
+        writeXml(fileName, weights, pretty, progress)
+    return fileName
+
+
+def writeTimed(fileName, weights, fileFormat, pretty, timer, progress=None):
+    """
+    Write a weight file reporting 'serialize' and 'write' spans to timer.add(name, seconds, **counts)
+    XML is still streamed, kXmlBlockSize vertices are built then written at a time
+    Each step runs under timer.profiled() so either phase can be profiled
+    """
+    counts = {'mesh': weights.meshName, 'verts': len(weights), 'weights': weights.numWeights}
+    if fileFormat in (kFormatBinary, kFormatChunked):
+        startTime = time.time()
+        with timer.profiled('serialize'):
+            blocks = iter([(len(weights), encodeWeights(weights, fileFormat))])
+        serializeTime = time.time() - startTime
+    else:
+        blocks = _encodeXmlBlocks(weights, pretty)
+        serializeTime = 0.0
+
+    writeTime = 0.0
+    numBytes = 0
+    with atomicWrite(fileName) as f:
+        while True:
+            startTime = time.time()
+            with timer.profiled('serialize'):
+                rows, data = next(blocks, (0, b''))
+            serializeTime += time.time() - startTime
+            if not data:
+                break
+            startTime = time.time()
+            with timer.profiled('write'):
+                f.write(data)
+            writeTime += time.time() - startTime
+            numBytes += len(data)
+            if progress is not None:
+                progress(rows, len(weights))
+
+    timer.add('serialize', serializeTime, **counts)
+    timer.add('write', writeTime, mesh=weights.meshName, bytes=numBytes)
+
+
+def encodeWeights(weights, fileFormat, pretty=True):
+    """
+    Get a weight file's contents as bytes
+    """
+    if fileFormat == kFormatBinary:
+        f = io.BytesIO()
+        writeBinaryStream(f, weights)
+        return f.getvalue()
+    if fileFormat == kFormatChunked:
+        f = io.BytesIO()
+        writeChunkedStream(f, weights)
+        return f.getvalue()
+    return b''.join(chunk.encode('utf-8') for chunk in iterXml(weights, pretty))
+
+
+def decodeWeights(data, fileFormat):
+    """
+    Read weights from a weight file's contents
+    """
+    if fileFormat == kFormatBinary:
+        return readBinaryBuffer(data)
+    if fileFormat == kFormatChunked:
+        return readChunked(io.BytesIO(data))
+    return readXml(io.BytesIO(data))
+
+
+# ---- Batches ----
+# Many meshes go either to one zip archive, one member per mesh, or to one file per mesh in a folder.
+# Encoding and decoding run on a worker pool, threads by default since Maya's API is not involved.
+
+def isArchive(fileName):
+    return os.path.splitext(fileName)[1].lower() in kArchiveExtensions
+
+
+def safeName(meshName):
+    """
+    Get a mesh name without dag path or namespace separators, for use in file names
+    """
+    return meshName.replace('|', '_').replace(':', '_').strip('_')
+
+
+def memberName(meshName, fileFormat):
+    """
+    Get a file name for a mesh's weights
+    """
+    ext = {kFormatBinary: kBinaryExtensions[0], kFormatChunked: kChunkedExtensions[0]}.get(fileFormat,
+                                                                                         kXmlExtensions[0])
+    return safeName(meshName) + ext
+
+
+def poolProcesses(fileFormats, workers=None):
+    """
+    Whether encoding or decoding files of these formats is worth a process pool
+    XML is pure python and holds the GIL, binary and chunked files spend their time in numpy and zlib,
+    which release it, so threads already scale for those
+    Inside Maya every worker process is a new mayapy, so processes are only used when workers is given
+    """
+    if kFormatXml not in fileFormats:
+        return False
+    return workers is not None or not inMaya()
+
+
+def _encodeJob(job):
+    weights, fileFormat, pretty = job
+    return encodeWeights(weights, fileFormat, pretty)
+
+
+def _decodeJob(job):
+    data, fileFormat = job
+    return decodeWeights(data, fileFormat)
+
+
+def _writeJob(job):
+    fileName, weights, fileFormat, pretty = job
+    return writeWeights(fileName, weights, fileFormat, pretty)
+
+
+def _readJob(job):
+    fileName, fileFormat = job[:2]
+    vertIds = job[2] if len(job) > 2 else None
+    return readWeights(fileName, fileFormat, vertIds)
+
+
+def writeMany(jobs, workers=None, processes=None, progress=None):
+    """
+    Write many weight files in parallel from a list of (fileName, weights, fileFormat, pretty)
+    processes None uses a process pool when any file is XML, see poolProcesses()
+    """
+    if processes is None:
+        processes = poolProcesses([job[2] or formatFromFileName(job[0]) for job in jobs], workers)
+    return mapPool(_writeJob, jobs, workers, processes, progress)
+
+
+def readMany(jobs, workers=None, processes=None):
+    """
+    Read many weight files in parallel from a list of (fileName, fileFormat) or (fileName, fileFormat, vertIds)
+    processes None uses a process pool when any file is XML, see poolProcesses()
+    """
+    if processes is None:
+        processes = poolProcesses([job[1] or formatFromFileName(job[0]) for job in jobs], workers)
+    return mapPool(_readJob, jobs, workers, processes)
+
+
+def writeArchive(fileName, tables, fileFormat=kFormatBinary, pretty=True, workers=None, processes=None,
+                 progress=None):
+    """
+    Write many SkinWeights tables into one zip archive
+    Members are encoded in parallel then written in order, progress counts members written
+    processes None uses a process pool for XML members, see poolProcesses()
+    """
+    if processes is None:
+        processes = poolProcesses([fileFormat], workers)
+    members = mapPool(_encodeJob, [(weights, fileFormat, pretty) for weights in tables], workers, processes)
+    with atomicWrite(fileName) as f:
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for i, (weights, data) in enumerate(zip(tables, members)):
+                archive.writestr(memberName(weights.meshName, fileFormat), data)
+                if progress is not None:
+                    progress(i + 1, len(tables))
+
+
+def readArchive(fileName, workers=None, processes=None):
+    """
+    Read every SkinWeights table out of a zip archive
+    Members are read in order then decoded in parallel, on a process pool when any is XML unless processes is given
+    """
+    with zipfile.ZipFile(fileName, 'r') as archive:
+        jobs = [(archive.read(name), formatFromFileName(name)) for name in archive.namelist()]
+    if processes is None:
+        processes = poolProcesses([job[1] for job in jobs], workers)
+    return mapPool(_decodeJob, jobs, workers, processes)
+
+
+def _readArray(buf, pos, arrayType, count):
+    typeCode, dtype, size = arrayType
+    if np is not None:
+        return np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+
+    data = array.array(typeCode)
+    if hasattr(data, 'frombytes'):
+        data.frombytes(buf[pos:pos + size * count])
+    else:
+        data.fromstring(buf[pos:pos + size * count])
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def _arrayBytes(data, arrayType):
+    typeCode, dtype, size = arrayType
+    if np is not None:
+        return np.asarray(data, dtype=dtype).tobytes()
+
+    if data.typecode != typeCode:
+        data = array.array(typeCode, data)
+    if sys.byteorder != 'little':
+        data = array.array(typeCode, data)
+        data.byteswap()
+    if hasattr(data, 'tobytes'):
+        return data.tobytes()
+    return data.tostring()
+
+
+def _codec(codec):
+    """
+    Get (compress, decompress) for a chunk codec
+    """
+    if codec == kCodecNone:
+        return bytes, bytes
+    if codec == kCodecZlib:
+        return zlib.compress, zlib.decompress
+    if codec == kCodecLzma and lzma is not None:
+        return lzma.compress, lzma.decompress
+    raise Exception('Unsupported chunk codec: %d' % codec)
+
+
+def _anyBetween(values, low, high):
+    # values is sorted
+    i = bisect.bisect_left(values, low)
+    return i < len(values) and values[i] <= high
+
+
+def _align(pos, alignment=8):
+    return (pos + alignment - 1) // alignment * alignment
+
+
+def _pad(f, alignment=8):
+    pos = f.tell()
+    padding = _align(pos, alignment) - pos
+    if padding:
+        f.write(b'\0' * padding)
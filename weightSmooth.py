@@ -0,0 +1,243 @@
+# ---- Weight smoothing ----
+# Laplacian smoothing of a whole SkinWeights table at once.
+# The mesh's vertex adjacency is built once per topology as a row normalized sparse matrix and cached,
+# each iteration is then one sparse matrix product over every influence column together.
+# Weights stay sparse throughout, only the (vertex, influence) pairs that hold weight are stored,
+# never a vertices x influences matrix.
+# scipy.sparse is used when it is available, then numpy index arithmetic, then plain python.
+# Nothing in here touches Maya.
+
+import array
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+from skinWeights import SkinWeights, SkinWeightsBuilder
+
+kThreshold = 1e-4
+
+_cache = {}
+
+
+class Adjacency(object):
+    """
+    Vertex adjacency of a mesh
+    average() gives every vertex the mean of its neighbours, vertices without neighbours keep their own value
+    """
+    def __init__(self, numVerts, edgesA, edgesB):
+        self.numVerts = numVerts
+        self._matrix = None
+
+        if np is not None:
+            # Both directions, duplicates dropped, sorted by row
+            a = np.concatenate([np.asarray(edgesA, dtype='i8'), np.asarray(edgesB, dtype='i8')])
+            b = np.concatenate([np.asarray(edgesB, dtype='i8'), np.asarray(edgesA, dtype='i8')])
+            keys = np.unique(a[a != b] * numVerts + b[a != b])
+            rows, self.indices = keys // numVerts, keys % numVerts
+            self.indptr = np.zeros(numVerts + 1, dtype='i8')
+            np.cumsum(np.bincount(rows, minlength=numVerts), out=self.indptr[1:])
+            self.degrees = np.diff(self.indptr)
+            if sparse is not None:
+                scale = 1.0 / np.maximum(self.degrees, 1)
+                self._matrix = sparse.csr_matrix((scale[rows], self.indices, self.indptr),
+                                                 shape=(numVerts, numVerts))
+        else:
+            neighbours = [set() for v in range(numVerts)]
+            for a, b in zip(edgesA, edgesB):
+                if a != b:
+                    neighbours[a].add(b)
+                    neighbours[b].add(a)
+            self._neighbours = [sorted(n) for n in neighbours]
+
+    @classmethod
+    def fromPolygons(cls, numVerts, counts, vertexList):
+        """
+        Build from polygon vertex counts and the flat polygon vertex list, like MFnMesh.getVertices() returns
+        """
+        if np is not None:
+            counts = np.asarray(counts, dtype='i8')
+            vertexList = np.asarray(vertexList, dtype='i8')
+            starts = np.cumsum(counts) - counts
+            polygons = np.repeat(np.arange(len(counts)), counts)
+            index = np.arange(len(vertexList))
+            # Every polygon vertex connects to the next one, the last wraps to the first
+            following = np.where(index == starts[polygons] + counts[polygons] - 1, starts[polygons], index + 1)
+            return cls(numVerts, vertexList, vertexList[following])
+
+        edgesA, edgesB = [], []
+        start = 0
+        for count in counts:
+            polygon = list(vertexList[start:start + count])
+            edgesA.extend(polygon)
+            edgesB.extend(polygon[1:] + polygon[:1])
+            start += count
+        return cls(numVerts, edgesA, edgesB)
+
+    def neighbours(self, vertId):
+        if np is not None:
+            return self.indices[self.indptr[vertId]:self.indptr[vertId + 1]].tolist()
+        return self._neighbours[vertId]
+
+    def average(self, rows):
+        """
+        Average the neighbours of every vertex over sparse rows, vertices without neighbours keep their own values
+        With numpy rows are (vertex ids, columns, values) arrays of the stored entries and so is the result,
+        without numpy they are a list of {column: value} dicts, one per vertex
+        """
+        if np is not None:
+            vertIds, columns, values = rows
+            numColumns = int(columns.max()) + 1 if len(columns) else 1
+            isolated = (self.degrees == 0)[vertIds]
+            if self._matrix is not None:
+                matrix = sparse.csr_matrix((values, (vertIds, columns)), shape=(self.numVerts, numColumns))
+                averaged = self._matrix.dot(matrix).tocoo()
+                averaged = averaged.row.astype('i8'), averaged.col.astype('i8'), averaged.data
+            else:
+                # Every entry is handed to each neighbour of its vertex, the adjacency goes both ways
+                counts = self.degrees[vertIds]
+                starts = np.repeat(self.indptr[vertIds] - (np.cumsum(counts) - counts), counts)
+                targets = self.indices[starts + np.arange(counts.sum())]
+                averaged = targets, np.repeat(columns, counts), np.repeat(values, counts) / self.degrees[targets]
+            return sumEntries(np.concatenate([averaged[0], vertIds[isolated]]),
+                              np.concatenate([averaged[1], columns[isolated]]),
+                              np.concatenate([averaged[2], values[isolated]]), numColumns)
+
+        averaged = []
+        for vertId, neighbours in enumerate(self._neighbours):
+            if not neighbours:
+                averaged.append(dict(rows[vertId]))
+                continue
+            totals = {}
+            for n in neighbours:
+                for column, value in rows[n].items():
+                    totals[column] = totals.get(column, 0.0) + value
+            averaged.append(dict((column, total / len(neighbours)) for column, total in totals.items()))
+        return averaged
+
+
+def sumEntries(vertIds, columns, values, numColumns):
+    """
+    Sum the values of repeated (vertex id, column) entries, get the entries sorted by vertex id then column
+    """
+    keys, inverse = np.unique(vertIds * numColumns + columns, return_inverse=True)
+    return keys // numColumns, keys % numColumns, np.bincount(inverse.ravel(), weights=values, minlength=len(keys))
+
+
+def connectivityHash(counts, vertexList):
+    """
+    Hash polygon vertex counts and the flat polygon vertex list, part of an adjacency cache key
+    """
+    digest = hashlib.sha1()
+    for values in (counts, vertexList):
+        if np is not None:
+            digest.update(np.asarray(values, dtype='<i4').tobytes())
+        else:
+            data = array.array('i', values)
+            digest.update(data.tobytes() if hasattr(data, 'tobytes') else data.tostring())
+    return digest.hexdigest()
+
+
+def cachedAdjacency(key, build):
+    """
+    Get the adjacency stored under key, calling build() to make it the first time
+    Key it by everything that changes with topology, like mesh path, vertex count and connectivityHash()
+    """
+    adjacency = _cache.get(key)
+    if adjacency is None:
+        adjacency = _cache[key] = build()
+    return adjacency
+
+
+def clearAdjacencyCache():
+    _cache.clear()
+
+
+def smoothWeights(weights, adjacency, iterations=1, strength=0.5, mask=None, normalize=True, threshold=kThreshold):
+    """
+    Laplacian smooth a table over a mesh adjacency
+    Each iteration moves every vertex strength of the way towards its neighbours' average
+    mask is a list of vertex ids, or a {vertId: factor} dict scaling strength per vertex, unmasked vertices
+    still feed their neighbours but keep their weights
+    Weights at or below threshold are dropped and rows renormalized when normalize is set,
+    a vertex with every weight at or below threshold keeps its largest one
+    Returns a table of the masked vertices, or every vertex without a mask
+    """
+    numVerts = adjacency.numVerts
+    numInfs = max(weights.numInfluences, len(weights.infNames), 1)
+
+    if mask is None:
+        factors = dict((v, 1.0) for v in range(numVerts))
+    elif isinstance(mask, dict):
+        factors = mask
+    else:
+        factors = dict((v, 1.0) for v in mask)
+    targets = sorted(factors)
+
+    if np is not None:
+        vertIds = np.asarray(weights.vertIds, dtype='i8')
+        rows = vertIds[weights.rowIndices()], weights.infIds.astype('i8'), np.asarray(weights.weights, dtype='f8')
+        rate = np.zeros(numVerts)
+        rate[targets] = [strength * factors[v] for v in targets]
+        for i in range(iterations):
+            averaged = adjacency.average(rows)
+            # w + rate * (a - w), vertices outside the mask only feed their neighbours
+            moving = rate[averaged[0]] > 0
+            rows = sumEntries(np.concatenate([rows[0], averaged[0][moving]]),
+                              np.concatenate([rows[1], averaged[1][moving]]),
+                              np.concatenate([rows[2] * (1.0 - rate[rows[0]]),
+                                              averaged[2][moving] * rate[averaged[0][moving]]]), numInfs)
+            keep = rows[2] != 0
+            rows = rows[0][keep], rows[1][keep], rows[2][keep]
+
+        isTarget = np.zeros(numVerts, dtype=bool)
+        isTarget[targets] = True
+        keep = isTarget[rows[0]] & (rows[2] > threshold)
+        empty = np.bincount(rows[0][keep], minlength=numVerts) == 0
+        fallback = np.nonzero(isTarget[rows[0]] & empty[rows[0]] & (rows[2] > 0))[0]
+        if len(fallback):
+            # Largest weight first within each vertex, entries are already in vertex order
+            fallback = fallback[np.lexsort((-rows[2][fallback], rows[0][fallback]))]
+            first = np.ones(len(fallback), dtype=bool)
+            first[1:] = rows[0][fallback[1:]] != rows[0][fallback[:-1]]
+            keep[fallback[first]] = True
+        rowIds, infIds, values = rows[0][keep], rows[1][keep], rows[2][keep]
+        if normalize:
+            values = values / np.bincount(rowIds, weights=values, minlength=numVerts)[rowIds]
+        targets = np.asarray(targets, dtype='i8')
+        offsets = np.zeros(len(targets) + 1, dtype='i8')
+        np.cumsum(np.bincount(np.searchsorted(targets, rowIds), minlength=len(targets)), out=offsets[1:])
+        return SkinWeights(targets, offsets, infIds, values, weights.infNames, weights.meshName)
+
+    rows = [{} for v in range(numVerts)]
+    for vertId, infIds, values in weights:
+        rows[vertId] = dict(zip(infIds, values))
+    for i in range(iterations):
+        averaged = adjacency.average(rows)
+        for vertId in targets:
+            rate = strength * factors[vertId]
+            row, average = rows[vertId], averaged[vertId]
+            rows[vertId] = dict((infId, row.get(infId, 0.0) + rate * (average.get(infId, 0.0) - row.get(infId, 0.0)))
+                                for infId in set(row) | set(average))
+
+    builder = SkinWeightsBuilder(weights.infNames, weights.meshName)
+    for vertId in targets:
+        row = dict((infId, w) for infId, w in rows[vertId].items() if w > threshold)
+        if not row:
+            positive = [(w, -infId) for infId, w in rows[vertId].items() if w > 0]
+            if positive:
+                w, infId = max(positive)
+                row = {-infId: w}
+        total = sum(row.values())
+        if normalize and total > 0:
+            row = dict((infId, w / total) for infId, w in row.items())
+        infIds = sorted(row)
+        builder.addVertex(vertId, infIds, [row[i] for i in infIds])
+    return builder.build()
@@ -0,0 +1,166 @@
+# ---- Incremental skin weight snapshots ----
+# A snapshot store keeps checkpoints of a mesh's weights while it is painted.
+# The weight table is split into fixed vertex blocks and each block is content hashed,
+# only blocks whose hash changed since the parent snapshot are written.
+# Nothing in here touches Maya.
+
+# ---- Store Layout ----
+# <store>/chunks/<sha1>.blk           zlib compressed binary weights of one block
+# <store>/snapshots/<mesh>.<n>.json   manifest: mesh, influences, block size, vertex count,
+#                                     parent snapshot and the hashes of blocks changed since the parent,
+#                                     or of every block in a full manifest
+# Blocks hold vertex positions as well as weights, so moving vertices is a change too.
+# A snapshot is restored by walking its parents back to the last full manifest and overlaying their block hashes.
+# Every kFullInterval snapshots the manifest lists every block hash, which keeps those walks short.
+
+import glob
+import hashlib
+import json
+import os
+import time
+import zlib
+
+import weightFile
+from skinWeights import SkinWeights, joinWeights
+
+kBlockSize = 4096
+kFullInterval = 16
+
+
+class SnapshotStore(object):
+    """
+    Folder of block hashed weight snapshots
+    """
+    def __init__(self, path, blockSize=kBlockSize, fullInterval=kFullInterval):
+        self.path = path
+        self.blockSize = blockSize
+        self.fullInterval = fullInterval
+        self.chunkPath = os.path.join(path, 'chunks')
+        self.snapshotPath = os.path.join(path, 'snapshots')
+
+    def snapshots(self, meshName):
+        """
+        Get a mesh's snapshot names, oldest first
+        """
+        prefix = weightFile.safeName(meshName)
+        names = [os.path.basename(p)[:-len('.json')]
+                 for p in glob.glob(os.path.join(self.snapshotPath, prefix + '.*.json'))]
+        return sorted(names, key=lambda name: int(name.rsplit('.', 1)[1]))
+
+    def latest(self, meshName):
+        names = self.snapshots(meshName)
+        return names[-1] if names else None
+
+    def manifest(self, name):
+        with open(os.path.join(self.snapshotPath, name + '.json'), 'r') as f:
+            return json.load(f)
+
+    def blockHashes(self, name):
+        """
+        Get every block hash of a snapshot by composing its parent chain back to the last full manifest
+        """
+        chain = []
+        while name:
+            manifest = self.manifest(name)
+            chain.append(manifest)
+            name = None if manifest.get('full') else manifest['parent']
+
+        hashes = []
+        for manifest in reversed(chain):
+            del hashes[manifest['numBlocks']:]
+            for index, blockHash in sorted((int(i), h) for i, h in manifest['blocks'].items()):
+                if index < len(hashes):
+                    hashes[index] = blockHash
+                else:
+                    hashes.append(blockHash)
+        return hashes
+
+    def save(self, weights, parent=None):
+        """
+        Write a snapshot of a SkinWeights table, storing only blocks that changed since parent
+        parent defaults to the mesh's latest snapshot
+        Returns (snapshot name, number of blocks written, seconds taken)
+        """
+        startTime = time.time()
+        if parent is None:
+            parent = self.latest(weights.meshName)
+
+        parentHashes = []
+        depth = 0
+        if parent:
+            parentManifest = self.manifest(parent)
+            if parentManifest['infNames'] != weights.infNames or parentManifest['blockSize'] != self.blockSize:
+                # Influence ids or block boundaries mean something else now, start a new chain
+                parent = None
+            else:
+                parentHashes = self.blockHashes(parent)
+                depth = parentManifest.get('depth', 0) + 1
+        full = not parent or depth >= self.fullInterval
+        if full:
+            depth = 0
+
+        for path in (self.chunkPath, self.snapshotPath):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        # Blocks leave out the influence and mesh names, the manifest has those
+        changed = {}
+        numBlocks = 0
+        numWritten = 0
+        for index, start in enumerate(range(0, len(weights), self.blockSize)):
+            numBlocks += 1
+            block = weights.slice(start, start + self.blockSize)
+            data = weightFile.encodeWeights(SkinWeights(block.vertIds, block.offsets, block.infIds, block.weights,
+                                                        positions=block.positions),
+                                            weightFile.kFormatBinary)
+            blockHash = hashlib.sha1(data).hexdigest()
+            if index < len(parentHashes) and parentHashes[index] == blockHash:
+                if full:
+                    changed[str(index)] = blockHash
+                continue
+            changed[str(index)] = blockHash
+            numWritten += 1
+            self._writeChunk(blockHash, data)
+
+        previous = self.latest(weights.meshName)
+        number = int(previous.rsplit('.', 1)[1]) + 1 if previous else 0
+        name = '%s.%04d' % (weightFile.safeName(weights.meshName), number)
+        manifest = {'meshName': weights.meshName,
+                    'infNames': weights.infNames,
+                    'blockSize': self.blockSize,
+                    'numVerts': len(weights),
+                    'numBlocks': numBlocks,
+                    'parent': parent,
+                    'full': full,
+                    'depth': depth,
+                    'blocks': changed,
+                    'time': time.time()}
+        with weightFile.atomicWrite(os.path.join(self.snapshotPath, name + '.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        return name, numWritten, time.time() - startTime
+
+    def load(self, name):
+        """
+        Restore a snapshot as a SkinWeights table
+        """
+        manifest = self.manifest(name)
+        blocks = [weightFile.decodeWeights(self._readChunk(blockHash), weightFile.kFormatBinary)
+                  for blockHash in self.blockHashes(name)]
+        return joinWeights(blocks, manifest['infNames'], manifest['meshName'])
+
+    def _writeChunk(self, blockHash, data):
+        path = os.path.join(self.chunkPath, blockHash + '.blk')
+        if os.path.exists(path):
+            return
+        tempPath = '%s.%d.tmp' % (path, os.getpid())
+        with open(tempPath, 'wb') as f:
+            f.write(zlib.compress(data))
+        if os.path.exists(path):
+            os.remove(tempPath)
+        else:
+            os.rename(tempPath, path)
+
+    def _readChunk(self, blockHash):
+        with open(os.path.join(self.chunkPath, blockHash + '.blk'), 'rb') as f:
+            return zlib.decompress(f.read())
@@ -0,0 +1,168 @@
+# ---- Background weight writing ----
+# Encodes, compresses and writes captured SkinWeights tables off the calling thread so Maya stays responsive.
+# Capture has to stay on Maya's main thread, the captured tables are handed here and the command returns.
+# Tasks run one at a time in submission order on a single worker thread, so two exports of the same
+# file never interleave. A task can still spread its encoding over a thread or process pool, see workerPool.mapPool.
+# Files are written through weightFile.atomicWrite so an interrupted task leaves the old file in place.
+# Nothing in here touches Maya.
+
+# ---- Callbacks ----
+# progress(done, total) and done(task) are called from the worker thread unless a deferrer is given,
+# inside Maya pass maya.utils.executeDeferred so they run on the main thread and can touch the scene.
+
+# ---- Usage ----
+# import weightWriter
+# task = weightWriter.submit(lambda progress: weightFile.writeWeights(fileName, weights, progress=progress),
+#                            fileName, progress=lambda done, total: ..., done=lambda task: ...)
+# task.wait()
+
+import atexit
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+_queue = queue.Queue()
+_lock = threading.Lock()
+_pending = []
+_listeners = []
+_worker = None
+
+
+def addListener(func):
+    """
+    Call func(task) whenever any task finishes
+    """
+    if func not in _listeners:
+        _listeners.append(func)
+
+
+def removeListener(func):
+    if func in _listeners:
+        _listeners.remove(func)
+
+
+class WriteTask(object):
+    """
+    One queued write, result, error and seconds are set once it has finished
+    write is called on the worker thread as write(progress)
+    """
+    def __init__(self, write, name='', progress=None, done=None, deferrer=None):
+        self.write = write
+        self.name = name
+        self.progressFunc = progress
+        self.doneFunc = done
+        self.deferrer = deferrer
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.seconds = 0.0
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the task has finished and get its result, the write's exception is raised again here
+        """
+        if not self._finished.wait(timeout):
+            raise Exception('Timed out waiting for %s' % self.name)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def run(self):
+        startTime = time.time()
+        try:
+            self.result = self.write(self.progress)
+        except Exception as e:
+            self.error = e
+        self.seconds = time.time() - startTime
+
+        for func in ([self.doneFunc] if self.doneFunc else []) + _listeners:
+            self.call(func, self)
+
+    def progress(self, done, total):
+        self.done = done
+        self.total = total
+        if self.progressFunc is not None:
+            self.call(self.progressFunc, done, total)
+
+    def call(self, func, *args):
+        """
+        Run a callback through the deferrer, a failing callback is printed and never stops the write
+        """
+        try:
+            if self.deferrer is not None:
+                self.deferrer(func, *args)
+            else:
+                func(*args)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+
+def submit(write, name='', progress=None, done=None, deferrer=None):
+    """
+    Queue write(progress) on the worker thread and return its WriteTask straight away
+    """
+    global _worker
+    task = WriteTask(write, name, progress, done, deferrer)
+    with _lock:
+        _pending.append(task)
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name='weightWriter')
+            _worker.daemon = True
+            _worker.start()
+    _queue.put(task)
+    return task
+
+
+def pending():
+    """
+    Get the tasks that are queued or running
+    """
+    with _lock:
+        return list(_pending)
+
+
+def waitAll(timeout=None):
+    """
+    Block until every queued task has finished, failed tasks keep their error rather than raising
+    """
+    for task in pending():
+        task._finished.wait(timeout)
+
+
+def _work():
+    while True:
+        task = _queue.get()
+        if task is None:
+            return
+        try:
+            task.run()
+        finally:
+            with _lock:
+                _pending.remove(task)
+            task._finished.set()
+
+
+def _shutdown():
+    """
+    Finish queued tasks and stop the worker before the interpreter tears down
+    A batch mayapy session would otherwise exit with exports still queued
+    """
+    if _worker is not None:
+        waitAll()
+        _queue.put(None)
+        _worker.join()
+
+
+atexit.register(_shutdown)
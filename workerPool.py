@@ -0,0 +1,60 @@
+# ---- Worker pools ----
+# map() over a thread or process pool, shared by the weight file readers and writers and the rig build graph.
+# Threads suit work that releases the GIL, numpy, zlib and file IO, pure python work needs processes.
+# Nothing in here touches Maya.
+
+import multiprocessing
+import os
+import sys
+from multiprocessing.pool import ThreadPool
+
+
+def mapPool(func, items, workers=None, processes=False, progress=None):
+    """
+    map() over a thread pool, or a process pool when processes is set
+    Falls back to a plain map for a single item or a single worker
+    progress(done, total) is called in order as results come back
+    """
+    items = list(items)
+    if len(items) < 2 or workers == 1:
+        results = []
+        for item in items:
+            results.append(func(item))
+            if progress is not None:
+                progress(len(results), len(items))
+        return results
+
+    if processes:
+        pool = _processPool(workers)
+    else:
+        pool = ThreadPool(workers or multiprocessing.cpu_count())
+    try:
+        if progress is None:
+            return pool.map(func, items)
+        results = []
+        for result in pool.imap(func, items):
+            results.append(result)
+            progress(len(results), len(items))
+        return results
+    finally:
+        pool.close()
+        pool.join()
+
+
+def inMaya():
+    """
+    Whether this is running inside interactive Maya, where sys.executable is Maya itself rather than mayapy
+    """
+    executable = os.path.basename(sys.executable).lower()
+    return executable.startswith('maya') and not executable.startswith('mayapy')
+
+
+def _processPool(workers):
+    """
+    Inside Maya sys.executable is Maya itself, spawned workers have to start mayapy instead
+    """
+    if inMaya():
+        mayapy = os.path.join(os.path.dirname(sys.executable), 'mayapy' + os.path.splitext(sys.executable)[1])
+        if os.path.exists(mayapy):
+            multiprocessing.set_executable(mayapy)
+    return multiprocessing.Pool(workers)